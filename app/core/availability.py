@@ -0,0 +1,325 @@
+import bisect
+import logging
+import math
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+general_logger = logging.getLogger("appLogger")  # For general logs
+
+# Each UTC day is 96 slots of 15 minutes; bit i of a day mask is slot i
+SLOT_SECONDS = 15 * 60
+SLOTS_PER_DAY = 24 * 60 * 60 // SLOT_SECONDS
+DAILY_MATCHES = ("all", "any")
+
+
+def to_utc(value: Union[str, datetime]) -> datetime:
+    """Parse an ISO string (including 'Z') or datetime into an aware UTC datetime."""
+    if isinstance(value, str):
+        if value.endswith("Z"):
+            value = value[:-1] + "+00:00"
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def booking_days(from_datetime: Union[str, datetime], to_datetime: Union[str, datetime]) -> List[date]:
+    """UTC days touched by a booking, first to last."""
+    day, last = to_utc(from_datetime).date(), to_utc(to_datetime).date()
+    days = []
+    while day <= last:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def slot_mask(first_second: int, last_second: int) -> int:
+    """Bits of the slots that seconds [first, last) of a day touch, rounded outwards."""
+    first = first_second // SLOT_SECONDS
+    last = -(-last_second // SLOT_SECONDS)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def day_slot_mask(day: date, start: datetime, end: datetime) -> int:
+    """Slots of `day` touched by [start, end)."""
+    day_start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    first = max(start, day_start) - day_start
+    last = min(end, day_start + timedelta(days=1)) - day_start
+    return slot_mask(int(first.total_seconds()), math.ceil(last.total_seconds()))
+
+
+def daily_window_mask(daily_start: time, daily_end: time) -> int:
+    """Slots touched by the same [daily_start, daily_end) on any day."""
+
+    def seconds(value: time) -> int:
+        return value.hour * 3600 + value.minute * 60 + value.second + (value.microsecond > 0)
+
+    if daily_end <= daily_start:
+        raise ValueError("daily_end must be later than daily_start.")
+    return slot_mask(seconds(daily_start), seconds(daily_end))
+
+
+def window_days(from_datetime: Union[str, datetime], to_datetime: Union[str, datetime]) -> List[date]:
+    """UTC days with at least part of [from, to) in them."""
+    return booking_days(from_datetime, to_utc(to_datetime) - timedelta(microseconds=1))
+
+
+class VehicleSchedule:
+    """
+    Booked [from, to) intervals of a single vehicle, sorted by start time.
+
+    `max_ends[i]` is the latest end among the first i + 1 intervals, so an overlap
+    search can stop as soon as no earlier interval reaches the window, even if
+    legacy data contains overlapping bookings.
+    """
+
+    def __init__(self):
+        self.starts: List[datetime] = []
+        self.ends: List[datetime] = []
+        self.allocation_ids: List[str] = []
+        self.max_ends: List[datetime] = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, allocation_id: str, start: datetime, end: datetime):
+        index = bisect.bisect_right(self.starts, start)
+        self.starts.insert(index, start)
+        self.ends.insert(index, end)
+        self.allocation_ids.insert(index, allocation_id)
+        self.max_ends.insert(index, end)
+        self._refresh_max_ends(index)
+
+    def remove(self, allocation_id: str) -> bool:
+        try:
+            index = self.allocation_ids.index(allocation_id)
+        except ValueError:
+            return False
+        for column in (self.starts, self.ends, self.allocation_ids, self.max_ends):
+            del column[index]
+        self._refresh_max_ends(index)
+        return True
+
+    def window_of(self, allocation_id: str) -> Optional[Tuple[datetime, datetime]]:
+        try:
+            index = self.allocation_ids.index(allocation_id)
+        except ValueError:
+            return None
+        return self.starts[index], self.ends[index]
+
+    def conflicts(
+        self, start: datetime, end: datetime, exclude_allocation_id: Optional[str] = None
+    ) -> List[str]:
+        """Allocation ids overlapping [start, end), newest start first."""
+        conflicting = []
+        # Only intervals starting before `end` can overlap the window
+        for index in range(bisect.bisect_left(self.starts, end) - 1, -1, -1):
+            if self.max_ends[index] <= start:
+                break
+            if (
+                self.ends[index] > start
+                and self.allocation_ids[index] != exclude_allocation_id
+            ):
+                conflicting.append(self.allocation_ids[index])
+        return conflicting
+
+    def is_free(
+        self, start: datetime, end: datetime, exclude_allocation_id: Optional[str] = None
+    ) -> bool:
+        for index in range(bisect.bisect_left(self.starts, end) - 1, -1, -1):
+            if self.max_ends[index] <= start:
+                return True
+            if (
+                self.ends[index] > start
+                and self.allocation_ids[index] != exclude_allocation_id
+            ):
+                return False
+        return True
+
+    def slot_mask(self, day: date) -> int:
+        """Slots of `day` touched by any interval."""
+        day_start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+        mask = 0
+        for index in range(bisect.bisect_left(self.starts, day_start + timedelta(days=1)) - 1, -1, -1):
+            if self.max_ends[index] <= day_start:
+                break
+            if self.ends[index] > day_start:
+                mask |= day_slot_mask(day, self.starts[index], self.ends[index])
+        return mask
+
+    def _refresh_max_ends(self, index: int):
+        running = self.max_ends[index - 1] if index > 0 else None
+        for position in range(index, len(self.ends)):
+            end = self.ends[position]
+            running = end if running is None or end > running else running
+            self.max_ends[position] = running
+
+
+class AvailabilityIndex:
+    """
+    In-process view of which time windows each vehicle is booked for.
+
+    Built from the `allocations` collection at startup and updated by the
+    services after each committed write; IndexSync carries the writes of other
+    workers and rebuilds it periodically, so it may briefly lag them. It is a
+    fast pre-check: the authoritative overlap check still runs in MongoDB when
+    a booking is written.
+
+    Alongside the schedules it keeps, per vehicle and day, a bitmap (a Python
+    int) of the 15-minute slots any booking touches. Fleet-wide "free every
+    day between 09:00 and 17:00" queries then cost one OR per day and one AND
+    per vehicle instead of a range search per vehicle per day. A day's 96
+    slots fit one int, so the bitmaps stay in-process rather than in Redis
+    (a round trip per query) or NumPy (a new dependency for 96 bits); they
+    are rebuilt with the schedules and reach other workers the same way.
+    """
+
+    def __init__(self):
+        self._schedules: Dict[str, VehicleSchedule] = {}
+        self._vehicle_by_allocation: Dict[str, str] = {}
+        self._slots: Dict[str, Dict[date, int]] = {}  # vehicle_id -> {day: booked slot bits}
+
+    def __len__(self):
+        return len(self._vehicle_by_allocation)
+
+    def add(
+        self,
+        allocation_id: str,
+        vehicle_id: str,
+        start: Union[str, datetime],
+        end: Union[str, datetime],
+    ):
+        """Insert or move an allocation's booked window."""
+        self.remove(allocation_id)
+        start, end = to_utc(start), to_utc(end)
+        schedule = self._schedules.setdefault(vehicle_id, VehicleSchedule())
+        schedule.add(allocation_id, start, end)
+        self._vehicle_by_allocation[allocation_id] = vehicle_id
+        self._refresh_slots(vehicle_id, start, end)
+
+    def remove(self, allocation_id: str) -> bool:
+        vehicle_id = self._vehicle_by_allocation.pop(allocation_id, None)
+        if vehicle_id is None:
+            return False
+        schedule = self._schedules[vehicle_id]
+        window = schedule.window_of(allocation_id)
+        removed = schedule.remove(allocation_id)
+        if window:
+            self._refresh_slots(vehicle_id, *window)
+        return removed
+
+    def _refresh_slots(self, vehicle_id: str, start: datetime, end: datetime):
+        # Recompute whole days from the schedule, so slots shared with other
+        # bookings stay set when one of them moves away
+        schedule = self._schedules[vehicle_id]
+        slots = self._slots.setdefault(vehicle_id, {})
+        for day in window_days(start, end):
+            mask = schedule.slot_mask(day)
+            if mask:
+                slots[day] = mask
+            else:
+                slots.pop(day, None)
+        if not slots:
+            del self._slots[vehicle_id]
+
+    def slots(self, vehicle_id: str, day: date) -> int:
+        """Bitmap of the slots of `day` the vehicle has a booking in."""
+        return self._slots.get(vehicle_id, {}).get(day, 0)
+
+    def vehicle_of(self, allocation_id: str) -> Optional[str]:
+        """Vehicle the allocation is indexed on, if any."""
+        return self._vehicle_by_allocation.get(allocation_id)
+
+    def is_free(
+        self,
+        vehicle_id: str,
+        start: Union[str, datetime],
+        end: Union[str, datetime],
+        exclude_allocation_id: Optional[str] = None,
+    ) -> bool:
+        """Is the vehicle free for the whole of [start, end)?"""
+        schedule = self._schedules.get(vehicle_id)
+        if schedule is None:
+            return True
+        return schedule.is_free(to_utc(start), to_utc(end), exclude_allocation_id)
+
+    def conflicts(
+        self,
+        vehicle_id: str,
+        start: Union[str, datetime],
+        end: Union[str, datetime],
+        exclude_allocation_id: Optional[str] = None,
+    ) -> List[str]:
+        schedule = self._schedules.get(vehicle_id)
+        if schedule is None:
+            return []
+        return schedule.conflicts(to_utc(start), to_utc(end), exclude_allocation_id)
+
+    def free_vehicles(
+        self,
+        vehicle_ids: Iterable[str],
+        start: Union[str, datetime],
+        end: Union[str, datetime],
+    ) -> List[str]:
+        """Subset of `vehicle_ids` free for the whole of [start, end)."""
+        start, end = to_utc(start), to_utc(end)
+        free = []
+        for vehicle_id in vehicle_ids:
+            schedule = self._schedules.get(vehicle_id)
+            if schedule is None or schedule.is_free(start, end):
+                free.append(vehicle_id)
+        return free
+
+    def free_vehicles_daily(
+        self,
+        vehicle_ids: Iterable[str],
+        days: Iterable[date],
+        daily_start: time,
+        daily_end: time,
+        match: str = "all",
+    ) -> List[str]:
+        """
+        Subset of `vehicle_ids` free between `daily_start` and `daily_end` (UTC,
+        rounded outwards to whole slots) on every one of `days` ("all") or on
+        at least one of them ("any").
+        """
+        if match not in DAILY_MATCHES:
+            raise ValueError(f"Unknown match {match!r}; expected one of {DAILY_MATCHES}")
+        window = daily_window_mask(daily_start, daily_end)
+        days = list(days)
+        free = []
+        for vehicle_id in vehicle_ids:
+            slots = self._slots.get(vehicle_id)
+            if not slots:
+                free.append(vehicle_id)
+            elif match == "all":
+                booked = 0
+                for day in days:
+                    booked |= slots.get(day, 0)
+                if not booked & window:
+                    free.append(vehicle_id)
+            elif any(not slots.get(day, 0) & window for day in days):
+                free.append(vehicle_id)
+        return free
+
+    async def load(self, allocation_repo, since: Optional[datetime] = None):
+        """(Re)build the index from allocations that have not ended before `since`."""
+        since = since or datetime.now(timezone.utc)
+        # Built aside and swapped in, so lookups during a reload see the old index
+        fresh = AvailabilityIndex()
+        async for allocation in allocation_repo.iter_active_allocations(since):
+            fresh.add(
+                allocation["allocation_id"],
+                allocation["vehicle_id"],
+                allocation["from_datetime"],
+                allocation["to_datetime"],
+            )
+        self._schedules = fresh._schedules
+        self._vehicle_by_allocation = fresh._vehicle_by_allocation
+        self._slots = fresh._slots
+        general_logger.info(
+            f"Availability index loaded with {len(self)} allocations "
+            f"across {len(self._schedules)} vehicles"
+        )
@@ -0,0 +1,67 @@
+import asyncio
+import math
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Resolves a flight whose leader was cancelled; its waiters start another
+_LEADER_CANCELLED = object()
+
+
+class SingleFlight:
+    """
+    In-process request coalescing: concurrent calls for the same key share
+    one execution of `fn` and all receive its result (or exception).
+
+    Cancelling the call running `fn` (e.g. its client disconnected) cancels
+    only that call; the calls waiting on it start a new execution instead.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self.coalesced = 0  # Calls served by another call's execution
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        while key in self._calls:
+            # A cancelled waiter must not cancel the shared execution
+            result = await asyncio.shield(self._calls[key])
+            if result is not _LEADER_CANCELLED:
+                self.coalesced += 1
+                return result
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.set_result(_LEADER_CANCELLED)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Waiters re-raise it; don't log it as unretrieved
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+
+def should_refresh_early(
+    delta: float,
+    expires_at: float,
+    beta: float = 1.0,
+    now: Optional[float] = None,
+) -> bool:
+    """
+    Probabilistic early expiration ("XFetch"): refresh ahead of `expires_at`
+    with a probability that grows as expiry nears and with `delta`, the
+    seconds the value took to compute. Spreads rebuilds of a hot key out
+    instead of letting every reader miss at the same instant.
+    """
+    now = time.time() if now is None else now
+    # 1 - random() is in (0, 1], so the log is always defined
+    return now - delta * beta * math.log(1.0 - random.random()) >= expires_at
@@ -1,16 +1,18 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Optional
 from uuid import uuid4
-from datetime import datetime
+from datetime import datetime, timezone
 
 class VehicleBookedEvent(BaseModel):
-    event_id: str = str(uuid4())
+    event_id: str = Field(default_factory=lambda: str(uuid4()))
+    allocation_id: Optional[str] = None
     vehicle_id: str
     employee_id: str
-    timestamp: str = datetime.utcnow().isoformat()
-    purpose: str
+    timestamp: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    purpose: Optional[str] = None
 
 class VehicleMaintenanceEvent(BaseModel):
-    event_id: str = str(uuid4())
+    event_id: str = Field(default_factory=lambda: str(uuid4()))
     vehicle_id: str
     start_date: str
     end_date: str
@@ -5,3 +5,11 @@ class VehicleUnavailableError(Exception):
 class DuplicateBookingError(Exception):
     """Raised when an employee tries to book a vehicle when one is already booked."""
     pass
+
+class InvalidCursorError(Exception):
+    """Raised when a pagination cursor is malformed or was not issued by this API."""
+    pass
+
+class InvalidFieldsError(Exception):
+    """Raised when a `fields` selection names a field the resource does not have."""
+    pass
@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import AsyncIterator, List
+
+# Columns of a CSV allocation export, in order
+ALLOCATION_EXPORT_FIELDS: List[str] = [
+    "allocation_id",
+    "employee_id",
+    "vehicle_id",
+    "from_datetime",
+    "to_datetime",
+    "status",
+    "purpose",
+]
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+async def ndjson_chunks(rows: AsyncIterator[dict], rows_per_chunk: int = 500) -> AsyncIterator[str]:
+    """One JSON document per line, yielded a few hundred rows at a time."""
+    lines = []
+    async for row in rows:
+        lines.append(json.dumps(row, default=_json_default, separators=(",", ":")))
+        if len(lines) >= rows_per_chunk:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+async def csv_chunks(
+    rows: AsyncIterator[dict],
+    fields: List[str] = ALLOCATION_EXPORT_FIELDS,
+    rows_per_chunk: int = 500,
+) -> AsyncIterator[str]:
+    """A header line, then the rows, yielded a few hundred rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    pending = 0
+    async for row in rows:
+        writer.writerow(
+            {
+                field: value.isoformat() if isinstance(value, (datetime, date)) else value
+                for field, value in row.items()
+            }
+        )
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
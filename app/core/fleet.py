@@ -0,0 +1,96 @@
+import bisect
+import logging
+from typing import Dict, Iterator, List, Optional, Union
+from app.core.models import Vehicle
+
+general_logger = logging.getLogger("appLogger")  # For general logs
+
+# Orders FleetIndex.candidates can rank vehicles in
+FLEET_RANKINGS = ("best_fit", "fuel_efficiency")
+
+# Vehicle fields the index keeps
+FLEET_FIELDS = ("vehicle_id", "make", "model", "capacity", "fuel_efficiency")
+
+
+def _fit_key(vehicle: dict) -> tuple:
+    # Smallest capacity that seats everyone first, then the most fuel efficient
+    return (vehicle["capacity"], -vehicle["fuel_efficiency"], vehicle["vehicle_id"])
+
+
+def _efficiency_key(vehicle: dict) -> tuple:
+    return (-vehicle["fuel_efficiency"], vehicle["capacity"], vehicle["vehicle_id"])
+
+
+class FleetIndex:
+    """
+    In-process ranking of the bookable vehicles, for auto-assignment.
+
+    Keeps every `available` vehicle in two sorted orders, best fit and most
+    fuel efficient first. Built from the `vehicles` collection at startup,
+    updated by VehicleService after each write and kept in step with the other
+    workers by IndexSync. Candidates are suggestions only: the booking still
+    checks the vehicle's status and booked windows.
+    """
+
+    def __init__(self):
+        self._vehicles: Dict[str, dict] = {}
+        self._by_fit: List[tuple] = []
+        self._by_efficiency: List[tuple] = []
+
+    def __len__(self):
+        return len(self._vehicles)
+
+    def add(self, vehicle: Union[Vehicle, dict]):
+        """Insert or replace a vehicle; one that is not available is dropped instead."""
+        if isinstance(vehicle, Vehicle):
+            vehicle = vehicle.model_dump()
+        self.remove(vehicle["vehicle_id"])
+        if vehicle.get("status") != "available":
+            return
+        entry = {field: vehicle[field] for field in FLEET_FIELDS}
+        self._vehicles[entry["vehicle_id"]] = entry
+        bisect.insort(self._by_fit, _fit_key(entry))
+        bisect.insort(self._by_efficiency, _efficiency_key(entry))
+
+    def remove(self, vehicle_id: str) -> bool:
+        entry = self._vehicles.pop(vehicle_id, None)
+        if entry is None:
+            return False
+        del self._by_fit[bisect.bisect_left(self._by_fit, _fit_key(entry))]
+        del self._by_efficiency[bisect.bisect_left(self._by_efficiency, _efficiency_key(entry))]
+        return True
+
+    def candidates(
+        self,
+        passengers: int = 1,
+        make: Optional[str] = None,
+        model: Optional[str] = None,
+        prefer: str = "best_fit",
+    ) -> Iterator[str]:
+        """Ids of the vehicles seating `passengers`, best first by `prefer`."""
+        if prefer == "best_fit":
+            # Vehicles too small for the party sort first; start past them
+            ranked = self._by_fit[bisect.bisect_left(self._by_fit, (passengers,)) :]
+        elif prefer == "fuel_efficiency":
+            ranked = list(self._by_efficiency)
+        else:
+            raise ValueError(f"Unknown ranking {prefer!r}; expected one of {FLEET_RANKINGS}")
+        # A snapshot: the index may change while the caller awaits between candidates
+        for key in ranked:
+            vehicle = self._vehicles.get(key[-1])
+            if vehicle is None or vehicle["capacity"] < passengers:
+                continue
+            if (make and vehicle["make"] != make) or (model and vehicle["model"] != model):
+                continue
+            yield vehicle["vehicle_id"]
+
+    async def load(self, vehicle_repo):
+        """(Re)build the index from the available vehicles."""
+        # Built aside and swapped in, so lookups during a reload see the old index
+        fresh = FleetIndex()
+        async for vehicle in vehicle_repo.iter_available_vehicles():
+            fresh.add(vehicle)
+        self._vehicles = fresh._vehicles
+        self._by_fit = fresh._by_fit
+        self._by_efficiency = fresh._by_efficiency
+        general_logger.info(f"Fleet index loaded with {len(self)} available vehicles")
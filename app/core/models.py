@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
 from pydantic import BaseModel, Field, field_validator, model_validator, ValidationInfo, validator
-from typing import Optional, get_type_hints
+from typing import Any, Dict, List, Literal, Optional, get_type_hints
 from uuid import uuid4
 from enum import Enum
 
@@ -141,6 +141,38 @@ class UpdateAllocation(BaseModel):
         return value
 
 
+class BulkAllocation(BaseModel):
+    # Items stay raw so one invalid booking is reported per item instead of failing the batch
+    allocations: List[Dict[str, Any]] = Field(..., min_length=1, max_length=100)
+
+
+class AutoAllocation(BaseModel):
+    """A booking request without a vehicle; the best free vehicle is picked for it."""
+
+    employee_id: str
+    from_datetime: datetime
+    to_datetime: datetime
+    passengers: int = Field(1, ge=1)
+    min_capacity: Optional[int] = Field(None, ge=1)
+    make: Optional[str] = None
+    model: Optional[str] = None
+    prefer: Literal["best_fit", "fuel_efficiency"] = "best_fit"
+    purpose: Optional[str] = None
+
+    @field_validator("from_datetime", "to_datetime", mode="before")
+    def parse_and_convert_to_utc(cls, value):
+        """Same parsing as Allocation: timezone-aware UTC, 'Z' accepted."""
+        return Allocation.parse_and_convert_to_utc(value)
+
+    @model_validator(mode="after")
+    def check_window(self):
+        if self.from_datetime >= self.to_datetime:
+            raise ValueError("from_datetime must be earlier than to_datetime.")
+        if self.from_datetime <= datetime.now(timezone.utc):
+            raise ValueError("from_datetime must be in the future.")
+        return self
+
+
 class Event(BaseModel):
     event_id: str = str(uuid4())
     event_type: str  # e.g., "BOOKING", "MAINTENANCE", "CANCELLATION"
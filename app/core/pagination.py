@@ -0,0 +1,55 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+from app.core.exceptions import InvalidCursorError
+
+
+def encode_cursor(payload: dict) -> str:
+    """Encode a keyset position as an opaque, URL-safe cursor string."""
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Decode a cursor produced by encode_cursor, raising InvalidCursorError if it is not one."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
+    if not isinstance(payload, dict):
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
+    return payload
+
+
+def encode_history_cursor(from_datetime: datetime, allocation_id: str) -> str:
+    """Cursor pointing just after an allocation in (from_datetime, allocation_id) order."""
+    return encode_cursor({"f": from_datetime.isoformat(), "a": allocation_id})
+
+
+def decode_history_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, str]]:
+    """Return the (from_datetime, allocation_id) position a history cursor points after."""
+    if not cursor:
+        return None
+    payload = decode_cursor(cursor)
+    try:
+        return datetime.fromisoformat(payload["f"]), str(payload["a"])
+    except (KeyError, TypeError, ValueError):
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
+
+
+def encode_vehicle_cursor(vehicle_id: str) -> str:
+    """Cursor pointing just after a vehicle in vehicle_id order."""
+    return encode_cursor({"v": vehicle_id})
+
+
+def decode_vehicle_cursor(cursor: Optional[str]) -> Optional[str]:
+    """Return the vehicle_id a vehicle cursor points after."""
+    if not cursor:
+        return None
+    payload = decode_cursor(cursor)
+    if not isinstance(payload.get("v"), str):
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
+    return payload["v"]
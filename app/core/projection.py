@@ -0,0 +1,40 @@
+from typing import Iterable, List, Optional
+from app.core.exceptions import InvalidFieldsError
+from app.core.models import Allocation, Vehicle
+
+# Fields a `fields=` selection may name, per resource
+ALLOCATION_FIELDS = list(Allocation.model_fields)
+VEHICLE_FIELDS = list(Vehicle.model_fields)
+
+
+def parse_fields(fields: Optional[str], allowed: List[str]) -> Optional[List[str]]:
+    """
+    The sorted, de-duplicated fields of a comma-separated `fields=` value, or
+    None (every field) when it is empty. Sorting keeps cache keys canonical.
+    """
+    if not fields:
+        return None
+    selected = sorted({field.strip() for field in fields.split(",") if field.strip()})
+    unknown = [field for field in selected if field not in allowed]
+    if unknown:
+        raise InvalidFieldsError(
+            f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}"
+        )
+    return selected or None
+
+
+def to_projection(fields: Optional[List[str]], required: Iterable[str] = ()) -> dict:
+    """MongoDB projection of `fields` plus the `required` ones; never includes _id."""
+    if fields is None:
+        return {"_id": 0}
+    projection = {"_id": 0}
+    projection.update({field: 1 for field in fields})
+    projection.update({field: 1 for field in required})
+    return projection
+
+
+def trim(documents: List[dict], fields: Optional[List[str]]) -> List[dict]:
+    """Drop the keys fetched only for internal use (cursors, filtering) from `documents`."""
+    if fields is None:
+        return documents
+    return [{key: document[key] for key in fields if key in document} for document in documents]
@@ -0,0 +1,45 @@
+import asyncio
+import random
+from typing import Any, Awaitable, Callable, Optional
+
+TRANSIENT_TRANSACTION_ERROR = "TransientTransactionError"
+
+
+def is_transient(error: BaseException) -> bool:
+    """Does the driver say the whole transaction can safely be retried?"""
+    has_error_label = getattr(error, "has_error_label", None)
+    return bool(has_error_label and has_error_label(TRANSIENT_TRANSACTION_ERROR))
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+async def retry_transient(
+    operation: Callable[[], Awaitable[Any]],
+    retries: int = 5,
+    base_delay: float = 0.01,
+    max_delay: float = 0.5,
+    stats: Optional[dict] = None,
+) -> Any:
+    """
+    Run `operation` again, after a jittered pause, each time it fails with a
+    TransientTransactionError (e.g. a write conflict aborted the transaction),
+    up to `retries` times. Counts "retries" and "gave_up" in `stats`.
+    """
+    attempt = 0
+    while True:
+        try:
+            return await operation()
+        except Exception as e:
+            if not is_transient(e):
+                raise
+            if attempt >= retries:
+                if stats is not None:
+                    stats["gave_up"] += 1
+                raise
+            if stats is not None:
+                stats["retries"] += 1
+            await asyncio.sleep(backoff_delay(attempt, base_delay, max_delay))
+            attempt += 1
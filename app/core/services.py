@@ -1,21 +1,215 @@
+import asyncio
 import logging
+import time
+from app.core.availability import AvailabilityIndex, to_utc, window_days
+from app.core.coalescing import SingleFlight, should_refresh_early
+from app.core.events import VehicleBookedEvent
 from app.core.exceptions import DuplicateBookingError, VehicleUnavailableError
+from app.core.fleet import FleetIndex
 from app.core.models import Allocation, Vehicle
-from datetime import datetime
-from typing import List, Optional, Tuple
+from app.core.projection import (
+    ALLOCATION_FIELDS,
+    VEHICLE_FIELDS,
+    parse_fields,
+    to_projection,
+    trim,
+)
+from app.core.retry import retry_transient
+from app.core.usage import daily_usage, merge_usage
+from app.core.pagination import (
+    decode_history_cursor,
+    decode_vehicle_cursor,
+    encode_history_cursor,
+    encode_vehicle_cursor,
+)
+from datetime import datetime, timedelta, time as time_of_day
+from collections import defaultdict
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+from app.infrastructure.booking_filter import EmployeeBookingFilter
+from app.infrastructure.cache_batch import CacheBatch
 from app.infrastructure.db import VehicleRepository
+from app.events.publisher import serialize_event
 
 # Set up logging
 general_logger = logging.getLogger("appLogger")  # For general logs
 error_logger = logging.getLogger("errorLogger")  # For error logs
 
 
+HISTORY_CACHE_TTL = 3600  # Seconds a history page is fresh
+HISTORY_STALE_GRACE = 60  # Seconds a page may still be served while it is rebuilt
+HISTORY_LEASE_TIMEOUT = 10  # Seconds one worker may hold the rebuild lease of a page
+HISTORY_LEASE_WAIT = 0.05  # Seconds between cache polls while another worker rebuilds
+HISTORY_LEASE_POLLS = 20
+
+# "transaction": multi-document transaction; "cas": conditional claim on the vehicle
+# document, then single-document writes compensated on failure
+ALLOCATION_MODES = ("transaction", "cas")
+
+# Vehicles auto_allocate reads from MongoDB once the index candidates run out
+AUTO_FALLBACK_SCAN = 500
+
+REPORT_CACHE_TTL = 300  # Seconds a computed report is cached
+REPORT_MAX_WINDOW = timedelta(days=366)
+
+
+def history_generation_keys(
+    employee_id: Optional[str] = None, vehicle_id: Optional[str] = None
+) -> List[str]:
+    """
+    Generation counters a cached history page depends on. Filtered pages follow
+    the employee/vehicle they are filtered on; unfiltered pages follow the global counter.
+    """
+    keys = []
+    if employee_id:
+        keys.append(f"history:gen:employee:{employee_id}")
+    if vehicle_id:
+        keys.append(f"history:gen:vehicle:{vehicle_id}")
+    return keys or ["history:gen"]
+
+
+def employee_booking_key(employee_id: str, booking_date) -> str:
+    """
+    Cache key of check_employee_booking's answer. The date is normalised to
+    UTC ISO form, so a string from one endpoint and a datetime from another
+    share the entry.
+    """
+    return f"employee:{employee_id}:booking:{to_utc(booking_date).isoformat()}"
+
+
+def is_booking_entry(value) -> bool:
+    """Is `value` an employee booking cache entry (see check_employee_booking)?"""
+    return isinstance(value, dict) and value.keys() == {"generation", "booking"}
+
+
+def history_invalidation_keys(employee_ids=(), vehicle_ids=(), include_global=True) -> List[str]:
+    """Generation counters to bump when bookings of these employees/vehicles change."""
+    keys = [f"history:gen:employee:{employee_id}" for employee_id in employee_ids]
+    keys += [f"history:gen:vehicle:{vehicle_id}" for vehicle_id in vehicle_ids]
+    if include_global:
+        keys.append("history:gen")
+    return keys
+
+
+def build_history_query(
+    employee_id: Optional[str] = None,
+    vehicle_id: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> dict:
+    """MongoDB filter for the allocation history filters."""
+    query = {}
+    if employee_id:
+        query["employee_id"] = employee_id
+    if vehicle_id:
+        query["vehicle_id"] = vehicle_id
+    if start_date or end_date:
+        query["from_datetime"] = {}
+        if start_date:
+            query["from_datetime"]["$gte"] = datetime.fromisoformat(start_date)
+        if end_date:
+            query["from_datetime"]["$lte"] = datetime.fromisoformat(end_date)
+    return query
+
+
+def build_vehicle_query(
+    status: Optional[str] = None,
+    make: Optional[str] = None,
+    model: Optional[str] = None,
+    min_capacity: Optional[int] = None,
+) -> dict:
+    """MongoDB filter for the vehicle list filters."""
+    query = {}
+    if status:
+        query["status"] = status
+    if make:
+        query["make"] = make
+    if model:
+        query["model"] = model
+    if min_capacity is not None:
+        query["capacity"] = {"$gte": min_capacity}
+    return query
+
+
+def booked_event(allocation: Allocation) -> VehicleBookedEvent:
+    return VehicleBookedEvent(
+        allocation_id=allocation.allocation_id,
+        vehicle_id=allocation.vehicle_id,
+        employee_id=allocation.employee_id,
+        purpose=allocation.purpose,
+    )
+
+
+def booked_window(allocation_id: str, from_datetime: datetime, to_datetime: datetime) -> dict:
+    """Entry of a vehicle's booked_windows array (always built here, so $addToSet dedupes it)."""
+    return {
+        "allocation_id": allocation_id,
+        "from_datetime": from_datetime,
+        "to_datetime": to_datetime,
+    }
+
+
+async def invalidate_history(cache, employee_ids=(), vehicle_ids=(), include_global=True):
+    """Invalidate cached history pages touching the given employees/vehicles with one atomic bump."""
+    await cache.bump_generations(
+        history_invalidation_keys(employee_ids, vehicle_ids, include_global)
+    )
+
+
 class AllocationService:
-    def __init__(self, allocation_repo, vehicle_repo, cache, db_client):
+    def __init__(
+        self,
+        allocation_repo,
+        vehicle_repo,
+        cache,
+        db_client,
+        availability: Optional[AvailabilityIndex] = None,
+        booking_filter: Optional[EmployeeBookingFilter] = None,
+        negative_ttl: int = 60,
+        inline_invalidation: bool = True,
+        outbox_repo=None,
+        allocation_mode: str = "transaction",
+        max_retries: int = 5,
+        retry_base_delay: float = 0.01,
+        fleet: Optional[FleetIndex] = None,
+        auto_max_claims: int = 5,
+        index_sync=None,
+        event_publisher=None,
+    ):
+        if allocation_mode not in ALLOCATION_MODES:
+            raise ValueError(f"Unknown allocation mode {allocation_mode!r}")
         self.allocation_repo = allocation_repo
         self.vehicle_repo = vehicle_repo
         self.cache = cache
         self.db_client = db_client  # Shared MongoDB client
+        # Booked windows per vehicle, shared with VehicleService
+        self.availability = availability if availability is not None else AvailabilityIndex()
+        self.booking_filter = booking_filter  # Skips MongoDB for employees with no booking
+        self.negative_ttl = negative_ttl  # Seconds to cache "no booking"; 0 disables
+        # False when the change stream worker invalidates caches instead
+        self.inline_invalidation = inline_invalidation
+        # Booking events are written here in the booking transaction; None disables them
+        self.outbox_repo = outbox_repo
+        # Without an outbox, booking events are queued here once the booking commits
+        self.event_publisher = event_publisher
+        self.allocation_mode = allocation_mode
+        self.max_retries = max_retries  # Re-runs of a booking aborted by a transient error
+        self.retry_base_delay = retry_base_delay
+        # Available vehicles ranked for auto-assignment, shared with VehicleService
+        self.fleet = fleet if fleet is not None else FleetIndex()
+        self.auto_max_claims = auto_max_claims  # Candidates auto_allocate tries to book
+        # Carries index updates to the other workers; None keeps them local
+        self.index_sync = index_sync
+        self.allocation_stats = {
+            "attempts": 0,
+            "retries": 0,  # Transient errors (write conflicts) retried
+            "gave_up": 0,  # Transient errors still failing after max_retries
+            "conflicts": 0,  # Bookings refused because the window was taken
+            "compensations": 0,  # CAS bookings undone after a later step failed
+            "auto_fallbacks": 0,  # Auto allocations that ran out of index candidates
+        }
+        # Concurrent misses of the same history page share one MongoDB query
+        self.history_flights = SingleFlight()
+        self.history_stats = {"early_refreshes": 0, "stale_served": 0, "lease_waits": 0}
 
     async def get_filtered_allocations(
         self,
@@ -25,71 +219,223 @@ class AllocationService:
         end_date: Optional[str] = None,
         page: int = 1,
         size: int = 10,
-    ) -> Tuple[List[Allocation], int]:
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+        fields: Optional[str] = None,
+    ) -> Tuple[List[dict], Optional[int], Optional[str]]:
+        """
+        Return (allocations, total_count, next_cursor) ordered by (from_datetime, allocation_id).
+
+        Passing a `cursor` from a previous page resumes right after it (keyset
+        pagination, `page` is ignored); `include_total=False` skips the count.
+        `fields` (comma-separated) limits each allocation to those fields.
+
+        Pages are cached with the time they took to build and refreshed a little
+        early at random (see should_refresh_early). A rebuild runs once per
+        worker (SingleFlight) and once across workers (a Redis lease); the
+        others serve the previous page if there is one, or wait for the new one.
+        """
+        after = decode_history_cursor(cursor)
+        selected = parse_fields(fields, ALLOCATION_FIELDS)
+
+        generations = await self.cache.get_generations(
+            history_generation_keys(employee_id, vehicle_id)
+        )
+        generation = ".".join(str(value) for value in generations)
         cache_key = (
-            f"history:{employee_id}:{vehicle_id}:{start_date}:{end_date}:{page}:{size}"
+            f"history:{generation}:{employee_id}:{vehicle_id}:{start_date}:{end_date}"
+            f":{cursor or page}:{size}:{int(include_total)}:{','.join(selected or ['*'])}"
         )
 
         # Check cache first
-        cached_allocations = await self.cache.get(cache_key)
-        if cached_allocations:
-            general_logger.info(f"Cache hit for key: {cache_key}")
-            if isinstance(cached_allocations, tuple) and len(cached_allocations) == 2:
-                return cached_allocations
+        stale = None
+        entry = await self.cache.get(cache_key)
+        if isinstance(entry, dict) and "result" in entry:
+            if not should_refresh_early(entry["delta"], entry["expires_at"]):
+                general_logger.info(f"Cache hit for key: {cache_key}")
+                return entry["result"]
+            self.history_stats["early_refreshes"] += 1
+            stale = entry["result"]
 
         # Build query dynamically based on filters
-        query = {}
-        if employee_id:
-            query["employee_id"] = employee_id
-        if vehicle_id:
-            query["vehicle_id"] = vehicle_id
-        if start_date or end_date:
-            query["from_datetime"] = {}
-            if start_date:
-                query["from_datetime"]["$gte"] = datetime.fromisoformat(start_date)
-            if end_date:
-                query["from_datetime"]["$lte"] = datetime.fromisoformat(end_date)
-
-        skip = (page - 1) * size
-
-        allocations = await self.allocation_repo.get_allocations_by_filter(
-            query, skip=skip, limit=size
+        query = build_history_query(employee_id, vehicle_id, start_date, end_date)
+
+        skip = 0 if after else (page - 1) * size
+
+        async def rebuild():
+            return await self._rebuild_history_page(
+                cache_key, query, skip, size, after, include_total, stale, selected
+            )
+
+        return await self.history_flights.do(cache_key, rebuild)
+
+    async def _rebuild_history_page(
+        self, cache_key, query, skip, size, after, include_total, stale, fields=None
+    ):
+        lease_key = f"lock:{cache_key}"
+        lease_token = str(time.time_ns())
+        leased = await self.cache.acquire_lock(
+            lease_key, timeout=HISTORY_LEASE_TIMEOUT, token=lease_token
         )
-        total_count = await self.allocation_repo.get_count(query)
+        if not leased:
+            # Another worker is rebuilding this page
+            if stale is not None:
+                self.history_stats["stale_served"] += 1
+                return stale
+            self.history_stats["lease_waits"] += 1
+            for _ in range(HISTORY_LEASE_POLLS):
+                await asyncio.sleep(HISTORY_LEASE_WAIT)
+                entry = await self.cache.get(cache_key)
+                if isinstance(entry, dict) and "result" in entry:
+                    return entry["result"]
+            general_logger.warning(f"Rebuild lease wait timed out for key: {cache_key}")
 
-        result = (allocations, total_count)
+        try:
+            started = time.monotonic()
+            # Fetch one extra row to learn whether another page follows
+            allocations = await self.allocation_repo.get_allocations_by_filter(
+                query,
+                skip=skip,
+                limit=size + 1,
+                after=after,
+                projection=to_projection(fields, required=("from_datetime", "allocation_id")),
+            )
+            next_cursor = None
+            if len(allocations) > size:
+                allocations = allocations[:size]
+                last = allocations[-1]
+                next_cursor = encode_history_cursor(last["from_datetime"], last["allocation_id"])
+            allocations = trim(allocations, fields)
 
-        # Cache the result for future requests, expires in 1 hour (3600 seconds)
-        await self.cache.set(cache_key, result, expiration=3600)
-        general_logger.info(f"Cache set for key: {cache_key} with expiration in 1 hour")
+            total_count = await self.allocation_repo.get_count(query) if include_total else None
 
-        return result
+            result = (allocations, total_count, next_cursor)
 
-    async def check_employee_booking(self, employee_id: str, booking_date: str):
-        cache_key = f"employee:{employee_id}:booking:{booking_date}"
-        cached_booking = await self.cache.get(cache_key)
-        if cached_booking:
-            general_logger.info(
-                f"Cache hit for employee booking: {employee_id}, date: {booking_date}"
+            # Cache the result for future requests, fresh for 1 hour (3600 seconds)
+            entry = {
+                "result": result,
+                "delta": time.monotonic() - started,
+                "expires_at": time.time() + HISTORY_CACHE_TTL,
+            }
+            await self.cache.set(
+                cache_key, entry, expiration=HISTORY_CACHE_TTL + HISTORY_STALE_GRACE
             )
-            return cached_booking
+            general_logger.info(f"Cache set for key: {cache_key} with expiration in 1 hour")
+            return result
+        finally:
+            if leased:
+                await self.cache.release_lock(lease_key, token=lease_token)
+
+    async def _prefetch(self, keys: List[str], generation_keys: List[str]) -> dict:
+        """
+        Read cache entries (one MGET) and generation counters (seeded if
+        missing, see get_generations) concurrently, for the `prefetched` arguments.
+        """
+        values, generations = await asyncio.gather(
+            self.cache.get_many(keys), self.cache.get_generations(generation_keys)
+        )
+        return {**dict(zip(keys, values)), **dict(zip(generation_keys, generations))}
+
+    async def _cache_get(self, key: str, prefetched: Optional[dict] = None):
+        if prefetched is not None and key in prefetched:
+            return prefetched[key]
+        return await self.cache.get(key)
+
+    async def _cache_set(self, key: str, value, expiration: int, batch: Optional[CacheBatch] = None):
+        if batch is not None:
+            batch.set(key, value, expiration)
+        else:
+            await self.cache.set(key, value, expiration=expiration)
+
+    def export_allocations(
+        self,
+        employee_id: Optional[str] = None,
+        vehicle_id: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[dict]:
+        """
+        Every allocation matching the history filters, in history order, streamed
+        from a MongoDB cursor `batch_size` documents at a time. Not cached.
+        """
+        query = build_history_query(employee_id, vehicle_id, start_date, end_date)
+        return self.allocation_repo.iter_allocations(query, batch_size=batch_size)
+
+    async def check_employee_booking(
+        self,
+        employee_id: str,
+        booking_date: str,
+        prefetched: Optional[dict] = None,
+        batch: Optional[CacheBatch] = None,
+    ):
+        """
+        `prefetched` holds values already read by _prefetch; writes go to `batch`
+        when given instead of a round trip each.
+
+        Answers are cached as {"generation": ..., "booking": ...} with the
+        employee's history generation, which every booking change bumps (inline
+        or from the change stream worker), so a stale entry is never trusted.
+        "No booking" answers are cached for `negative_ttl` seconds only.
+        """
+        cache_key = employee_booking_key(employee_id, booking_date)
+        generation_key = history_generation_keys(employee_id=employee_id)[0]
+        cached_entry = await self._cache_get(cache_key, prefetched)
+        # Read before querying, so a booking committed meanwhile invalidates what we cache
+        if prefetched is not None and generation_key in prefetched:
+            generation = prefetched[generation_key]
+        else:
+            generation = (await self.cache.get_generations([generation_key]))[0]
+        if is_booking_entry(cached_entry) and cached_entry["generation"] == generation:
+            if cached_entry["booking"]:
+                general_logger.info(
+                    f"Cache hit for employee booking: {employee_id}, date: {booking_date}"
+                )
+            else:
+                general_logger.info(
+                    f"Negative cache hit for employee booking: {employee_id}, date: {booking_date}"
+                )
+            return cached_entry["booking"]
 
-        # Fetch from DB if not in cache
-        existing_booking = (
-            await self.allocation_repo.get_allocation_by_employee_and_date(
+        might_have_booking = None
+        if self.booking_filter is not None:
+            might_have_booking = await self.booking_filter.might_have_booking(
                 employee_id, booking_date
             )
-        )
+
+        if might_have_booking is False:
+            existing_booking = None
+        else:
+            # Fetch from DB if not in cache
+            existing_booking = (
+                await self.allocation_repo.get_allocation_by_employee_and_date(
+                    employee_id, booking_date
+                )
+            )
+            if might_have_booking and not existing_booking:
+                self.booking_filter.record_false_positive()
+
+        entry = {"generation": generation, "booking": existing_booking}
         if existing_booking:
-            await self.cache.set(cache_key, existing_booking, expiration=3600)
+            await self._cache_set(cache_key, entry, 3600, batch)
             general_logger.info(
                 f"Cache set for employee booking: {employee_id} on {booking_date}"
             )
+        elif self.negative_ttl:
+            await self._cache_set(cache_key, entry, self.negative_ttl, batch)
         return existing_booking
 
-    async def check_vehicle_availability(self, vehicle_id: str):
+    async def check_vehicle_availability(
+        self,
+        vehicle_id: str,
+        from_datetime: Optional[datetime] = None,
+        to_datetime: Optional[datetime] = None,
+        exclude_allocation_id: Optional[str] = None,
+        prefetched: Optional[dict] = None,
+        batch: Optional[CacheBatch] = None,
+    ):
         cache_key = f"vehicle:{vehicle_id}:status"
-        cached_vehicle_status = await self.cache.get(cache_key)
+        cached_vehicle_status = await self._cache_get(cache_key, prefetched)
 
         if cached_vehicle_status == "allocated":
             general_logger.warning(
@@ -97,16 +443,73 @@ class AllocationService:
             )
             raise DuplicateBookingError(f"Vehicle {vehicle_id} is already allocated")
 
+        # Reject windows that overlap a known booking without touching MongoDB
+        if from_datetime and to_datetime and not self.availability.is_free(
+            vehicle_id, from_datetime, to_datetime, exclude_allocation_id
+        ):
+            general_logger.warning(
+                f"Vehicle {vehicle_id} is already booked between {from_datetime} and {to_datetime}"
+            )
+            raise VehicleUnavailableError(
+                f"Vehicle {vehicle_id} is already booked between {from_datetime} and {to_datetime}"
+            )
+
         vehicle = await self.vehicle_repo.get_vehicle_by_id(vehicle_id)
         if not vehicle or vehicle.status != "available":
             general_logger.warning(f"Vehicle {vehicle_id} is not available")
             raise VehicleUnavailableError(f"Vehicle {vehicle_id} is not available")
 
         # Cache vehicle status for future use
-        await self.cache.set(cache_key, vehicle.status, expiration=3600)
+        await self._cache_set(cache_key, vehicle.status, 3600, batch)
         general_logger.info(f"Vehicle {vehicle_id} status cached as {vehicle.status}")
         return vehicle
 
+    def _window_record(
+        self, allocation_id: str, from_datetime: datetime, to_datetime: datetime
+    ) -> Optional[dict]:
+        # Only CAS claims read booked_windows; other modes keep the vehicle documents small
+        if self.allocation_mode != "cas":
+            return None
+        return booked_window(allocation_id, from_datetime, to_datetime)
+
+    async def _claim_window(
+        self,
+        vehicle_id: str,
+        from_datetime: datetime,
+        to_datetime: datetime,
+        session,
+        exclude_allocation_id: Optional[str] = None,
+        window: Optional[dict] = None,
+    ):
+        """
+        Authoritative overlap check inside a booking transaction. Touching the
+        vehicle first makes concurrent bookings of it conflict, so only one of
+        them can commit even if both saw a stale availability index.
+
+        In CAS mode the `window` (see _window_record) is claimed on the vehicle
+        instead: booked_windows also holds claims whose allocation is not
+        inserted yet, which the allocations query below cannot see.
+        """
+        if window is None:
+            await self.vehicle_repo.touch_vehicle(vehicle_id, session=session)
+        elif not await self.vehicle_repo.claim_window(vehicle_id, window, session=session):
+            self.allocation_stats["conflicts"] += 1
+            raise VehicleUnavailableError(
+                f"Vehicle {vehicle_id} is not available between {from_datetime} and {to_datetime}"
+            )
+        conflict = await self.allocation_repo.find_overlapping_allocation(
+            vehicle_id,
+            from_datetime,
+            to_datetime,
+            exclude_allocation_id=exclude_allocation_id,
+            session=session,
+        )
+        if conflict:
+            self.allocation_stats["conflicts"] += 1
+            raise VehicleUnavailableError(
+                f"Vehicle {vehicle_id} is already booked between {from_datetime} and {to_datetime}"
+            )
+
     async def allocate_vehicle(
         self,
         employee_id: str,
@@ -115,25 +518,104 @@ class AllocationService:
         to_datetime: str,
         purpose: str,
     ):
+        employee_key = employee_booking_key(employee_id, from_datetime)
+        vehicle_key = f"vehicle:{vehicle_id}:status"
         try:
+            # Both pre-checks read the cache up front; writes go out in one pipeline
+            prefetched = await self._prefetch(
+                [employee_key, vehicle_key], history_generation_keys(employee_id=employee_id)
+            )
+            batch = CacheBatch(self.cache)
+
             # Check if the employee has an existing booking
             existing_booking = await self.check_employee_booking(
-                employee_id, from_datetime
+                employee_id, from_datetime, prefetched=prefetched, batch=batch
             )
             if existing_booking:
                 raise DuplicateBookingError(
                     f"Employee {employee_id} already has a booking on {from_datetime}"
                 )
 
-            # Check if the vehicle is available
-            vehicle = await self.check_vehicle_availability(vehicle_id)
+            # Check if the vehicle is available for the requested window
+            window = to_utc(from_datetime), to_utc(to_datetime)
+            await self.check_vehicle_availability(
+                vehicle_id, *window, prefetched=prefetched, batch=batch
+            )
 
-            # Start transaction to allocate vehicle
-            async with await self.db_client.start_session() as session:
-                async with session.start_transaction():
-                    vehicle.status = "allocated"
-                    await self.vehicle_repo.update_vehicle(vehicle, session=session)
+            allocation = Allocation(
+                employee_id=employee_id,
+                vehicle_id=vehicle_id,
+                from_datetime=from_datetime,
+                to_datetime=to_datetime,
+                purpose=purpose,
+            )
+            await self._book(allocation, window)
+            await self._booked(allocation, window, batch)
+
+            general_logger.info(
+                f"Vehicle {vehicle_id} allocated to employee {employee_id}, cache invalidated"
+            )
+
+            return allocation
+
+        except (DuplicateBookingError, VehicleUnavailableError) as e:
+            general_logger.warning(f"Business rule violation: {e}")
+            error_logger.error(f"Allocation error: {e}")
+            raise
+        except Exception as e:
+            error_logger.error(f"Unexpected error during allocation: {e}")
+            raise
+
+    async def auto_allocate(
+        self,
+        employee_id: str,
+        from_datetime: datetime,
+        to_datetime: datetime,
+        passengers: int = 1,
+        min_capacity: Optional[int] = None,
+        make: Optional[str] = None,
+        model: Optional[str] = None,
+        prefer: str = "best_fit",
+        purpose: Optional[str] = None,
+    ) -> Allocation:
+        """
+        Book the best vehicle free for the window, in one call.
+
+        Candidates come from the fleet index, ranked by `prefer` (see
+        FleetIndex.candidates) and seating max(passengers, min_capacity).
+        Those the availability index shows booked are skipped without a
+        round trip. The rest are booked like allocate_vehicle does, and a
+        claim lost to a concurrent booking moves on to the next candidate,
+        for at most `auto_max_claims` candidates. If the index candidates run
+        out first, the remaining claims go to candidates read from MongoDB
+        (see _free_vehicles_in_db), so a lagging index never refuses a
+        booking some vehicle could take.
+        """
+        employee_key = employee_booking_key(employee_id, from_datetime)
+        try:
+            prefetched = await self._prefetch(
+                [employee_key], history_generation_keys(employee_id=employee_id)
+            )
+            batch = CacheBatch(self.cache)
 
+            existing_booking = await self.check_employee_booking(
+                employee_id, from_datetime, prefetched=prefetched, batch=batch
+            )
+            if existing_booking:
+                raise DuplicateBookingError(
+                    f"Employee {employee_id} already has a booking on {from_datetime}"
+                )
+
+            window = to_utc(from_datetime), to_utc(to_datetime)
+            seats = max(passengers, min_capacity or 0)
+
+            tried = []
+
+            async def book_first(candidates) -> Optional[Allocation]:
+                for vehicle_id in candidates:
+                    if len(tried) == self.auto_max_claims:
+                        return None
+                    tried.append(vehicle_id)
                     allocation = Allocation(
                         employee_id=employee_id,
                         vehicle_id=vehicle_id,
@@ -141,31 +623,215 @@ class AllocationService:
                         to_datetime=to_datetime,
                         purpose=purpose,
                     )
-                    await self.allocation_repo.save_allocation(
-                        allocation, session=session
-                    )
+                    try:
+                        # Status check (cached), then the claim itself
+                        await self.check_vehicle_availability(vehicle_id, *window, batch=batch)
+                        await self._book(allocation, window)
+                    except VehicleUnavailableError:
+                        continue
+                    await self._booked(allocation, window, batch)
+                    return allocation
+                return None
 
-            # Invalidate caches related to vehicle and employee booking
-            await self.cache.delete(f"vehicle:{vehicle_id}:status")
-            await self.cache.delete(f"employee:{employee_id}:booking:{from_datetime}")
-            await self.cache.delete_pattern(
-                f"history:*"
-            )  # Invalidate all history cache
-
-            general_logger.info(
-                f"Vehicle {vehicle_id} allocated to employee {employee_id}, cache invalidated"
+            allocation = await book_first(
+                vehicle_id
+                for vehicle_id in self.fleet.candidates(seats, make, model, prefer)
+                if self.availability.is_free(vehicle_id, *window)
             )
+            if allocation is None and len(tried) < self.auto_max_claims:
+                # The in-process indexes may lag other workers; ask MongoDB before refusing
+                self.allocation_stats["auto_fallbacks"] += 1
+                allocation = await book_first(
+                    await self._free_vehicles_in_db(seats, make, model, prefer, window, exclude=tried)
+                )
+            if allocation is not None:
+                general_logger.info(
+                    f"Vehicle {allocation.vehicle_id} auto-allocated to employee {employee_id} "
+                    f"after {len(tried)} claim(s)"
+                )
+                return allocation
 
-            return allocation
+            raise VehicleUnavailableError(
+                f"No vehicle for {seats} passengers is available between {window[0]} and {window[1]}"
+            )
 
         except (DuplicateBookingError, VehicleUnavailableError) as e:
             general_logger.warning(f"Business rule violation: {e}")
-            error_logger.error(f"Allocation error: {e}")
+            error_logger.error(f"Auto allocation error: {e}")
             raise
         except Exception as e:
-            error_logger.error(f"Unexpected error during allocation: {e}")
+            error_logger.error(f"Unexpected error during auto allocation: {e}")
+            raise
+
+    async def _free_vehicles_in_db(
+        self,
+        seats: int,
+        make: Optional[str],
+        model: Optional[str],
+        prefer: str,
+        window: Tuple[datetime, datetime],
+        exclude: Iterable[str] = (),
+    ) -> List[str]:
+        """
+        auto_allocate candidates read from MongoDB instead of the indexes:
+        available vehicles seating `seats` with no booking overlapping the
+        window, ranked like FleetIndex.candidates. Looks at the first
+        AUTO_FALLBACK_SCAN matching vehicles only.
+        """
+        exclude = set(exclude)
+        vehicles = [
+            vehicle
+            for vehicle in await self.vehicle_repo.find_vehicles(
+                build_vehicle_query("available", make, model, seats), limit=AUTO_FALLBACK_SCAN
+            )
+            if vehicle["vehicle_id"] not in exclude
+        ]
+        if not vehicles:
+            return []
+        busy = {
+            booking["vehicle_id"]
+            for booking in await self.allocation_repo.find_conflicting_allocations(
+                [vehicle["vehicle_id"] for vehicle in vehicles], [], *window
+            )
+            # The query also returns bookings only touching the window's ends
+            if to_utc(booking["from_datetime"]) < window[1]
+            and to_utc(booking["to_datetime"]) > window[0]
+        }
+        ranking = FleetIndex()
+        for vehicle in vehicles:
+            if vehicle["vehicle_id"] not in busy:
+                ranking.add(vehicle)
+        return list(ranking.candidates(seats, make, model, prefer))
+
+    async def _book(self, allocation: Allocation, window: Tuple[datetime, datetime]):
+        """Write the booking in the configured allocation mode, retrying transient aborts."""
+        if self.allocation_mode == "cas":
+            book = self._book_with_claim
+        else:
+            book = self._book_in_transaction
+        await retry_transient(
+            lambda: book(allocation, window),
+            retries=self.max_retries,
+            base_delay=self.retry_base_delay,
+            stats=self.allocation_stats,
+        )
+
+    async def _booked(
+        self, allocation: Allocation, window: Tuple[datetime, datetime], batch: CacheBatch
+    ):
+        """Index a committed booking and flush its cache writes."""
+        await self._index_booked([allocation])
+
+        # Booking leaves the vehicle status untouched; the employee booking and
+        # history caches all follow the generations bumped here
+        if self.inline_invalidation:
+            batch.bump_generations(
+                history_invalidation_keys(
+                    employee_ids=[allocation.employee_id], vehicle_ids=[allocation.vehicle_id]
+                )
+            )
+        if self.booking_filter is not None:
+            self.booking_filter.add(batch, allocation.employee_id, *window)
+        await self._flush_booking_writes(batch)
+        await self._publish_booked_events([allocation])
+
+    async def _flush_booking_writes(self, batch: CacheBatch):
+        """Flush a committed booking's cache writes; the filter handles losing its bits."""
+        if self.booking_filter is not None:
+            await self.booking_filter.flush(batch)
+        else:
+            await batch.flush()
+
+    async def _index_booked(self, allocations: List[Allocation]):
+        """Index committed bookings here and, through IndexSync, in the other workers."""
+        booked = [
+            (
+                allocation.allocation_id,
+                allocation.vehicle_id,
+                allocation.from_datetime,
+                allocation.to_datetime,
+            )
+            for allocation in allocations
+        ]
+        for entry in booked:
+            self.availability.add(*entry)
+        if self.index_sync is not None:
+            await self.index_sync.publish(booked=booked)
+
+    async def _book_in_transaction(self, allocation: Allocation, window: Tuple[datetime, datetime]):
+        self.allocation_stats["attempts"] += 1
+        async with await self.db_client.start_session() as session:
+            async with session.start_transaction():
+                await self._claim_window(
+                    allocation.vehicle_id,
+                    *window,
+                    session=session,
+                    window=self._window_record(allocation.allocation_id, *window),
+                )
+                await self.allocation_repo.save_allocation(allocation, session=session)
+                await self.allocation_repo.increment_daily_usage(
+                    daily_usage(allocation.vehicle_id, *window), session=session
+                )
+                await self._record_booked_events([allocation], session=session)
+
+    async def _book_with_claim(self, allocation: Allocation, window: Tuple[datetime, datetime]):
+        """
+        CAS mode: claim the window on the vehicle document with one conditional
+        write, then insert the allocation and its outbox event, undoing the
+        earlier steps if a later one fails. No multi-document transaction, so
+        contention on a popular vehicle costs a refused claim, not an abort.
+        """
+        self.allocation_stats["attempts"] += 1
+        claimed = await self.vehicle_repo.claim_window(
+            allocation.vehicle_id, booked_window(allocation.allocation_id, *window)
+        )
+        if not claimed:
+            self.allocation_stats["conflicts"] += 1
+            raise VehicleUnavailableError(
+                f"Vehicle {allocation.vehicle_id} is not available between {window[0]} and {window[1]}"
+            )
+
+        saved = False
+        try:
+            await self.allocation_repo.save_allocation(allocation)
+            saved = True
+            await self._record_booked_events([allocation])
+        except Exception as e:
+            self.allocation_stats["compensations"] += 1
+            error_logger.error(f"Undoing allocation {allocation.allocation_id}: {e}")
+            if saved:
+                await self.allocation_repo.delete_allocation(allocation.allocation_id)
+            await self.vehicle_repo.release_window(allocation.vehicle_id, allocation.allocation_id)
             raise
 
+        try:
+            await self.allocation_repo.increment_daily_usage(
+                daily_usage(allocation.vehicle_id, *window)
+            )
+        except Exception as e:
+            # The booking stands; `python -m app.infrastructure.rollups rebuild` repairs the rollups
+            error_logger.error(f"Daily usage not updated for {allocation.allocation_id}: {e}")
+
+    async def _record_booked_events(self, allocations: List[Allocation], session=None):
+        """Write a VehicleBookedEvent per allocation to the outbox, in the caller's transaction."""
+        if self.outbox_repo is None:
+            return
+        await self.outbox_repo.add(
+            [serialize_event(booked_event(allocation)) for allocation in allocations],
+            session=session,
+        )
+
+    async def _publish_booked_events(self, allocations: List[Allocation]):
+        """
+        Queue a VehicleBookedEvent per committed allocation on the event
+        publisher, when there is no outbox to relay them instead. At most once:
+        events still queued when the worker dies are lost.
+        """
+        if self.outbox_repo is not None or self.event_publisher is None:
+            return
+        for allocation in allocations:
+            await self.event_publisher.publish(booked_event(allocation))
+
     async def update_allocation(
         self,
         allocation_id: str,
@@ -174,24 +840,53 @@ class AllocationService:
         to_datetime: Optional[datetime] = None,
         purpose: Optional[str] = None,
     ):
+        batch = CacheBatch(self.cache)
         try:
             async with await self.db_client.start_session() as session:
                 async with session.start_transaction():
-                    allocation_data = await self.allocation_repo.get_allocation_by_id(
+                    # Built from the stored document without re-running the
+                    # "in the future" validators on an existing booking
+                    allocation = await self.allocation_repo.get_allocation(
                         allocation_id, session=session
                     )
-                    if not allocation_data:
+                    if not allocation:
                         raise ValueError(f"Allocation {allocation_id} not found.")
 
-                    allocation = Allocation(**allocation_data)
-
                     if allocation.status != "pending":
                         raise ValueError(
                             "Allocation is already approved and cannot be modified."
                         )
 
-                    if vehicle_id and vehicle_id != allocation.vehicle_id:
-                        await self.check_vehicle_availability(vehicle_id)
+                    previous_vehicle_id = allocation.vehicle_id
+                    previous_window = (
+                        to_utc(allocation.from_datetime),
+                        to_utc(allocation.to_datetime),
+                    )
+                    target_vehicle_id = vehicle_id or allocation.vehicle_id
+                    window = (
+                        to_utc(from_datetime or allocation.from_datetime),
+                        to_utc(to_datetime or allocation.to_datetime),
+                    )
+                    if vehicle_id or from_datetime or to_datetime:
+                        if vehicle_id and vehicle_id != allocation.vehicle_id:
+                            await self.check_vehicle_availability(
+                                vehicle_id,
+                                *window,
+                                exclude_allocation_id=allocation_id,
+                                batch=batch,
+                            )
+                        # Move the booked window recorded for CAS-mode claims
+                        if self.allocation_mode == "cas":
+                            await self.vehicle_repo.release_window(
+                                previous_vehicle_id, allocation_id, session=session
+                            )
+                        await self._claim_window(
+                            target_vehicle_id,
+                            *window,
+                            session=session,
+                            exclude_allocation_id=allocation_id,
+                            window=self._window_record(allocation_id, *window),
+                        )
 
                     # Update allocation fields
                     if vehicle_id:
@@ -206,20 +901,29 @@ class AllocationService:
                     await self.allocation_repo.update_allocation(
                         allocation.dict(by_alias=True), session=session
                     )
-
-                    # Invalidate caches after update
-                    await self.cache.delete(
-                        f"employee:{allocation.employee_id}:booking:{allocation.from_datetime}"
+                    # Move the booking's hours in the daily rollups
+                    await self.allocation_repo.increment_daily_usage(
+                        merge_usage(
+                            daily_usage(previous_vehicle_id, *previous_window, sign=-1)
+                            + daily_usage(target_vehicle_id, *window)
+                        ),
+                        session=session,
                     )
-                    await self.cache.delete(f"vehicle:{allocation.vehicle_id}:status")
-                    await self.cache.delete_pattern(
-                        f"history:*"
-                    )  # Invalidate history cache
 
-                    general_logger.info(
-                        f"Allocation {allocation_id} updated, cache invalidated"
-                    )
+            await self._index_booked([allocation])
 
+            # Invalidate caches once the update is committed, in one round trip
+            if self.inline_invalidation:
+                batch.bump_generations(
+                    history_invalidation_keys(
+                        employee_ids=[allocation.employee_id],
+                        vehicle_ids={previous_vehicle_id, allocation.vehicle_id},
+                    )
+                )
+            if self.booking_filter is not None:
+                self.booking_filter.add(batch, allocation.employee_id, *window)
+            await self._flush_booking_writes(batch)
+            general_logger.info(f"Allocation {allocation_id} updated, cache invalidated")
             return allocation
         except ValueError as e:
             error_logger.error(f"Validation error: {e}")
@@ -228,6 +932,184 @@ class AllocationService:
             error_logger.error(f"Error updating allocation: {e}")
             raise
 
+    async def allocate_vehicles_bulk(self, allocations: List[Allocation]) -> List[dict]:
+        """
+        Allocate a batch of already validated bookings in a single transaction.
+
+        Returns one result per input, in order: {"status": "allocated", "allocation": ...}
+        or {"status": "failed", "code": ..., "message": ...}. Conflicts with stored
+        bookings are found with one $in query per collection, conflicts inside the
+        batch are resolved first-come-first-served, accepted bookings are written
+        with one insert_many and caches are invalidated once for the whole batch.
+        A transaction aborted by a transient error is re-run like single bookings.
+        """
+        results: List[Optional[dict]] = [None] * len(allocations)
+
+        def fail(index: int, code: str, message: str):
+            results[index] = {"status": "failed", "code": code, "message": message}
+
+        # Reject windows the availability index already knows are taken
+        for index, allocation in enumerate(allocations):
+            if not self.availability.is_free(
+                allocation.vehicle_id, allocation.from_datetime, allocation.to_datetime
+            ):
+                fail(
+                    index,
+                    "VEHICLE_UNAVAILABLE",
+                    f"Vehicle {allocation.vehicle_id} is already booked between "
+                    f"{allocation.from_datetime} and {allocation.to_datetime}",
+                )
+
+        pending = [index for index, result in enumerate(results) if result is None]
+        accepted = []
+        try:
+            if pending:
+                vehicle_ids = sorted({allocations[i].vehicle_id for i in pending})
+                employee_ids = sorted({allocations[i].employee_id for i in pending})
+                window_start = min(allocations[i].from_datetime for i in pending)
+                window_end = max(allocations[i].to_datetime for i in pending)
+
+                async def write_batch():
+                    # A retried transaction starts again from the index pre-check
+                    for index in pending:
+                        results[index] = None
+                    accepted.clear()
+                    async with await self.db_client.start_session() as session:
+                        async with session.start_transaction():
+                            vehicles = {
+                                vehicle["vehicle_id"]: vehicle
+                                for vehicle in await self.vehicle_repo.get_vehicles_by_ids(
+                                    vehicle_ids, session=session
+                                )
+                            }
+                            bookable = [
+                                vehicle_id
+                                for vehicle_id in vehicle_ids
+                                if vehicles.get(vehicle_id, {}).get("status") == "available"
+                            ]
+                            # Serialise with concurrent bookings of the same vehicles
+                            await self.vehicle_repo.touch_vehicles(bookable, session=session)
+
+                            by_vehicle = defaultdict(list)
+                            by_employee = defaultdict(list)
+                            for booking in await self.allocation_repo.find_conflicting_allocations(
+                                bookable, employee_ids, window_start, window_end, session=session
+                            ):
+                                window = to_utc(booking["from_datetime"]), to_utc(booking["to_datetime"])
+                                by_vehicle[booking["vehicle_id"]].append(window)
+                                by_employee[booking["employee_id"]].append(window)
+
+                            for index in pending:
+                                allocation = allocations[index]
+                                start, end = allocation.from_datetime, allocation.to_datetime
+                                if allocation.vehicle_id not in bookable:
+                                    fail(
+                                        index,
+                                        "VEHICLE_UNAVAILABLE",
+                                        f"Vehicle {allocation.vehicle_id} is not available",
+                                    )
+                                elif any(
+                                    other_start < end and other_end > start
+                                    for other_start, other_end in by_vehicle[allocation.vehicle_id]
+                                ):
+                                    fail(
+                                        index,
+                                        "VEHICLE_UNAVAILABLE",
+                                        f"Vehicle {allocation.vehicle_id} is already booked "
+                                        f"between {start} and {end}",
+                                    )
+                                elif any(
+                                    other_start <= start <= other_end
+                                    for other_start, other_end in by_employee[allocation.employee_id]
+                                ):
+                                    fail(
+                                        index,
+                                        "DUPLICATE_BOOKING",
+                                        f"Employee {allocation.employee_id} already has a booking "
+                                        f"on {start}",
+                                    )
+                                elif self.allocation_mode == "cas" and not (
+                                    await self.vehicle_repo.claim_window(
+                                        allocation.vehicle_id,
+                                        booked_window(allocation.allocation_id, start, end),
+                                        session=session,
+                                    )
+                                ):
+                                    # Held by a CAS claim whose allocation is not inserted yet
+                                    self.allocation_stats["conflicts"] += 1
+                                    fail(
+                                        index,
+                                        "VEHICLE_UNAVAILABLE",
+                                        f"Vehicle {allocation.vehicle_id} is not available "
+                                        f"between {start} and {end}",
+                                    )
+                                else:
+                                    # Later items in the batch must not overlap this one
+                                    by_vehicle[allocation.vehicle_id].append((start, end))
+                                    by_employee[allocation.employee_id].append((start, end))
+                                    accepted.append(index)
+
+                            if accepted:
+                                await self.allocation_repo.save_allocations(
+                                    [allocations[index] for index in accepted], session=session
+                                )
+                                await self.allocation_repo.increment_daily_usage(
+                                    merge_usage(
+                                        row
+                                        for index in accepted
+                                        for row in daily_usage(
+                                            allocations[index].vehicle_id,
+                                            allocations[index].from_datetime,
+                                            allocations[index].to_datetime,
+                                        )
+                                    ),
+                                    session=session,
+                                )
+                                await self._record_booked_events(
+                                    [allocations[index] for index in accepted], session=session
+                                )
+
+                await retry_transient(
+                    write_batch,
+                    retries=self.max_retries,
+                    base_delay=self.retry_base_delay,
+                    stats=self.allocation_stats,
+                )
+        except Exception as e:
+            error_logger.error(f"Unexpected error during bulk allocation: {e}")
+            raise
+
+        await self._index_booked([allocations[index] for index in accepted])
+        for index in accepted:
+            results[index] = {"status": "allocated", "allocation": allocations[index]}
+
+        if accepted:
+            # One invalidation for the whole batch
+            batch = CacheBatch(self.cache)
+            if self.inline_invalidation:
+                batch.bump_generations(
+                    history_invalidation_keys(
+                        employee_ids={allocations[index].employee_id for index in accepted},
+                        vehicle_ids={allocations[index].vehicle_id for index in accepted},
+                    )
+                )
+            if self.booking_filter is not None:
+                for index in accepted:
+                    allocation = allocations[index]
+                    self.booking_filter.add(
+                        batch,
+                        allocation.employee_id,
+                        allocation.from_datetime,
+                        allocation.to_datetime,
+                    )
+            await self._flush_booking_writes(batch)
+            await self._publish_booked_events([allocations[index] for index in accepted])
+
+        general_logger.info(
+            f"Bulk allocation: {len(accepted)} of {len(allocations)} bookings allocated"
+        )
+        return results
+
     async def get_allocation_history(self, employee_id: str) -> List[Allocation]:
         try:
             allocations = await self.allocation_repo.get_allocations_by_employee(
@@ -245,37 +1127,208 @@ class AllocationService:
 
 
 class VehicleService:
-    def __init__(self, vehicle_repo: VehicleRepository, cache):
+    def __init__(
+        self,
+        vehicle_repo: VehicleRepository,
+        cache,
+        availability: Optional[AvailabilityIndex] = None,
+        inline_invalidation: bool = True,
+        fleet: Optional[FleetIndex] = None,
+        index_sync=None,
+    ):
         self.vehicle_repo = vehicle_repo  # Inject the repository
         self.cache = cache
+        # False when the change stream worker invalidates caches instead
+        self.inline_invalidation = inline_invalidation
+        # Booked windows per vehicle, shared with AllocationService
+        self.availability = availability if availability is not None else AvailabilityIndex()
+        # Available vehicles ranked for auto-assignment, shared with AllocationService
+        self.fleet = fleet if fleet is not None else FleetIndex()
+        # Carries fleet updates to the other workers; None keeps them local
+        self.index_sync = index_sync
+
+    async def get_available_vehicles(
+        self,
+        from_datetime: Optional[datetime] = None,
+        to_datetime: Optional[datetime] = None,
+        make: Optional[str] = None,
+        model: Optional[str] = None,
+        min_capacity: Optional[int] = None,
+        size: int = 50,
+        cursor: Optional[str] = None,
+        fields: Optional[str] = None,
+        daily_start: Optional[time_of_day] = None,
+        daily_end: Optional[time_of_day] = None,
+        match: str = "all",
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        One page (vehicles, next_cursor) of available vehicles in vehicle_id order.
+        With a window, vehicles booked during it are skipped using the
+        availability index, reading further batches until the page is full.
+        With `daily_start`/`daily_end` as well, the window only picks the days,
+        and vehicles must be free between those times on all of them (or any
+        of them, with `match="any"`), checked against the slot bitmaps.
+        """
+        query = build_vehicle_query("available", make, model, min_capacity)
+        keep = None
+        if from_datetime and to_datetime and daily_start and daily_end:
+            days = window_days(from_datetime, to_datetime)
 
-    async def get_available_vehicles(self) -> List[Vehicle]:
-        return await self.vehicle_repo.get_vehicles_by_status("available")
+            def keep(vehicle_ids):
+                return set(
+                    self.availability.free_vehicles_daily(
+                        vehicle_ids, days, daily_start, daily_end, match
+                    )
+                )
+
+        elif from_datetime and to_datetime:
+            # One in-memory lookup per candidate instead of a query each
+            def keep(vehicle_ids):
+                return set(self.availability.free_vehicles(vehicle_ids, from_datetime, to_datetime))
 
-    async def get_all_vehicles(self) -> List[Vehicle]:
-        return await self.vehicle_repo.get_all_vehicles()
+        return await self._vehicle_page(query, size, cursor, fields, keep)
+
+    async def get_all_vehicles(
+        self,
+        make: Optional[str] = None,
+        model: Optional[str] = None,
+        min_capacity: Optional[int] = None,
+        size: int = 50,
+        cursor: Optional[str] = None,
+        fields: Optional[str] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """One page (vehicles, next_cursor) of vehicles in vehicle_id order."""
+        query = build_vehicle_query(make=make, model=model, min_capacity=min_capacity)
+        return await self._vehicle_page(query, size, cursor, fields)
+
+    async def _vehicle_page(
+        self,
+        query: dict,
+        size: int,
+        cursor: Optional[str],
+        fields: Optional[str] = None,
+        keep=None,
+    ):
+        # Keyset pagination: each batch resumes after the last vehicle read, so the
+        # cost of a page does not grow with the fleet or with how deep the page is
+        after = decode_vehicle_cursor(cursor)
+        selected = parse_fields(fields, VEHICLE_FIELDS)
+        projection = None  # The repository's default hides the CAS bookkeeping fields
+        if selected is not None:
+            projection = to_projection(selected, required=("vehicle_id",))
+        page = []
+        while True:
+            # Fetch one extra row to learn whether another page follows
+            vehicles = await self.vehicle_repo.find_vehicles(
+                query, limit=size + 1, after=after, projection=projection
+            )
+            if keep is None:
+                page.extend(vehicles)
+            else:
+                free = keep(vehicle["vehicle_id"] for vehicle in vehicles)
+                page.extend(vehicle for vehicle in vehicles if vehicle["vehicle_id"] in free)
+            if len(page) > size or len(vehicles) <= size:
+                break
+            after = vehicles[-1]["vehicle_id"]
+
+        next_cursor = None
+        if len(page) > size:
+            page = page[:size]
+            next_cursor = encode_vehicle_cursor(page[-1]["vehicle_id"])
+        return trim(page, selected), next_cursor
 
     async def add_vehicle(self, vehicle: Vehicle):
         if not vehicle.current_driver_id and vehicle.status == "available":
             raise ValueError("A vehicle must have a driver if it is available.")
 
         await self.vehicle_repo.add_vehicle(vehicle)
-        # Invalidate cache for vehicle and history
-        await self.cache.delete(f"vehicle:{vehicle.vehicle_id}:status")
-        await self.cache.delete_pattern(f"history:*")  # Invalidate history cache
+        await self._index_vehicle(vehicle)
+        # Invalidate the cached vehicle status
+        await self._invalidate_vehicle(vehicle.vehicle_id)
 
     async def update_vehicle(self, vehicle: Vehicle):
         if not vehicle.current_driver_id and vehicle.status == "available":
             raise ValueError("A vehicle must have a driver if it is available.")
         await self.vehicle_repo.update_vehicle(vehicle)
-        # Invalidate cache for vehicle and history
-        await self.cache.delete(f"vehicle:{vehicle.vehicle_id}:status")
-        await self.cache.delete_pattern(f"history:*")  # Invalidate history cache
+        await self._index_vehicle(vehicle)
+        # Invalidate the cached vehicle status
+        await self._invalidate_vehicle(vehicle.vehicle_id)
 
     async def update_vehicle_status(self, vehicle_id: str, status: str):
         vehicle = await self.vehicle_repo.get_vehicle_by_id(vehicle_id)
         vehicle.status = status
         await self.vehicle_repo.update_vehicle(vehicle)
+        await self._index_vehicle(vehicle)
         # Invalidate cache after status update
-        await self.cache.delete(f"vehicle:{vehicle_id}:status")
-        await self.cache.delete_pattern(f"history:*")  # Invalidate history cache
+        await self._invalidate_vehicle(vehicle_id)
+
+    async def _index_vehicle(self, vehicle: Vehicle):
+        """Re-rank a written vehicle here and, through IndexSync, in the other workers."""
+        self.fleet.add(vehicle)
+        if self.index_sync is not None:
+            await self.index_sync.publish(vehicles=[vehicle])
+
+    async def _invalidate_vehicle(self, vehicle_id: str):
+        if not self.inline_invalidation:
+            return
+        async with CacheBatch(self.cache) as batch:
+            # History pages embed no vehicle fields; only allocation writes bump them
+            batch.delete(f"vehicle:{vehicle_id}:status")
+
+
+class ReportService:
+    """
+    Utilization reports over a [start, end) window, aggregated by MongoDB.
+
+    Results are cached under keys scoped to the report window and to the
+    global history generation, which every booking change bumps.
+    """
+
+    def __init__(self, report_repo, cache):
+        self.report_repo = report_repo
+        self.cache = cache
+        # Concurrent requests for the same uncached report share one aggregation
+        self.flights = SingleFlight()
+
+    async def _cached_report(self, name: str, start, end, compute, *params):
+        start, end = to_utc(start), to_utc(end)
+        if start >= end:
+            raise ValueError("'from' must be earlier than 'to'.")
+        if end - start > REPORT_MAX_WINDOW:
+            raise ValueError(f"Report windows are limited to {REPORT_MAX_WINDOW.days} days.")
+
+        (generation,) = await self.cache.get_generations(history_generation_keys())
+        cache_key = f"report:{name}:{generation}:{start.isoformat()}:{end.isoformat()}"
+        cache_key += "".join(f":{param}" for param in params)
+
+        cached_report = await self.cache.get(cache_key)
+        if cached_report is not None:
+            general_logger.info(f"Cache hit for key: {cache_key}")
+            return cached_report
+
+        async def build():
+            rows = await compute(start, end, *params)
+            await self.cache.set(cache_key, rows, expiration=REPORT_CACHE_TTL)
+            return rows
+
+        return await self.flights.do(cache_key, build)
+
+    async def vehicle_daily_bookings(self, start, end) -> List[dict]:
+        return await self._cached_report(
+            "vehicle_daily_bookings", start, end, self.report_repo.vehicle_daily_bookings
+        )
+
+    async def vehicle_utilization(self, start, end) -> List[dict]:
+        return await self._cached_report(
+            "vehicle_utilization", start, end, self.report_repo.vehicle_utilization
+        )
+
+    async def top_employees(self, start, end, limit: int = 10) -> List[dict]:
+        return await self._cached_report(
+            "top_employees", start, end, self.report_repo.top_employees, limit
+        )
+
+    async def booking_durations(self, start, end) -> List[dict]:
+        return await self._cached_report(
+            "booking_durations", start, end, self.report_repo.booking_durations
+        )
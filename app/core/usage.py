@@ -0,0 +1,46 @@
+from datetime import datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Tuple, Union
+from app.core.availability import booking_days, to_utc
+
+
+def daily_usage(
+    vehicle_id: str,
+    from_datetime: Union[str, datetime],
+    to_datetime: Union[str, datetime],
+    sign: int = 1,
+) -> List[dict]:
+    """
+    `daily_vehicle_usage` increments for one booking: the booking counts on
+    the UTC day it starts, and its time is split across the days it covers.
+    Pass sign=-1 to take a booking back out.
+    """
+    start, end = to_utc(from_datetime), to_utc(to_datetime)
+    rows = []
+    for day in booking_days(start, end):
+        day_start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+        overlap = min(end, day_start + timedelta(days=1)) - max(start, day_start)
+        booked_ms = int(overlap.total_seconds() * 1000)
+        bookings = 1 if day == start.date() else 0
+        if booked_ms > 0 or bookings:
+            rows.append(
+                {
+                    "vehicle_id": vehicle_id,
+                    "day": day.isoformat(),
+                    "bookings": sign * bookings,
+                    "booked_ms": sign * booked_ms,
+                }
+            )
+    return rows
+
+
+def merge_usage(rows: Iterable[dict]) -> List[dict]:
+    """Sum increments per (vehicle_id, day), dropping the ones that cancel out."""
+    merged: Dict[Tuple[str, str], dict] = {}
+    for row in rows:
+        key = (row["vehicle_id"], row["day"])
+        if key not in merged:
+            merged[key] = dict(row)
+        else:
+            merged[key]["bookings"] += row["bookings"]
+            merged[key]["booked_ms"] += row["booked_ms"]
+    return [row for row in merged.values() if row["bookings"] or row["booked_ms"]]
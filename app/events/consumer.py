@@ -1,21 +1,226 @@
-import boto3
+"""
+Consumer runtime for the domain events delivered to a queue.
 
-sns_client = boto3.client("sns")
+Long-polls the queue for full batches, hands each message to a bounded pool
+of async workers and acks handled messages with batched deletes. Messages for
+the same vehicle always go to the same worker, so they are handled in the
+order they were received. Run one or more per deployment:
+
+    python -m app.events.consumer
+"""
+import asyncio
+import json
+import logging
+import logging.config
+import sys
+import time
+import zlib
+from typing import Awaitable, Callable, List, Optional, Tuple
+from app.events.publisher import collect_batch
+
+# Set up logging
+general_logger = logging.getLogger("appLogger")  # For general logs
+error_logger = logging.getLogger("errorLogger")  # For error logs
+
+EventHandler = Callable[[Optional[str], dict], Awaitable[None]]
+
+
+def parse_message(body: str) -> Tuple[Optional[str], dict]:
+    """(subject, payload) of a message body, unwrapping the SNS envelope unless raw delivery is on."""
+    data = json.loads(body)
+    if isinstance(data, dict) and data.get("Type") == "Notification":
+        return data.get("Subject"), json.loads(data["Message"])
+    return None, data
+
+
+async def log_event(subject: Optional[str], payload: dict):
+    general_logger.info(f"Received {subject or 'event'} {payload.get('event_id')}: {payload}")
 
 
 class EventConsumer:
-    def __init__(self, sns_subscription_arn: str):
-        self.sns_subscription_arn = sns_subscription_arn  # AWS SNS Subscription ARN
-
-    def consume_vehicle_booked_event(self):
-        # This method will receive the event and handle it
-        # Example: notify the driver or log the booking
-
-        response = sns_client.receive_message(QueueUrl=self.sns_subscription_arn)
-        for message in response.get("Messages", []):
-            print(f"Received VehicleBookedEvent: {message['Body']}")
-            # Handle the event (e.g., notify driver, update logs, etc.)
-            sns_client.delete_message(
-                QueueUrl=self.sns_subscription_arn,
-                ReceiptHandle=message["ReceiptHandle"],
-            )
+    """
+    Backpressure: at most `max_in_flight` messages are received but not yet
+    handled. When handlers fall behind the poller stops receiving, and the
+    rest stay in the queue instead of piling up in memory. A message whose
+    handler raises is not acked; the queue delivers it again once its
+    visibility timeout lapses, possibly after later messages for its vehicle.
+    """
+
+    def __init__(
+        self,
+        queue,
+        handler: EventHandler = log_event,
+        workers: int = 8,
+        max_in_flight: int = 100,
+        wait_seconds: float = 20,
+        ack_interval: float = 0.1,
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.batch_size = getattr(queue, "max_batch", 10)
+        self.wait_seconds = wait_seconds  # Long-poll duration of each receive
+        self.ack_interval = ack_interval  # Longest a partial batch of acks waits
+        self._capacity = asyncio.Semaphore(max_in_flight)
+        self._shards: List[asyncio.Queue] = [asyncio.Queue() for _ in range(workers)]
+        self._acks: asyncio.Queue = asyncio.Queue()
+        self._poller: Optional[asyncio.Task] = None
+        self._tasks: List[asyncio.Task] = []
+        self._started_at: Optional[float] = None
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+        self.poisoned = 0  # Unparseable messages, acked without reaching the handler
+        self.acked = 0
+        self.ack_failures = 0
+        self.lag_last = 0.0  # Seconds from send to receive of the latest message
+        self.lag_max = 0.0
+        self.handler_seconds = 0.0
+
+    def shard_of(self, payload: dict, message: dict) -> int:
+        key = payload.get("vehicle_id") or message["id"]
+        return zlib.crc32(str(key).encode()) % len(self._shards)
+
+    async def start(self):
+        if self._poller is not None:
+            return
+        self._started_at = time.monotonic()
+        self._tasks = [asyncio.create_task(self._work(shard)) for shard in self._shards]
+        self._tasks.append(asyncio.create_task(self._ack()))
+        self._poller = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        """Stop receiving, finish the messages already received and flush their acks."""
+        if self._poller is None:
+            return
+        self._poller.cancel()
+        try:
+            await self._poller
+        except asyncio.CancelledError:
+            pass
+        self._poller = None
+        for shard in self._shards:
+            await shard.join()
+        await self._acks.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run(self):
+        """Consume until cancelled."""
+        await self.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
+
+    async def _poll(self):
+        backoff = 0.5
+        while True:
+            # Receive only as many messages as there is room for
+            await self._capacity.acquire()
+            reserved = 1
+            while reserved < self.batch_size and not self._capacity.locked():
+                await self._capacity.acquire()
+                reserved += 1
+            try:
+                messages = await self.queue.receive(reserved, self.wait_seconds)
+                backoff = 0.5
+            except asyncio.CancelledError:
+                for _ in range(reserved):
+                    self._capacity.release()
+                raise
+            except Exception as e:
+                error_logger.error(f"Event consumer receive failed: {e}")
+                messages = []
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            for _ in range(reserved - len(messages)):
+                self._capacity.release()
+
+            now = time.time()
+            for message in messages:
+                self.received += 1
+                if message.get("sent_at"):
+                    self.lag_last = max(now - message["sent_at"], 0.0)
+                    self.lag_max = max(self.lag_max, self.lag_last)
+                try:
+                    subject, payload = parse_message(message["body"])
+                    if not isinstance(payload, dict):
+                        raise TypeError(f"payload is a {type(payload).__name__}, not an object")
+                    shard = self.shard_of(payload, message)
+                except Exception as e:
+                    # Poison message: ack it so it is not redelivered forever
+                    error_logger.error(f"Dropping unparseable message {message.get('id')}: {e}")
+                    self.failed += 1
+                    self.poisoned += 1
+                    self._capacity.release()
+                    await self._acks.put(message)
+                    continue
+                await self._shards[shard].put((message, subject, payload))
+
+    async def _work(self, shard: asyncio.Queue):
+        while True:
+            message, subject, payload = await shard.get()
+            started = time.monotonic()
+            try:
+                await self.handler(subject, payload)
+            except Exception as e:
+                self.failed += 1
+                error_logger.error(f"Handler failed for message {message['id']}: {e}")
+            else:
+                self.processed += 1
+                await self._acks.put(message)
+            finally:
+                self.handler_seconds += time.monotonic() - started
+                self._capacity.release()
+                shard.task_done()
+
+    async def _ack(self):
+        while True:
+            messages = await collect_batch(self._acks, self.batch_size, self.ack_interval)
+            try:
+                failed = await self.queue.delete_batch(messages)
+            except Exception as e:
+                error_logger.error(f"Event consumer ack of {len(messages)} messages failed: {e}")
+                failed = [message["id"] for message in messages]
+            self.acked += len(messages) - len(failed)
+            self.ack_failures += len(failed)
+            for _ in messages:
+                self._acks.task_done()
+
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        handled = self.processed + self.failed
+        return {
+            "received": self.received,
+            "processed": self.processed,
+            "failed": self.failed,
+            "poisoned": self.poisoned,
+            "acked": self.acked,
+            "ack_failures": self.ack_failures,
+            "in_flight": self.received - handled,
+            "throughput_per_second": self.processed / elapsed if elapsed else 0.0,
+            "lag_seconds": self.lag_last,
+            "max_lag_seconds": self.lag_max,
+            "mean_handler_seconds": self.handler_seconds / handled if handled else 0.0,
+        }
+
+
+async def main(argv=None) -> int:
+    from app.events.queues import get_event_queue
+    from app.infrastructure.config import settings
+
+    logging.config.fileConfig("logging.conf")
+    consumer = EventConsumer(
+        get_event_queue(settings),
+        workers=settings.EVENTS_CONSUMER_WORKERS,
+        max_in_flight=settings.EVENTS_CONSUMER_MAX_IN_FLIGHT,
+    )
+    general_logger.info(f"Event consumer started ({settings.EVENTS_QUEUE} queue)")
+    await consumer.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,116 @@
+"""
+Relay of the transactional outbox to the event transport.
+
+Bookings write their events to the `outbox` collection inside the booking
+transaction; this worker drains it in batches, sends each batch to the
+transport selected by EVENTS_TRANSPORT and stamps the delivered entries with
+one bulk_write. Entries are sent before they are marked, so a crash in between
+sends them again: delivery is at-least-once and consumers dedupe on the event
+id. Run one per deployment:
+
+    python -m app.events.outbox_relay
+"""
+import asyncio
+import logging
+import logging.config
+import sys
+from typing import List
+
+# Set up logging
+general_logger = logging.getLogger("appLogger")  # For general logs
+error_logger = logging.getLogger("errorLogger")  # For error logs
+
+
+class OutboxRelay:
+    def __init__(
+        self,
+        outbox_repo,
+        transport,
+        batch_size: int = 500,
+        max_concurrency: int = 4,
+        poll_interval: float = 0.5,
+        max_attempts: int = 10,
+    ):
+        self.outbox_repo = outbox_repo
+        self.transport = transport
+        self.batch_size = batch_size  # Entries read (and marked) per round trip
+        self.max_concurrency = max_concurrency  # Transport calls in flight at once
+        self.poll_interval = poll_interval  # Seconds to sleep when the outbox is empty
+        self.max_attempts = max_attempts  # Sends of one entry before it is left pending for good
+        self.relayed = 0
+        self.failed = 0
+
+    async def _send(self, chunk: List[dict], slots: asyncio.Semaphore) -> List[str]:
+        async with slots:
+            try:
+                return await self.transport.send(chunk)
+            except Exception as e:
+                error_logger.error(f"Outbox relay failed to send {len(chunk)} events: {e}")
+                return [entry["id"] for entry in chunk]
+
+    async def relay_once(self) -> int:
+        """Send one batch of pending entries; returns how many were read."""
+        documents = await self.outbox_repo.get_pending(self.batch_size, self.max_attempts)
+        if not documents:
+            return 0
+        entries = [
+            {"id": document["_id"], "subject": document["subject"], "body": document["body"]}
+            for document in documents
+        ]
+        size = getattr(self.transport, "max_batch", len(entries))
+        slots = asyncio.Semaphore(self.max_concurrency)
+        results = await asyncio.gather(
+            *(self._send(entries[i : i + size], slots) for i in range(0, len(entries), size))
+        )
+        failed_ids = {entry_id for failed in results for entry_id in failed}
+        published_ids = [entry["id"] for entry in entries if entry["id"] not in failed_ids]
+        await self.outbox_repo.mark(published_ids, sorted(failed_ids))
+        self.relayed += len(published_ids)
+        self.failed += len(failed_ids)
+        return len(documents)
+
+    async def run(self):
+        """Drain the outbox until cancelled; failed entries are retried on the next pass."""
+        backoff = self.poll_interval
+        while True:
+            try:
+                read = await self.relay_once()
+                backoff = self.poll_interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error_logger.error(f"Outbox relay error: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            if read < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    def stats(self) -> dict:
+        return {"relayed": self.relayed, "failed": self.failed}
+
+
+async def main(argv=None) -> int:
+    from app.events.transports import get_event_transport
+    from app.infrastructure.config import settings
+    from app.infrastructure.db import OutboxRepository, get_db
+
+    logging.config.fileConfig("logging.conf")
+    db_client, db = get_db(settings)
+    relay = OutboxRelay(
+        OutboxRepository(db),
+        get_event_transport(settings),
+        batch_size=settings.EVENTS_OUTBOX_BATCH_SIZE,
+        max_concurrency=settings.EVENTS_MAX_CONCURRENCY,
+        max_attempts=settings.EVENTS_OUTBOX_MAX_ATTEMPTS,
+    )
+    general_logger.info(f"Outbox relay started ({settings.EVENTS_TRANSPORT} transport)")
+    try:
+        await relay.run()
+    finally:
+        db_client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -1,24 +1,148 @@
-import boto3
+import asyncio
+import logging
+import random
+from typing import List, Optional, Set
+from pydantic import BaseModel
 from app.core.events import VehicleBookedEvent, VehicleMaintenanceEvent
 
-sns_client = boto3.client('sns')
+# Set up logging
+general_logger = logging.getLogger("appLogger")  # For general logs
+error_logger = logging.getLogger("errorLogger")  # For error logs
+
+
+def serialize_event(event: BaseModel) -> dict:
+    """One transport entry: the event id, its type as the subject and a JSON body."""
+    return {
+        "id": event.event_id,
+        "subject": type(event).__name__,
+        "body": event.model_dump_json(),
+    }
+
+
+async def collect_batch(queue: asyncio.Queue, size: int, linger: float) -> list:
+    """Wait for one item, then take up to `size` items, waiting at most `linger` seconds for more."""
+    batch = [await queue.get()]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + linger
+    while len(batch) < size:
+        try:
+            batch.append(queue.get_nowait())
+            continue
+        except asyncio.QueueEmpty:
+            pass
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), remaining))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
 
 class EventPublisher:
-    def __init__(self, sns_topic_arn: str):
-        self.sns_topic_arn = sns_topic_arn  # AWS SNS Topic ARN
-
-    def publish_vehicle_booked_event(self, event: VehicleBookedEvent):
-        response = sns_client.publish(
-            TopicArn=self.sns_topic_arn,
-            Message=str(event.dict()),
-            Subject="VehicleBookedEvent"
-        )
-        return response
-
-    def publish_vehicle_maintenance_event(self, event: VehicleMaintenanceEvent):
-        response = sns_client.publish(
-            TopicArn=self.sns_topic_arn,
-            Message=str(event.dict()),
-            Subject="VehicleMaintenanceEvent"
-        )
-        return response
+    """
+    Queues events in memory and publishes them in batches from a background task.
+
+    `publish()` only waits when the queue is full, so a slow or unavailable
+    transport pushes back on callers instead of growing memory without bound.
+    Up to `max_concurrency` batches are in flight at once; entries the transport
+    rejects (or the whole batch, if it raises) are retried with exponential
+    backoff and dropped, with an error log, after `max_retries` retries.
+    """
+
+    def __init__(
+        self,
+        transport,
+        max_queue: int = 10000,
+        batch_size: int = 10,
+        flush_interval: float = 0.05,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        retry_backoff: float = 0.1,
+    ):
+        self.transport = transport
+        self.batch_size = min(batch_size, getattr(transport, "max_batch", batch_size))
+        self.flush_interval = flush_interval  # Longest a partial batch waits for more events
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._sends: Set[asyncio.Task] = set()
+        self._runner: Optional[asyncio.Task] = None
+        self.published = 0
+        self.failed = 0
+        self.retried = 0
+        self.batches = 0
+
+    async def start(self):
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Publish everything already queued, then stop the background task."""
+        if self._runner is None:
+            return
+        await self._queue.join()
+        self._runner.cancel()
+        try:
+            await self._runner
+        except asyncio.CancelledError:
+            pass
+        self._runner = None
+        general_logger.info(f"Event publisher closed after {self.published} events")
+
+    async def publish(self, event: BaseModel):
+        await self._queue.put(serialize_event(event))
+
+    async def publish_vehicle_booked_event(self, event: VehicleBookedEvent):
+        await self.publish(event)
+
+    async def publish_vehicle_maintenance_event(self, event: VehicleMaintenanceEvent):
+        await self.publish(event)
+
+    async def _run(self):
+        while True:
+            batch = await collect_batch(self._queue, self.batch_size, self.flush_interval)
+            await self._slots.acquire()
+            task = asyncio.create_task(self._send(batch))
+            self._sends.add(task)
+            task.add_done_callback(self._sends.discard)
+
+    async def _send(self, batch: List[dict]):
+        try:
+            pending = batch
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    self.retried += len(pending)
+                    await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1) * (0.5 + random.random()))
+                try:
+                    failed_ids = set(await self.transport.send(pending))
+                except Exception as e:
+                    error_logger.error(f"Event batch of {len(pending)} failed: {e}")
+                    failed_ids = {entry["id"] for entry in pending}
+                self.published += len(pending) - len(failed_ids)
+                pending = [entry for entry in pending if entry["id"] in failed_ids]
+                if not pending:
+                    break
+            if pending:
+                self.failed += len(pending)
+                error_logger.error(
+                    f"Dropped {len(pending)} events after {self.max_retries} retries: "
+                    f"{[entry['id'] for entry in pending]}"
+                )
+            self.batches += 1
+        finally:
+            self._slots.release()
+            for _ in batch:
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "in_flight": len(self._sends),
+            "batches": self.batches,
+            "published": self.published,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
@@ -0,0 +1,149 @@
+"""
+Queues the event consumer reads from.
+
+Every queue long-polls for up to `max_messages` messages ({"id", "receipt",
+"body", "sent_at"}) and deletes acked messages in batches, returning the ids
+it could not delete. SQS is the production queue (subscribed to the SNS
+topic); the in-memory queue stands in for it in tests and load tests.
+"""
+import asyncio
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+# Set up logging
+error_logger = logging.getLogger("errorLogger")  # For error logs
+
+# ReceiveMessage and DeleteMessageBatch accept at most this many messages per call
+SQS_MAX_BATCH = 10
+SQS_MAX_WAIT_SECONDS = 20
+
+
+class SQSQueue:
+    """An SQS queue, with boto3 run in worker threads to keep it off the event loop."""
+
+    max_batch = SQS_MAX_BATCH
+
+    def __init__(self, queue_url: str, client=None, visibility_timeout: Optional[int] = None):
+        self.queue_url = queue_url
+        self.visibility_timeout = visibility_timeout  # Falls back to the queue's setting
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("sqs")
+        return self._client
+
+    async def receive(
+        self, max_messages: int = SQS_MAX_BATCH, wait_seconds: float = SQS_MAX_WAIT_SECONDS
+    ) -> List[dict]:
+        params = {
+            "QueueUrl": self.queue_url,
+            "MaxNumberOfMessages": min(max_messages, SQS_MAX_BATCH),
+            "WaitTimeSeconds": int(min(wait_seconds, SQS_MAX_WAIT_SECONDS)),
+            "AttributeNames": ["SentTimestamp"],
+        }
+        if self.visibility_timeout is not None:
+            params["VisibilityTimeout"] = self.visibility_timeout
+        response = await asyncio.to_thread(self.client.receive_message, **params)
+        return [
+            {
+                "id": message["MessageId"],
+                "receipt": message["ReceiptHandle"],
+                "body": message["Body"],
+                "sent_at": int(message.get("Attributes", {}).get("SentTimestamp", 0)) / 1000,
+            }
+            for message in response.get("Messages", [])
+        ]
+
+    async def delete_batch(self, messages: List[dict]) -> List[str]:
+        response = await asyncio.to_thread(
+            self.client.delete_message_batch,
+            QueueUrl=self.queue_url,
+            Entries=[
+                {"Id": str(index), "ReceiptHandle": message["receipt"]}
+                for index, message in enumerate(messages)
+            ],
+        )
+        failed = []
+        for failure in response.get("Failed", []):
+            message = messages[int(failure["Id"])]
+            error_logger.error(f"SQS failed to delete message {message['id']}: {failure.get('Code')}")
+            failed.append(message["id"])
+        return failed
+
+
+class InMemoryQueue:
+    """
+    An SQS-like queue in process memory: received messages stay invisible for
+    `visibility_timeout` seconds and are delivered again unless deleted.
+    """
+
+    max_batch = SQS_MAX_BATCH
+
+    def __init__(self, visibility_timeout: float = 30.0):
+        self.visibility_timeout = visibility_timeout
+        self._visible: deque = deque()
+        self._in_flight: Dict[str, tuple] = {}  # receipt -> (deadline, message)
+        self._receipts = itertools.count()
+        self._available = asyncio.Event()
+        self.deleted = 0
+
+    def put(self, body: str, message_id: Optional[str] = None, sent_at: Optional[float] = None):
+        message_id = message_id or f"msg-{next(self._receipts)}"
+        self._visible.append({"id": message_id, "body": body, "sent_at": sent_at or time.time()})
+        self._available.set()
+
+    def __len__(self):
+        return len(self._visible) + len(self._in_flight)
+
+    def _requeue_expired(self):
+        now = time.monotonic()
+        for receipt, (deadline, message) in list(self._in_flight.items()):
+            if deadline <= now:
+                del self._in_flight[receipt]
+                self._visible.appendleft(message)
+
+    async def receive(
+        self, max_messages: int = SQS_MAX_BATCH, wait_seconds: float = SQS_MAX_WAIT_SECONDS
+    ) -> List[dict]:
+        self._requeue_expired()
+        if not self._visible:
+            self._available.clear()
+            try:
+                await asyncio.wait_for(self._available.wait(), wait_seconds)
+            except asyncio.TimeoutError:
+                return []
+        messages = []
+        deadline = time.monotonic() + self.visibility_timeout
+        while self._visible and len(messages) < min(max_messages, SQS_MAX_BATCH):
+            message = self._visible.popleft()
+            receipt = f"r-{next(self._receipts)}"
+            self._in_flight[receipt] = (deadline, message)
+            messages.append(dict(message, receipt=receipt))
+        return messages
+
+    async def delete_batch(self, messages: List[dict]) -> List[str]:
+        failed = []
+        for message in messages:
+            if self._in_flight.pop(message["receipt"], None) is None:
+                failed.append(message["id"])  # Visibility expired; it was requeued
+            else:
+                self.deleted += 1
+        return failed
+
+
+def get_event_queue(settings):
+    """The queue named by EVENTS_QUEUE: "sqs" (EVENTS_QUEUE_URL) or "memory"."""
+    if settings.EVENTS_QUEUE == "sqs":
+        if not settings.EVENTS_QUEUE_URL:
+            raise ValueError("EVENTS_QUEUE=sqs requires EVENTS_QUEUE_URL")
+        return SQSQueue(settings.EVENTS_QUEUE_URL)
+    if settings.EVENTS_QUEUE == "memory":
+        return InMemoryQueue()
+    raise ValueError(f"Unknown EVENTS_QUEUE {settings.EVENTS_QUEUE!r}")
@@ -0,0 +1,102 @@
+"""
+Where the event publisher sends its batches.
+
+Every transport takes a batch of serialized entries ({"id", "subject", "body"})
+and returns the ids that were not delivered, so the publisher can retry them.
+SNS is the production transport; the in-memory and file sinks stand in for it
+in tests, benchmarks and local runs.
+"""
+import asyncio
+import json
+import logging
+from typing import List, Optional
+
+# Set up logging
+error_logger = logging.getLogger("errorLogger")  # For error logs
+
+# PublishBatch accepts at most this many entries per call
+SNS_MAX_BATCH = 10
+
+
+class SNSTransport:
+    """PublishBatch to an SNS topic, run in a worker thread to keep boto3 off the event loop."""
+
+    max_batch = SNS_MAX_BATCH
+
+    def __init__(self, topic_arn: str, client=None):
+        self.topic_arn = topic_arn
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("sns")
+        return self._client
+
+    async def send(self, entries: List[dict]) -> List[str]:
+        response = await asyncio.to_thread(
+            self.client.publish_batch,
+            TopicArn=self.topic_arn,
+            PublishBatchRequestEntries=[
+                {"Id": entry["id"], "Message": entry["body"], "Subject": entry["subject"]}
+                for entry in entries
+            ],
+        )
+        failed = response.get("Failed", [])
+        for failure in failed:
+            error_logger.error(
+                f"SNS rejected event {failure.get('Id')}: {failure.get('Code')} {failure.get('Message')}"
+            )
+        return [failure["Id"] for failure in failed]
+
+
+class InMemoryTransport:
+    """Keeps every delivered entry in `sent`; `fail_ids` are rejected once each."""
+
+    max_batch = SNS_MAX_BATCH
+
+    def __init__(self, fail_ids: Optional[List[str]] = None):
+        self.sent: List[dict] = []
+        self.batches: List[List[dict]] = []
+        self.fail_ids = set(fail_ids or [])
+
+    async def send(self, entries: List[dict]) -> List[str]:
+        failed = [entry["id"] for entry in entries if entry["id"] in self.fail_ids]
+        self.fail_ids.difference_update(failed)
+        delivered = [entry for entry in entries if entry["id"] not in failed]
+        self.sent.extend(delivered)
+        self.batches.append(delivered)
+        return failed
+
+
+class FileTransport:
+    """Appends each entry as one JSON line to `path`."""
+
+    max_batch = SNS_MAX_BATCH
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _append(self, lines: str):
+        with open(self.path, "a", encoding="utf-8") as sink:
+            sink.write(lines)
+
+    async def send(self, entries: List[dict]) -> List[str]:
+        lines = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries)
+        await asyncio.to_thread(self._append, lines)
+        return []
+
+
+def get_event_transport(settings):
+    """The transport named by EVENTS_TRANSPORT: "sns", "memory" or "file"."""
+    if settings.EVENTS_TRANSPORT == "sns":
+        if not settings.SNS_TOPIC_ARN:
+            raise ValueError("EVENTS_TRANSPORT=sns requires SNS_TOPIC_ARN")
+        return SNSTransport(settings.SNS_TOPIC_ARN)
+    if settings.EVENTS_TRANSPORT == "memory":
+        return InMemoryTransport()
+    if settings.EVENTS_TRANSPORT == "file":
+        return FileTransport(settings.EVENTS_FILE_PATH)
+    raise ValueError(f"Unknown EVENTS_TRANSPORT {settings.EVENTS_TRANSPORT!r}")
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional, Set, Tuple
+
+# Set up logging
+general_logger = logging.getLogger("appLogger")  # For general logs
+error_logger = logging.getLogger("errorLogger")  # For error logs
+
+
+class BookedWindowSweeper:
+    """
+    Periodic upkeep of the `booked_windows` CAS claims are checked against.
+
+    Every `interval` seconds it drops the windows that have ended, so the
+    arrays (and the claim filter scanning them) stay as small as the vehicle's
+    upcoming bookings.
+
+    It also releases orphaned claims: windows whose allocation was never
+    inserted because the worker died between the claim and the insert (a
+    failed insert is compensated inline). A claim is only orphaned if it still
+    has no allocation on the next sweep, `interval` seconds later, so bookings
+    in flight are left alone. Runs in every API worker in CAS mode; the
+    updates are idempotent.
+    """
+
+    def __init__(
+        self, vehicle_repo, allocation_repo=None, interval: float = 600, batch_size: int = 1000
+    ):
+        self.vehicle_repo = vehicle_repo
+        self.allocation_repo = allocation_repo  # None skips the orphan check
+        self.interval = interval
+        self.batch_size = batch_size
+        self.sweeps = 0
+        self.pruned = 0  # Vehicles whose ended windows were dropped
+        self.orphans_released = 0
+        # Claims without an allocation at the previous sweep
+        self._suspects: Set[Tuple[str, str]] = set()
+        self._runner: Optional[asyncio.Task] = None
+
+    async def sweep(self, now: Optional[datetime] = None):
+        now = now or datetime.now(timezone.utc)
+        self.pruned += await self.vehicle_repo.prune_windows(now)
+        if self.allocation_repo is not None:
+            await self._release_orphans(now)
+        self.sweeps += 1
+
+    async def _release_orphans(self, now: datetime):
+        orphans = set()
+        claims: List[Tuple[str, str]] = []
+        async for claim in self.vehicle_repo.iter_booked_windows(now):
+            claims.append(claim)
+            if len(claims) == self.batch_size:
+                orphans |= await self._without_allocation(claims)
+                claims = []
+        if claims:
+            orphans |= await self._without_allocation(claims)
+
+        for vehicle_id, allocation_id in orphans & self._suspects:
+            await self.vehicle_repo.release_window(vehicle_id, allocation_id)
+            self.orphans_released += 1
+            general_logger.info(f"Released orphaned claim {allocation_id} on vehicle {vehicle_id}")
+        self._suspects = orphans - self._suspects
+
+    async def _without_allocation(self, claims: List[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+        active = await self.allocation_repo.active_allocation_ids(
+            [allocation_id for _, allocation_id in claims]
+        )
+        return {claim for claim in claims if claim[1] not in active}
+
+    def stats(self) -> dict:
+        return {
+            "sweeps": self.sweeps,
+            "pruned": self.pruned,
+            "orphans_released": self.orphans_released,
+        }
+
+    async def start(self):
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error_logger.error(f"Booked window sweep failed: {e}")
+            await asyncio.sleep(self.interval)
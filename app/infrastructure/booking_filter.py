@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import logging
+import math
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, Optional, Union
+from uuid import uuid4
+from redis.exceptions import RedisError
+from app.core.availability import booking_days, to_utc
+from app.infrastructure.cache_batch import CacheBatch
+
+# Set up logging
+general_logger = logging.getLogger("appLogger")  # For general logs
+error_logger = logging.getLogger("errorLogger")  # For error logs
+
+WARM_LOCK_TIMEOUT = 300  # Seconds one worker may spend re-warming before another may start
+
+
+def bloom_parameters(capacity: int, error_rate: float):
+    """(bits, hashes) of a Bloom filter holding `capacity` members at `error_rate`."""
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+def bloom_offsets(member: str, bits: int, hashes: int) -> List[int]:
+    """Bit offsets of `member`, by double hashing one 128-bit digest."""
+    digest = hashlib.blake2b(member.encode(), digest_size=16).digest()
+    first = int.from_bytes(digest[:8], "big")
+    second = int.from_bytes(digest[8:], "big") | 1
+    return [(first + i * second) % bits for i in range(hashes)]
+
+
+class EmployeeBookingFilter:
+    """
+    Per-day Bloom filters, stored as Redis bitmaps, of the employees holding a
+    booking on that day.
+
+    A negative answer is definite, so the booking check can skip MongoDB; a
+    positive one may be false and falls through to the query. The filter only
+    answers once `warm()` has loaded every current booking and set the ready
+    flag; until then every check reports "maybe".
+
+    The ready flag expires after `ready_ttl` seconds, like the day keys it
+    vouches for, and the first check that finds it gone re-warms the filter in
+    the background (one worker at a time, under a Redis lock). A day key lost
+    to eviction or a Redis restart can therefore only cause wrong "no booking"
+    answers until the flag next expires. Bits are never cleared, so moved or
+    rejected bookings only add false positives. A write of new bits that fails
+    (see flush) takes the filter offline until it is re-warmed.
+    """
+
+    key_prefix = "bloom:employee_booking"
+
+    def __init__(
+        self,
+        cache,
+        capacity: int = 10000,
+        error_rate: float = 0.01,
+        ready_ttl: int = 3600,
+        allocation_repo=None,
+    ):
+        self.cache = cache
+        self.bits, self.hashes = bloom_parameters(capacity, error_rate)
+        self.ready_key = f"{self.key_prefix}:ready"
+        self.ready_ttl = ready_ttl
+        # Re-warms the filter once the ready flag expires; None leaves that to a restart
+        self.allocation_repo = allocation_repo
+        self._warming: Optional[asyncio.Task] = None
+        self._offline = False  # A write of new bits failed; answer nothing until re-warmed
+        self.lost_writes = 0
+        self.rewarms = 0
+        self.checks = 0
+        self.unanswered = 0  # Checks made before the filter was ready
+        self.negatives = 0  # Answered without MongoDB
+        self.false_positives = 0  # "Maybe" answers MongoDB found no booking for
+
+    def day_key(self, day: date) -> str:
+        return f"{self.key_prefix}:{day.isoformat()}"
+
+    def _expire_at(self, day: date) -> int:
+        # Keep each day one day past its end; nothing checks past dates
+        end = datetime.combine(day + timedelta(days=2), time.min, tzinfo=timezone.utc)
+        return int(end.timestamp())
+
+    def add(self, batch, employee_id: str, from_datetime, to_datetime):
+        """Queue the bits of one booking on a CacheBatch."""
+        offsets = bloom_offsets(employee_id, self.bits, self.hashes)
+        for day in booking_days(from_datetime, to_datetime):
+            batch.set_bits(self.day_key(day), offsets, self._expire_at(day))
+
+    async def might_have_booking(
+        self, employee_id: str, booking_date: Union[str, datetime]
+    ) -> Optional[bool]:
+        """
+        False if the employee definitely has no booking on that day, True if they
+        may have one, None if the filter cannot answer yet.
+        """
+        self.checks += 1
+        if self._offline:
+            self.unanswered += 1
+            self._rewarm()
+            return None
+        day_key = self.day_key(to_utc(booking_date).date())
+        offsets = bloom_offsets(employee_id, self.bits, self.hashes)
+        bits = await self.cache.get_bits(
+            [(self.ready_key, 0)] + [(day_key, offset) for offset in offsets]
+        )
+        if not bits:
+            self.unanswered += 1
+            return None  # Redis unavailable
+        if not bits[0]:
+            self.unanswered += 1
+            self._rewarm()  # Never warmed, or the ready flag expired
+            return None
+        if all(bits[1:]):
+            return True
+        self.negatives += 1
+        return False
+
+    async def flush(self, batch: CacheBatch):
+        """
+        Flush a CacheBatch holding add()ed bits. If Redis refuses it the bits
+        are lost and the filter could answer a wrong "no", so it goes offline:
+        here until re-warmed, and in the other workers by deleting the ready flag.
+        """
+        try:
+            await batch.flush()
+        except RedisError as e:
+            self.lost_writes += 1
+            self._offline = True
+            error_logger.error(f"Employee booking filter lost a write, offline until re-warmed: {e}")
+            await self.cache.delete(self.ready_key)
+            self._rewarm()
+
+    def record_false_positive(self):
+        """Called when a "maybe" answer is followed by a query that finds no booking."""
+        self.false_positives += 1
+
+    async def warm(self, allocation_repo, since: Optional[datetime] = None, batch_size: int = 1000):
+        """Load every booking that has not ended before `since`, then mark the filter ready."""
+        since = since or datetime.now(timezone.utc)
+        batch = CacheBatch(self.cache)
+        loaded = 0
+        async for booking in allocation_repo.iter_employee_bookings(since):
+            self.add(batch, booking["employee_id"], booking["from_datetime"], booking["to_datetime"])
+            loaded += 1
+            if loaded % batch_size == 0:
+                await batch.flush()
+        ready_until = int(datetime.now(timezone.utc).timestamp()) + self.ready_ttl
+        batch.set_bits(self.ready_key, [0], ready_until)
+        await batch.flush()
+        general_logger.info(f"Employee booking filter warmed with {loaded} bookings")
+
+    def _rewarm(self):
+        if self.allocation_repo is None or (self._warming and not self._warming.done()):
+            return
+        self._warming = asyncio.create_task(self._rewarm_once())
+
+    async def _rewarm_once(self):
+        lock_key, token = f"{self.key_prefix}:warming", str(uuid4())
+        if not await self.cache.acquire_lock(lock_key, WARM_LOCK_TIMEOUT, token):
+            return  # Another worker is warming it
+        try:
+            lost_writes = self.lost_writes
+            await self.warm(self.allocation_repo)
+            self.rewarms += 1
+            # A write lost while warming may postdate what the warm-up read
+            if self.lost_writes == lost_writes:
+                self._offline = False
+        except Exception as e:
+            error_logger.error(f"Employee booking filter re-warm failed: {e}")
+        finally:
+            await self.cache.release_lock(lock_key, token)
+
+    def stats(self) -> dict:
+        absent = self.negatives + self.false_positives
+        return {
+            "bits_per_day": self.bits,
+            "hashes": self.hashes,
+            "checks": self.checks,
+            "unanswered": self.unanswered,
+            "rewarms": self.rewarms,
+            "lost_writes": self.lost_writes,
+            "negatives": self.negatives,
+            "false_positives": self.false_positives,
+            # Observed share of employees without a booking the filter still said "maybe" for
+            "false_positive_rate": self.false_positives / absent if absent else 0.0,
+        }
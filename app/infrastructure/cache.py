@@ -1,30 +1,87 @@
 import aioredis
-import json
 import logging
 from redis.exceptions import RedisError
-from typing import Any
-from datetime import datetime
-import os
+import time
+from typing import Any, List, Optional, Tuple
+from app.infrastructure.l1_cache import TieredCache
+from app.infrastructure.serializers import Serializer, get_serializer
 
+# Delete KEYS[1] only if it still holds ARGV[1]
+_RELEASE_IF_OWNER = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
 
-def get_cahce():
-    REDIS_HOST = os.getenv("REDIS_HOST", "redis://localhost:6379")
-    return RedisCache(REDIS_HOST)
+
+def get_cahce(settings, client=None):
+    """Return a RedisCache backed by a pooled client sized from settings,
+    fronted by an in-process L1 tier when CACHE_L1_ENABLED is set.
+
+    Call once per worker process (see the lifespan hook in main.py) and share it.
+    `client` replaces the pooled connection (benchmarks/stress_allocations.py
+    passes an in-memory fake).
+    """
+    cache = RedisCache(
+        settings.REDIS_HOST,
+        serializer=get_serializer(
+            settings.CACHE_SERIALIZER, settings.CACHE_COMPRESSION_THRESHOLD
+        ),
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+        client=client,
+    )
+    if settings.CACHE_L1_ENABLED:
+        return TieredCache(
+            cache,
+            max_entries=settings.CACHE_L1_MAX_ENTRIES,
+            ttl=settings.CACHE_L1_TTL,
+            prefixes=settings.CACHE_L1_PREFIXES,
+        )
+    return cache
 
 
 class RedisCache:
-    def __init__(self, redis_url: str):
-        self.redis = aioredis.from_url(redis_url)
+    def __init__(
+        self,
+        redis_url: str,
+        serializer: Optional[Serializer] = None,
+        client=None,
+        **pool_options,
+    ):
+        self.redis = client if client is not None else aioredis.from_url(redis_url, **pool_options)
+        self.serializer = serializer or Serializer()
         self.logger = logging.getLogger(__name__)
 
+    async def warm_up(self, connections: int):
+        """Open `connections` pooled connections up front so the first requests don't pay for them."""
+        pool = self.redis.connection_pool
+        opened = []
+        try:
+            for _ in range(connections):
+                opened.append(await pool.get_connection("PING"))
+        except RedisError as e:
+            self.logger.error(f"Redis warm up error: {e}")
+        finally:
+            for connection in opened:
+                await pool.release(connection)
+
+    async def close(self):
+        """Close the client and disconnect every pooled connection."""
+        try:
+            await self.redis.close()
+            await self.redis.connection_pool.disconnect()
+        except RedisError as e:
+            self.logger.error(f"Redis close error: {e}")
+
     async def get(self, key: str) -> Any:
         try:
             raw_data = await self.redis.get(key)
             if raw_data:
-                try:
-                    return json.loads(raw_data)
-                except (json.JSONDecodeError, TypeError):
-                    return raw_data
+                return self.serializer.loads(raw_data)
             return None
         except RedisError as e:
             self.logger.error(f"Redis get error for key {key}: {e}")
@@ -32,21 +89,79 @@ class RedisCache:
 
     async def set(self, key: str, value: Any, expiration: int = 3600):
         try:
+            await self.redis.set(key, self.serializer.dumps(value), ex=expiration)
+        except RedisError as e:
+            self.logger.error(f"Redis set error for key {key}: {e}")
 
-            def default_serializer(obj):
-                if isinstance(obj, datetime):
-                    return obj.isoformat()
-                raise TypeError(
-                    f"Object of type {obj.__class__.__name__} is not JSON serializable"
-                )
+    async def get_many(self, keys: List[str]) -> List[Any]:
+        """Fetch several keys in one MGET; missing keys come back as None."""
+        try:
+            values = await self.redis.mget(keys)
+            return [self.serializer.loads(value) if value else None for value in values]
+        except RedisError as e:
+            self.logger.error(f"Redis get many error for keys {keys}: {e}")
+            return [None] * len(keys)
 
-            if isinstance(value, (dict, list)):
-                json_value = json.dumps(value, default=default_serializer)
-                await self.redis.set(key, json_value, ex=expiration)
-            else:
-                await self.redis.set(key, str(value), ex=expiration)
+    async def set_many(self, values: dict, expiration: int = 3600):
+        """Store several keys with the same expiration in one pipelined round trip."""
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, value in values.items():
+                    pipe.set(key, self.serializer.dumps(value), ex=expiration)
+                await pipe.execute()
         except RedisError as e:
-            self.logger.error(f"Redis set error for key {key}: {e}")
+            self.logger.error(f"Redis set many error for keys {list(values)}: {e}")
+
+    async def delete_many(self, keys: List[str]):
+        """Delete several keys with a single DEL."""
+        if not keys:
+            return
+        try:
+            await self.redis.delete(*keys)
+        except RedisError as e:
+            self.logger.error(f"Redis delete many error for keys {keys}: {e}")
+
+    async def execute_batch(self, operations: List[tuple]):
+        """
+        Apply the operations collected by a CacheBatch in one MULTI/EXEC pipeline.
+
+        Failures are logged, and re-raised for batches setting bits: lost
+        Bloom filter bits would turn into wrong "no booking" answers, so the
+        caller (EmployeeBookingFilter.flush) has to react.
+        """
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                for operation in operations:
+                    if operation[0] == "set":
+                        _, key, value, expiration = operation
+                        pipe.set(key, self.serializer.dumps(value), ex=expiration)
+                    elif operation[0] == "delete":
+                        pipe.delete(*operation[1])
+                    elif operation[0] == "bump":
+                        _, keys, expiration = operation
+                        self._queue_bumps(pipe, keys, expiration)
+                    elif operation[0] == "setbits":
+                        _, (key,), offsets, expire_at = operation
+                        for offset in offsets:
+                            pipe.setbit(key, offset, 1)
+                        if expire_at:
+                            pipe.expireat(key, expire_at)
+                await pipe.execute()
+        except RedisError as e:
+            self.logger.error(f"Redis batch error for {len(operations)} operations: {e}")
+            if any(operation[0] == "setbits" for operation in operations):
+                raise
+
+    async def get_bits(self, bits: List[Tuple[str, int]]) -> Optional[List[int]]:
+        """GETBIT each (key, offset) pair in one round trip; None if Redis fails."""
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, offset in bits:
+                    pipe.getbit(key, offset)
+                return await pipe.execute()
+        except RedisError as e:
+            self.logger.error(f"Redis get bits error: {e}")
+            return None
 
     async def delete(self, key: str):
         try:
@@ -66,16 +181,75 @@ class RedisCache:
         except RedisError as e:
             self.logger.error(f"Redis delete pattern error for pattern {pattern}: {e}")
 
-    async def acquire_lock(self, lock_key: str, timeout: int = 10) -> bool:
+    async def get_generations(self, keys: List[str], expiration: int = 86400) -> List[int]:
+        """
+        Return the current value of each generation counter in one round trip.
+
+        Missing counters are seeded with the current time in milliseconds rather
+        than 0, so a counter that expired or was evicted never comes back to a
+        value that older cached entries were written under.
+        """
+        try:
+            values = await self.redis.mget(keys)
+            missing = [key for key, value in zip(keys, values) if value is None]
+            if missing:
+                seed = int(time.time() * 1000)
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for key in missing:
+                        pipe.set(key, seed, ex=expiration, nx=True)
+                    await pipe.execute()
+                values = await self.redis.mget(keys)
+            return [int(value or 0) for value in values]
+        except RedisError as e:
+            self.logger.error(f"Redis get generations error for keys {keys}: {e}")
+            return [0] * len(keys)
+
+    async def bump_generations(self, keys: List[str], expiration: int = 86400):
+        """
+        Atomically increment generation counters, invalidating every cache entry
+        whose key embeds them. Old entries are left to expire on their own TTL.
+        """
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                self._queue_bumps(pipe, keys, expiration)
+                await pipe.execute()
+            self.logger.info(f"Bumped cache generations: {keys}")
+        except RedisError as e:
+            self.logger.error(f"Redis bump generations error for keys {keys}: {e}")
+
+    @staticmethod
+    def _queue_bumps(pipe, keys: List[str], expiration: int):
+        # Seed a missing counter from the clock first, as get_generations does:
+        # INCR alone would restart it at 1, a value old entries may carry
+        seed = int(time.time() * 1000)
+        for key in keys:
+            pipe.set(key, seed, ex=expiration, nx=True)
+            pipe.incr(key)
+            pipe.expire(key, expiration)
+
+    async def publish(self, channel: str, message: str):
         try:
-            is_locked = await self.redis.set(lock_key, "locked", ex=timeout, nx=True)
+            await self.redis.publish(channel, message)
+        except RedisError as e:
+            self.logger.error(f"Redis publish error on channel {channel}: {e}")
+
+    def pubsub(self):
+        return self.redis.pubsub()
+
+    async def acquire_lock(self, lock_key: str, timeout: int = 10, token: str = "locked") -> bool:
+        try:
+            is_locked = await self.redis.set(lock_key, token, ex=timeout, nx=True)
             return bool(is_locked)
         except RedisError as e:
             self.logger.error(f"Error acquiring lock for key {lock_key}: {e}")
             return False
 
-    async def release_lock(self, lock_key: str):
+    async def release_lock(self, lock_key: str, token: Optional[str] = None):
+        """Release a lock; with a `token`, only if it is still the holder's (it may have expired)."""
         try:
-            await self.redis.delete(lock_key)
+            if token is None:
+                await self.redis.delete(lock_key)
+            else:
+                await self.redis.eval(_RELEASE_IF_OWNER, 1, lock_key, token)
         except RedisError as e:
             self.logger.error(f"Error releasing lock for key {lock_key}: {e}")
@@ -0,0 +1,47 @@
+from typing import Any, List, Optional
+
+
+class CacheBatch:
+    """
+    Request-scoped collector of cache writes, flushed as one MULTI/EXEC pipeline.
+
+        async with CacheBatch(cache) as batch:
+            batch.delete(key)
+            batch.bump_generations(keys)
+
+    Operations are sent on a clean exit (or an explicit flush()) and dropped if
+    the block raises, so a failed write never invalidates or caches anything.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.operations: List[tuple] = []
+
+    def set(self, key: str, value: Any, expiration: int = 3600):
+        self.operations.append(("set", key, value, expiration))
+
+    def delete(self, *keys: str):
+        if keys:
+            self.operations.append(("delete", list(keys)))
+
+    def bump_generations(self, keys: List[str], expiration: int = 86400):
+        if keys:
+            self.operations.append(("bump", list(keys), expiration))
+
+    def set_bits(self, key: str, offsets: List[int], expire_at: Optional[int] = None):
+        """Set bitmap bits; `expire_at` is a Unix timestamp for the whole key."""
+        self.operations.append(("setbits", [key], list(offsets), expire_at))
+
+    async def flush(self):
+        if self.operations:
+            operations, self.operations = self.operations, []
+            await self.cache.execute_batch(operations)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            await self.flush()
+        else:
+            self.operations = []
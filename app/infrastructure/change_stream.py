@@ -0,0 +1,265 @@
+"""
+Cache invalidation driven by MongoDB change streams.
+
+Tails the `allocations` and `vehicles` collections and invalidates exactly the
+Redis keys each change affects, so writes that bypass the services (seed
+scripts, manual fixes) never leave stale cache behind. Changes are applied in
+batches, one Redis pipeline per batch, and the resume token of the last applied
+batch is stored in MongoDB so a restart picks up where it left off.
+
+With `index_sync_channel` set it also publishes the allocation and vehicle
+changes it sees to the API workers' in-process indexes (see
+app.infrastructure.index_sync).
+
+Run one per deployment, next to the API (set CACHE_INLINE_INVALIDATION=false
+there to take invalidation off the request path):
+
+    python -m app.infrastructure.change_stream
+"""
+import asyncio
+import logging
+import logging.config
+import sys
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Optional
+from pymongo.errors import OperationFailure, PyMongoError
+from app.core.availability import AvailabilityIndex
+from app.core.services import history_invalidation_keys
+from app.infrastructure.cache_batch import CacheBatch
+from app.infrastructure.db import AllocationRepository
+from app.infrastructure.index_sync import IndexSync
+
+# Set up logging
+general_logger = logging.getLogger("appLogger")  # For general logs
+error_logger = logging.getLogger("errorLogger")  # For error logs
+
+WATCHED_COLLECTIONS = ["allocations", "vehicles"]
+
+# Resume token no longer in the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+
+class InvalidationPlan:
+    """Keys to delete, generations to bump and patterns to clear for a batch of changes."""
+
+    def __init__(self):
+        self.delete = set()
+        self.bump = set()
+        self.patterns = set()
+        self.bookings = []  # (employee_id, from_datetime, to_datetime) for the booking filter
+        self.reload_availability = False
+
+
+def plan_invalidation(
+    changes: Iterable[dict], previous_vehicle: Callable[[str], Optional[str]]
+) -> InvalidationPlan:
+    """
+    Map change events to cache invalidations. `previous_vehicle` returns the
+    vehicle an allocation was on before the change, since MongoDB 5.0 change
+    events carry no pre-image.
+    """
+    plan = InvalidationPlan()
+    for change in changes:
+        collection = change["ns"]["coll"]
+        document = change.get("fullDocument")
+        if change["operationType"] in ("insert", "update", "replace") and document is None:
+            # Deleted again before the lookup; its delete event follows
+            continue
+
+        if collection == "allocations":
+            if change["operationType"] == "delete":
+                # Only the _id is known: restart every history generation
+                plan.patterns.add("history:gen*")
+                plan.reload_availability = True
+                continue
+            vehicle_ids = {document["vehicle_id"]}
+            previous = previous_vehicle(document["allocation_id"])
+            if previous:
+                vehicle_ids.add(previous)
+            plan.bump.update(
+                history_invalidation_keys(
+                    employee_ids=[document["employee_id"]], vehicle_ids=vehicle_ids
+                )
+            )
+            if document.get("status") != "rejected":
+                plan.bookings.append(
+                    (document["employee_id"], document["from_datetime"], document["to_datetime"])
+                )
+
+        elif collection == "vehicles":
+            if change["operationType"] == "delete":
+                plan.patterns.add("vehicle:*:status")
+                continue
+            plan.delete.add(f"vehicle:{document['vehicle_id']}:status")
+    return plan
+
+
+class ChangeStreamInvalidator:
+    def __init__(
+        self,
+        db,
+        cache,
+        booking_filter=None,
+        name: str = "cache_invalidator",
+        batch_size: int = 500,
+        max_await_ms: int = 500,
+        index_sync_channel: Optional[str] = None,
+    ):
+        self.db = db
+        self.cache = cache
+        self.booking_filter = booking_filter
+        self.name = name  # _id of the resume token document
+        self.batch_size = batch_size
+        self.max_await_ms = max_await_ms
+        # Which vehicle each allocation is on, to invalidate the one it moved off
+        self.availability = AvailabilityIndex()
+        self.allocation_repo = AllocationRepository(db)
+        # Publish-only: forwards the changes to the API workers' indexes
+        self.index_sync = None
+        if index_sync_channel:
+            self.index_sync = IndexSync(cache, self.availability, channel=index_sync_channel)
+        self.batches_applied = 0
+        self.changes_applied = 0
+
+    async def load_resume_token(self):
+        document = await self.db.change_stream_tokens.find_one({"_id": self.name})
+        return document["token"] if document else None
+
+    async def save_resume_token(self, token):
+        await self.db.change_stream_tokens.update_one(
+            {"_id": self.name},
+            {"$set": {"token": token, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+
+    async def apply(self, changes):
+        """Invalidate the caches a batch of changes affects, in one pipeline."""
+        plan = plan_invalidation(changes, self.availability.vehicle_of)
+        batch = CacheBatch(self.cache)
+        batch.delete(*plan.delete)
+        batch.bump_generations(sorted(plan.bump))
+        if self.booking_filter is None:
+            await batch.flush()
+        else:
+            for booking in plan.bookings:
+                self.booking_filter.add(batch, *booking)
+            await self.booking_filter.flush(batch)
+        for pattern in plan.patterns:
+            await self.cache.delete_pattern(pattern)
+
+        # Keep the vehicle lookup current for later moves
+        booked, released, vehicles = [], [], []
+        for change in changes:
+            document = change.get("fullDocument")
+            if change["ns"]["coll"] == "vehicles" and document is not None:
+                vehicles.append(document)
+            if change["ns"]["coll"] == "allocations" and document is not None:
+                if document.get("status") == "rejected":
+                    self.availability.remove(document["allocation_id"])
+                    released.append(document["allocation_id"])
+                else:
+                    entry = (
+                        document["allocation_id"],
+                        document["vehicle_id"],
+                        document["from_datetime"],
+                        document["to_datetime"],
+                    )
+                    self.availability.add(*entry)
+                    booked.append(entry)
+        if plan.reload_availability:
+            await self.availability.load(self.allocation_repo)
+        if self.index_sync is not None:
+            # A deleted vehicle or allocation is only known by _id: rebuild instead
+            await self.index_sync.publish(
+                booked=booked,
+                released=released,
+                vehicles=vehicles,
+                reload=any(change["operationType"] == "delete" for change in changes),
+            )
+
+        self.batches_applied += 1
+        self.changes_applied += len(changes)
+
+    async def run(self):
+        """Tail the change stream until cancelled, reconnecting with backoff."""
+        await self.availability.load(self.allocation_repo)
+        backoff = 0.5
+        while True:
+            token = await self.load_resume_token()
+            try:
+                async with self.db.watch(
+                    [{"$match": {"ns.coll": {"$in": WATCHED_COLLECTIONS}}}],
+                    full_document="updateLookup",
+                    resume_after=token,
+                    max_await_time_ms=self.max_await_ms,
+                    batch_size=self.batch_size,
+                ) as stream:
+                    general_logger.info(
+                        f"Change stream {self.name} started ({'resumed' if token else 'from now'})"
+                    )
+                    backoff = 0.5
+                    while stream.alive:
+                        changes = []
+                        while len(changes) < self.batch_size:
+                            change = await stream.try_next()
+                            if change is None:
+                                break
+                            changes.append(change)
+                        if changes:
+                            await self.apply(changes)
+                        # Also advances past events filtered out by the $match
+                        if stream.resume_token is not None and stream.resume_token != token:
+                            token = stream.resume_token
+                            await self.save_resume_token(token)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code != CHANGE_STREAM_HISTORY_LOST:
+                    error_logger.error(f"Change stream {self.name} error: {e}")
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 30)
+                    continue
+                # Changes were missed: drop everything they could have touched
+                error_logger.error(f"Change stream {self.name} lost its history, invalidating all")
+                for pattern in ("history:gen*", "vehicle:*:status"):
+                    await self.cache.delete_pattern(pattern)
+                await self.db.change_stream_tokens.delete_one({"_id": self.name})
+            except PyMongoError as e:
+                error_logger.error(f"Change stream {self.name} error: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def stats(self) -> dict:
+        return {"batches_applied": self.batches_applied, "changes_applied": self.changes_applied}
+
+
+async def main(argv=None) -> int:
+    from app.infrastructure.booking_filter import EmployeeBookingFilter
+    from app.infrastructure.cache import get_cahce
+    from app.infrastructure.config import settings
+    from app.infrastructure.db import get_db
+
+    logging.config.fileConfig("logging.conf")
+    db_client, db = get_db(settings)
+    cache = get_cahce(settings)
+    booking_filter = None
+    if settings.BOOKING_FILTER_ENABLED:
+        booking_filter = EmployeeBookingFilter(
+            cache, settings.BOOKING_FILTER_CAPACITY, settings.BOOKING_FILTER_ERROR_RATE
+        )
+    invalidator = ChangeStreamInvalidator(
+        db,
+        cache,
+        booking_filter,
+        index_sync_channel=settings.INDEX_SYNC_CHANNEL if settings.INDEX_SYNC_ENABLED else None,
+    )
+    try:
+        await invalidator.run()
+    finally:
+        await cache.close()
+        db_client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -1,13 +1,96 @@
 from pydantic_settings import BaseSettings
 import os
+from typing import List, Optional
 
 class Settings(BaseSettings):
     ENV: str = "dev"  # Default to dev if not specified
     MONGO_URI: str
+    MONGO_DB_NAME: str = "vehicle_allocation_db"
     REDIS_HOST: str
     AWS_ACCESS_KEY_ID: str
     AWS_SECRET_ACCESS_KEY: str
 
+    # MongoDB connection pool (one client per worker process)
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 10  # Connections kept open while idle
+    MONGO_MAX_IDLE_TIME_MS: int = 60000
+    MONGO_CONNECT_TIMEOUT_MS: int = 5000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGO_SOCKET_TIMEOUT_MS: int = 10000
+    # Build models from stored documents without re-running their validators
+    MONGO_TRUSTED_READS: bool = True
+
+    # Redis connection pool (one client per worker process)
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_MIN_IDLE_CONNECTIONS: int = 5  # Connections opened at startup
+    REDIS_SOCKET_TIMEOUT: float = 2.0
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 2.0
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+
+    # In-process L1 cache in front of Redis, invalidated over Redis pub/sub
+    CACHE_L1_ENABLED: bool = True
+    CACHE_L1_MAX_ENTRIES: int = 10000
+    CACHE_L1_TTL: int = 30  # Upper bound on staleness if an invalidation is missed
+    CACHE_L1_PREFIXES: List[str] = ["vehicle:", "history:"]  # Key prefixes using L1
+
+    # Cache value codec: "json", "orjson" or "msgpack" (the last two are optional packages)
+    CACHE_SERIALIZER: str = "json"
+    CACHE_COMPRESSION_THRESHOLD: int = 1024  # zlib-compress encoded values above this many bytes
+
+    # False when `python -m app.infrastructure.change_stream` invalidates caches from the
+    # change streams instead of the request path (the API then serves briefly stale pages)
+    CACHE_INLINE_INVALIDATION: bool = True
+
+    # How allocate_vehicle books: "transaction" (multi-document transaction) or "cas"
+    # (conditional claim on the vehicle document, compensated on failure). Run
+    # `python -m app.infrastructure.rollups booked-windows` before switching to "cas".
+    # A worker dying between its claim and the allocation insert leaves a claimed window
+    # without a booking; the sweep below releases it once two sweeps in a row find it
+    # orphaned, so that window stays unbookable for up to twice the interval.
+    ALLOCATION_MODE: str = "transaction"
+    # CAS mode only: seconds between sweeps dropping ended and orphaned `booked_windows`
+    ALLOCATION_WINDOW_SWEEP_INTERVAL: int = 600
+    ALLOCATION_MAX_RETRIES: int = 5  # Retries of a booking aborted by a TransientTransactionError
+    ALLOCATION_RETRY_BASE_DELAY: float = 0.01  # Seconds; backoff doubles per retry, full jitter
+    ALLOCATION_AUTO_MAX_CLAIMS: int = 5  # Free-looking candidates POST /allocations/auto tries to book
+
+    # Every worker's in-process availability index follows the others' bookings over
+    # Redis pub/sub, and is rebuilt from MongoDB on reconnect and every interval
+    # (0 disables the periodic rebuild). Index answers are best effort; bookings
+    # are always re-checked in MongoDB.
+    INDEX_SYNC_ENABLED: bool = True
+    INDEX_SYNC_CHANNEL: str = "index:sync"
+    INDEX_SYNC_RELOAD_INTERVAL: int = 300
+
+    # Employee booking checks: cached "no booking" answers and a per-day Bloom filter in Redis
+    CACHE_NEGATIVE_TTL: int = 60  # 0 disables negative caching
+    BOOKING_FILTER_ENABLED: bool = True
+    BOOKING_FILTER_CAPACITY: int = 10000  # Expected employees with a booking per day
+    BOOKING_FILTER_ERROR_RATE: float = 0.01
+    # Seconds the filter is trusted after a warm; it is then re-warmed from MongoDB. Bounds how
+    # long a day bitmap lost to eviction or a Redis restart can hide an existing booking
+    BOOKING_FILTER_READY_TTL: int = 3600
+
+    # Booking events, queued once the booking commits and published in batches from a
+    # background task (at most once; the outbox below replaces this when enabled)
+    EVENTS_ENABLED: bool = False
+    EVENTS_TRANSPORT: str = "sns"  # "sns", "memory" or "file"
+    SNS_TOPIC_ARN: Optional[str] = None
+    EVENTS_FILE_PATH: str = "events.ndjson"
+    EVENTS_MAX_QUEUE: int = 10000  # publish() waits once this many events are queued
+    EVENTS_MAX_CONCURRENCY: int = 4  # Batches in flight at once
+    EVENTS_MAX_RETRIES: int = 3
+    # Booking events written to the `outbox` collection in the booking transaction and
+    # published by `python -m app.events.outbox_relay`
+    EVENTS_OUTBOX_ENABLED: bool = False
+    EVENTS_OUTBOX_BATCH_SIZE: int = 500  # Entries the relay reads and marks per round trip
+    EVENTS_OUTBOX_MAX_ATTEMPTS: int = 10
+    # `python -m app.events.consumer`: the queue subscribed to the topic and its worker pool
+    EVENTS_QUEUE: str = "sqs"  # "sqs" or "memory"
+    EVENTS_QUEUE_URL: Optional[str] = None
+    EVENTS_CONSUMER_WORKERS: int = 8  # Messages of one vehicle always go to the same worker
+    EVENTS_CONSUMER_MAX_IN_FLIGHT: int = 100  # Received but unhandled messages before polling pauses
+
     class Config:
         # Dynamically load the correct .env file based on the ENV variable
         print(f"Loading environment settings from {os.getenv('ENV')}")
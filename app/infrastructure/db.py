@@ -1,7 +1,10 @@
 import logging
-import os
-from typing import List
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+from typing import List, Optional, Tuple, Type, TypeVar
 from motor.motor_asyncio import AsyncIOMotorClient
+from pydantic import BaseModel
+from pymongo import UpdateOne
 from app.core.models import Allocation, Vehicle
 # Set up logging
 general_logger = logging.getLogger("appLogger")  # For general logs
@@ -9,32 +12,97 @@ error_logger = logging.getLogger("errorLogger")  # For error logs
 
 
 
-def get_db():
-    """Return the MongoDB database object"""
-    # Get MongoDB connection details from environment variables
-    MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/vehicle_allocation_db?rplicaSet=rs0")
-    MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "vehicle_allocation_db")
-    general_logger.info(f"Connecting to MongoDB at {MONGO_URI}...")
+def get_db(settings):
+    """Return a pooled MongoDB client and database object.
+
+    Call once per worker process (see the lifespan hook in main.py) and share
+    the client; every AsyncIOMotorClient owns its own connection pool.
+    """
+    general_logger.info(f"Connecting to MongoDB at {settings.MONGO_URI}...")
     # MongoDB Client
-    db_client = AsyncIOMotorClient(MONGO_URI)
-    db = db_client[MONGO_DB_NAME]
+    db_client = AsyncIOMotorClient(
+        settings.MONGO_URI,
+        maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+        connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=settings.MONGO_SOCKET_TIMEOUT_MS,
+    )
+    db = db_client[settings.MONGO_DB_NAME]
     return db_client, db
 
 
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+@lru_cache(maxsize=None)
+def _has_python_validators(model_cls: Type[BaseModel]) -> bool:
+    decorators = model_cls.__pydantic_decorators__
+    return bool(
+        decorators.validators
+        or decorators.field_validators
+        or decorators.root_validators
+        or decorators.model_validators
+    )
+
+
+def load_model(model_cls: Type[ModelT], document: dict, trusted: bool = True) -> ModelT:
+    """
+    Build a model from a stored document. Documents written through the models
+    were validated then, so trusted reads skip the Python validators
+    (model_construct); untrusted ones run them again, like model_cls(**document).
+    Models without Python validators always go through the compiled validator,
+    which is faster than model_construct (see benchmarks/bench_model_decode.py).
+    """
+    if trusted and _has_python_validators(model_cls):
+        return model_cls.model_construct(**document)
+    return model_cls.model_validate(document)
+
+
+# Stable history order; keyset cursors encode a position in it
+HISTORY_SORT = [("from_datetime", 1), ("allocation_id", 1)]
+VEHICLE_SORT = [("vehicle_id", 1)]
+# Vehicle fields the API returns: not the CAS bookkeeping (booked_windows, version)
+VEHICLE_PROJECTION = {"_id": 0, "booked_windows": 0, "version": 0}
+
+
 class AllocationRepository:
-    def __init__(self, db):
+    def __init__(self, db, trusted_reads: bool = True):
         self.db = db
+        self.trusted_reads = trusted_reads  # Build models without re-validating stored documents
 
     async def get_allocations_by_filter(
-        self, query: dict, skip: int = 0, limit: int = 10
-    ) -> List[Allocation]:
-        # Perform the paginated query
-        allocations = (
-            await self.db.allocations.find(query).skip(skip).limit(limit).to_list(limit)
-        )
-        for allocation in allocations:
-            allocation["_id"] = str(allocation["_id"])  # Convert ObjectId to string
-        return allocations
+        self,
+        query: dict,
+        skip: int = 0,
+        limit: int = 10,
+        after: Optional[Tuple[datetime, str]] = None,
+        projection: Optional[dict] = None,
+    ) -> List[dict]:
+        # Keyset pagination: resume strictly after the (from_datetime, allocation_id) position
+        if after:
+            from_datetime, allocation_id = after
+            query = {
+                "$and": [
+                    query,
+                    {
+                        "$or": [
+                            {"from_datetime": {"$gt": from_datetime}},
+                            {
+                                "from_datetime": from_datetime,
+                                "allocation_id": {"$gt": allocation_id},
+                            },
+                        ]
+                    },
+                ]
+            }
+
+        # Perform the paginated query, fetching only the projected fields
+        cursor = self.db.allocations.find(query, projection or {"_id": 0}).sort(HISTORY_SORT)
+        if skip:
+            cursor = cursor.skip(skip)
+        return await cursor.limit(limit).to_list(limit)
 
     async def get_count(self, query: dict) -> int:
         # Get the total count of documents matching the query (for pagination)
@@ -44,36 +112,138 @@ class AllocationRepository:
         allocation_data = allocation.dict(by_alias=True)
         await self.db.allocations.insert_one(allocation_data, session=session)
 
+    async def save_allocations(self, allocations: List[Allocation], session=None):
+        await self.db.allocations.insert_many(
+            [allocation.dict(by_alias=True) for allocation in allocations],
+            session=session,
+        )
+
+    async def find_conflicting_allocations(
+        self,
+        vehicle_ids: List[str],
+        employee_ids: List[str],
+        from_datetime: datetime,
+        to_datetime: datetime,
+        session=None,
+    ):
+        # Non-rejected bookings of any of the vehicles or employees touching [from_datetime, to_datetime]
+        return await self.db.allocations.find(
+            {
+                "$or": [
+                    {"vehicle_id": {"$in": vehicle_ids}},
+                    {"employee_id": {"$in": employee_ids}},
+                ],
+                "from_datetime": {"$lte": to_datetime},
+                "to_datetime": {"$gte": from_datetime},
+                "status": {"$ne": "rejected"},
+            },
+            {"_id": 0},
+            session=session,  # Ensure the session is passed
+        ).to_list(None)
+
     async def get_allocation_by_employee_and_date(
         self, employee_id: str, booking_date: str
     ):
-        allocation = await self.db.allocations.find_one(
+        return await self.db.allocations.find_one(
             {
                 "employee_id": employee_id,
                 "from_datetime": {"$lte": booking_date},
                 "to_datetime": {"$gte": booking_date},
-            }
+            },
+            {"_id": 0},
         )
-        if allocation:
-            allocation["_id"] = str(allocation["_id"])
-        return allocation
 
     async def get_allocations_by_employee(self, employee_id: str):
-        allocations = await self.db.allocations.find(
-            {"employee_id": employee_id}
+        return await self.db.allocations.find(
+            {"employee_id": employee_id}, {"_id": 0}
         ).to_list(100)
-        for allocation in allocations:
-            allocation["_id"] = str(allocation["_id"])  # Convert ObjectId to string
-        return allocations
+
+    async def increment_daily_usage(self, rows: List[dict], session=None):
+        # $inc upserts into the daily_vehicle_usage rollup, in the caller's transaction
+        if not rows:
+            return
+        await self.db.daily_vehicle_usage.bulk_write(
+            [
+                UpdateOne(
+                    {"vehicle_id": row["vehicle_id"], "day": row["day"]},
+                    {"$inc": {"bookings": row["bookings"], "booked_ms": row["booked_ms"]}},
+                    upsert=True,
+                )
+                for row in rows
+            ],
+            ordered=False,
+            session=session,
+        )
+
+    async def iter_allocations(self, query: dict, batch_size: int = 1000):
+        # Every allocation matching `query` in history order, fetched `batch_size` at a time
+        cursor = self.db.allocations.find(query, {"_id": 0}).sort(HISTORY_SORT)
+        async for allocation in cursor.batch_size(batch_size):
+            yield allocation
+
+    async def iter_active_allocations(self, since: datetime):
+        # Allocations still blocking their vehicle at or after `since`
+        cursor = self.db.allocations.find(
+            {"to_datetime": {"$gt": since}, "status": {"$ne": "rejected"}},
+            {"_id": 0, "allocation_id": 1, "vehicle_id": 1, "from_datetime": 1, "to_datetime": 1},
+        ).batch_size(1000)
+        async for allocation in cursor:
+            yield allocation
+
+    async def active_allocation_ids(self, allocation_ids: List[str]) -> set:
+        # Which of `allocation_ids` are stored and not rejected
+        cursor = self.db.allocations.find(
+            {"allocation_id": {"$in": allocation_ids}, "status": {"$ne": "rejected"}},
+            {"_id": 0, "allocation_id": 1},
+        )
+        return {allocation["allocation_id"] async for allocation in cursor}
+
+    async def iter_employee_bookings(self, since: datetime):
+        # Every booking get_allocation_by_employee_and_date could still match at or after `since`
+        cursor = self.db.allocations.find(
+            {"to_datetime": {"$gte": since}},
+            {"_id": 0, "employee_id": 1, "from_datetime": 1, "to_datetime": 1},
+        ).batch_size(1000)
+        async for booking in cursor:
+            yield booking
+
+    async def find_overlapping_allocation(
+        self,
+        vehicle_id: str,
+        from_datetime: datetime,
+        to_datetime: datetime,
+        exclude_allocation_id: Optional[str] = None,
+        session=None,
+    ):
+        # Any non-rejected booking of the vehicle intersecting [from_datetime, to_datetime)
+        query = {
+            "vehicle_id": vehicle_id,
+            "from_datetime": {"$lt": to_datetime},
+            "to_datetime": {"$gt": from_datetime},
+            "status": {"$ne": "rejected"},
+        }
+        if exclude_allocation_id:
+            query["allocation_id"] = {"$ne": exclude_allocation_id}
+        return await self.db.allocations.find_one(
+            query, {"_id": 0}, session=session  # Ensure the session is passed
+        )
 
     async def get_allocation_by_id(self, allocation_id: str, session=None):
-        allocation = await self.db.allocations.find_one(
+        return await self.db.allocations.find_one(
             {"allocation_id": allocation_id},
+            {"_id": 0},
             session=session,  # Ensure the session is passed
         )
-        if allocation:
-            allocation["_id"] = str(allocation["_id"])
-        return allocation
+
+    async def delete_allocation(self, allocation_id: str, session=None):
+        # Compensation of a CAS-mode booking whose later steps failed
+        await self.db.allocations.delete_one({"allocation_id": allocation_id}, session=session)
+
+    async def get_allocation(self, allocation_id: str, session=None) -> Optional[Allocation]:
+        allocation_data = await self.get_allocation_by_id(allocation_id, session=session)
+        if allocation_data:
+            return load_model(Allocation, allocation_data, self.trusted_reads)
+        return None
 
     async def update_allocation(self, allocation: dict, session=None):
         if "_id" in allocation:
@@ -86,8 +256,9 @@ class AllocationRepository:
 
 
 class VehicleRepository:
-    def __init__(self, db):
+    def __init__(self, db, trusted_reads: bool = True):
         self.db = db
+        self.trusted_reads = trusted_reads  # Build models without re-validating stored documents
 
     async def add_vehicle(self, vehicle: Vehicle, session=None):
         vehicle_data = vehicle.dict(by_alias=True)
@@ -95,11 +266,12 @@ class VehicleRepository:
 
     async def get_vehicle_by_id(self, vehicle_id: str, session=None) -> Vehicle:
         vehicle_data = await self.db.vehicles.find_one(
-            {"vehicle_id": vehicle_id}, session=session  # Ensure the session is passed
+            {"vehicle_id": vehicle_id},
+            VEHICLE_PROJECTION,
+            session=session,  # Ensure the session is passed
         )
         if vehicle_data:
-            vehicle_data["_id"] = str(vehicle_data["_id"])
-            return Vehicle(**vehicle_data)
+            return load_model(Vehicle, vehicle_data, self.trusted_reads)
         return None
 
     async def update_vehicle(self, vehicle: Vehicle, session=None):
@@ -112,14 +284,352 @@ class VehicleRepository:
             session=session,  # Ensure the session is passed
         )
 
-    async def get_vehicles_by_status(self, status: str):
-        vehicles = await self.db.vehicles.find({"status": status}).to_list(100)
-        for vehicle in vehicles:
-            vehicle["_id"] = str(vehicle["_id"])
-        return vehicles
+    async def touch_vehicle(self, vehicle_id: str, session=None):
+        # Write to the vehicle inside a booking transaction so concurrent bookings
+        # of the same vehicle conflict instead of both passing the overlap check
+        await self.db.vehicles.update_one(
+            {"vehicle_id": vehicle_id},
+            {"$inc": {"version": 1}},
+            session=session,  # Ensure the session is passed
+        )
+
+    async def claim_window(self, vehicle_id: str, window: dict, session=None) -> Optional[dict]:
+        # Compare-and-set: record the window only if the vehicle is available and no
+        # other booked window overlaps it. One atomic single-document write, so two
+        # claims can never both succeed; None when the claim is refused. $addToSet
+        # makes a retried claim of the same window succeed without duplicating it.
+        return await self.db.vehicles.find_one_and_update(
+            {
+                "vehicle_id": vehicle_id,
+                "status": "available",
+                "booked_windows": {
+                    "$not": {
+                        "$elemMatch": {
+                            "allocation_id": {"$ne": window["allocation_id"]},
+                            "from_datetime": {"$lt": window["to_datetime"]},
+                            "to_datetime": {"$gt": window["from_datetime"]},
+                        }
+                    }
+                },
+            },
+            {"$addToSet": {"booked_windows": window}, "$inc": {"version": 1}},
+            projection={"_id": 0, "vehicle_id": 1, "version": 1},
+            session=session,  # Ensure the session is passed
+        )
+
+    async def release_window(self, vehicle_id: str, allocation_id: str, session=None):
+        # Compensation of claim_window, and the first half of moving a booking
+        await self.db.vehicles.update_one(
+            {"vehicle_id": vehicle_id},
+            {"$pull": {"booked_windows": {"allocation_id": allocation_id}}},
+            session=session,  # Ensure the session is passed
+        )
+
+    async def prune_windows(self, before: datetime) -> int:
+        # Drop booked windows that ended before `before`; no claim can overlap them
+        result = await self.db.vehicles.update_many(
+            {"booked_windows.to_datetime": {"$lte": before}},
+            {"$pull": {"booked_windows": {"to_datetime": {"$lte": before}}}},
+        )
+        return result.modified_count
+
+    async def iter_booked_windows(self, since: datetime):
+        # (vehicle_id, allocation_id) of every CAS claim on a window not ended by `since`
+        cursor = self.db.vehicles.find(
+            {"booked_windows.to_datetime": {"$gt": since}},
+            {"_id": 0, "vehicle_id": 1, "booked_windows.allocation_id": 1},
+        ).batch_size(1000)
+        async for vehicle in cursor:
+            for window in vehicle["booked_windows"]:
+                yield vehicle["vehicle_id"], window["allocation_id"]
+
+    async def touch_vehicles(self, vehicle_ids: List[str], session=None):
+        # Batched touch_vehicle for bulk bookings
+        if vehicle_ids:
+            await self.db.vehicles.bulk_write(
+                [
+                    UpdateOne({"vehicle_id": vehicle_id}, {"$inc": {"version": 1}})
+                    for vehicle_id in vehicle_ids
+                ],
+                ordered=False,
+                session=session,  # Ensure the session is passed
+            )
+
+    async def iter_available_vehicles(self):
+        # The fields FleetIndex ranks auto-assignment candidates by
+        cursor = self.db.vehicles.find(
+            {"status": "available"},
+            {
+                "_id": 0,
+                "vehicle_id": 1,
+                "status": 1,
+                "make": 1,
+                "model": 1,
+                "capacity": 1,
+                "fuel_efficiency": 1,
+            },
+        ).batch_size(1000)
+        async for vehicle in cursor:
+            yield vehicle
+
+    async def get_vehicles_by_ids(self, vehicle_ids: List[str], session=None):
+        return await self.db.vehicles.find(
+            {"vehicle_id": {"$in": vehicle_ids}}, VEHICLE_PROJECTION, session=session
+        ).to_list(None)
+
+    async def find_vehicles(
+        self,
+        query: dict,
+        limit: int,
+        after: Optional[str] = None,
+        projection: Optional[dict] = None,
+    ) -> List[dict]:
+        # Keyset pagination in vehicle_id order: resume strictly after the `after` vehicle
+        if after:
+            query = {"$and": [query, {"vehicle_id": {"$gt": after}}]}
+        cursor = self.db.vehicles.find(query, projection or VEHICLE_PROJECTION).sort(VEHICLE_SORT)
+        return await cursor.limit(limit).to_list(limit)
+
+
+class OutboxRepository:
+    """
+    Transactional outbox: events are inserted in the same session as the write
+    they describe, and the relay (app/events/outbox_relay.py) publishes them
+    afterwards, so an event is never lost nor sent for a rolled-back write.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    async def add(self, entries: List[dict], session=None):
+        # Serialized events ({"id", "subject", "body"}); the id doubles as _id
+        if not entries:
+            return
+        now = datetime.utcnow()
+        await self.db.outbox.insert_many(
+            [
+                {
+                    "_id": entry["id"],
+                    "subject": entry["subject"],
+                    "body": entry["body"],
+                    "created_at": now,
+                    "published_at": None,
+                    "attempts": 0,
+                }
+                for entry in entries
+            ],
+            session=session,
+        )
+
+    async def get_pending(self, limit: int, max_attempts: int = 10) -> List[dict]:
+        # Oldest unpublished entries first; ones failing `max_attempts` times are left for inspection
+        # published_at is fixed by the filter: the (published_at, created_at) index returns
+        # them in created_at order, with no in-memory sort
+        return await self.db.outbox.find(
+            {"published_at": None, "attempts": {"$lt": max_attempts}}
+        ).sort("created_at", 1).to_list(limit)
+
+    async def mark(self, published_ids: List[str], failed_ids: List[str]) -> int:
+        # One round trip for the whole batch: stamp delivered entries, count failed attempts
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {"_id": entry_id, "published_at": None},
+                {"$set": {"published_at": now}, "$inc": {"attempts": 1}},
+            )
+            for entry_id in published_ids
+        ] + [UpdateOne({"_id": entry_id}, {"$inc": {"attempts": 1}}) for entry_id in failed_ids]
+        if not operations:
+            return 0
+        result = await self.db.outbox.bulk_write(operations, ordered=False)
+        return result.modified_count
+
+
+# Duration histogram bucket boundaries, in hours; longer bookings fall in "72+"
+BOOKING_DURATION_BUCKETS = [0, 1, 2, 4, 8, 24, 72]
 
-    async def get_all_vehicles(self):
-        vehicles = await self.db.vehicles.find().to_list(100)
-        for vehicle in vehicles:
-            vehicle["_id"] = str(vehicle["_id"])
-        return vehicles
+_HOUR_MS = 3600 * 1000
+
+
+class ReportRepository:
+    """
+    Utilization reports computed server-side with aggregation pipelines.
+
+    Day-granular reports read the `daily_vehicle_usage` rollups (one small
+    document per vehicle per day). Other windows aggregate raw allocations
+    with a leading $match on a from_datetime range, so the history index
+    serves it. Every pipeline runs with allowDiskUse so large windows spill
+    to disk instead of failing at the 100MB stage limit.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    async def _aggregate(self, pipeline: List[dict], collection: str = "allocations") -> List[dict]:
+        cursor = self.db[collection].aggregate(pipeline, allowDiskUse=True)
+        return await cursor.to_list(None)
+
+    @staticmethod
+    def _is_day_aligned(start: datetime, end: datetime) -> bool:
+        # Both bounds at UTC midnight, so the window is made of whole rollup days
+        return start.time() == time.min and end.time() == time.min
+
+    @staticmethod
+    def _match_days(start: datetime, end: datetime) -> dict:
+        # Rollup days touching [start, end)
+        last_day = (end - timedelta(microseconds=1)).date()
+        return {"$match": {"day": {"$gte": start.date().isoformat(), "$lte": last_day.isoformat()}}}
+
+    @staticmethod
+    def _match_starting(start: datetime, end: datetime) -> dict:
+        # Bookings starting inside [start, end)
+        return {
+            "$match": {
+                "from_datetime": {"$gte": start, "$lt": end},
+                "status": {"$ne": "rejected"},
+            }
+        }
+
+    @staticmethod
+    def _match_overlapping(start: datetime, end: datetime) -> dict:
+        # Bookings overlapping [start, end)
+        return {
+            "$match": {
+                "from_datetime": {"$lt": end},
+                "to_datetime": {"$gt": start},
+                "status": {"$ne": "rejected"},
+            }
+        }
+
+    async def vehicle_daily_bookings(self, start: datetime, end: datetime) -> List[dict]:
+        """
+        Bookings starting and hours booked per vehicle per UTC day, for every
+        day touching [start, end). Read from the rollups.
+        """
+        return await self._aggregate(
+            [
+                self._match_days(start, end),
+                {"$match": {"$or": [{"bookings": {"$gt": 0}}, {"booked_ms": {"$gt": 0}}]}},
+                {
+                    "$project": {
+                        "_id": 0,
+                        "vehicle_id": 1,
+                        "day": 1,
+                        "bookings": 1,
+                        "booked_hours": {"$divide": ["$booked_ms", _HOUR_MS]},
+                    }
+                },
+                {"$sort": {"day": 1, "vehicle_id": 1}},
+            ],
+            collection="daily_vehicle_usage",
+        )
+
+    async def vehicle_utilization(self, start: datetime, end: datetime) -> List[dict]:
+        """
+        Hours each vehicle is booked vs idle within [start, end), clipping
+        bookings to the window, and the bookings starting in it. Vehicles
+        without any booking are not listed. Whole-day windows read the rollups.
+        """
+        window_ms = (end - start).total_seconds() * 1000
+        if self._is_day_aligned(start, end):
+            collection = "daily_vehicle_usage"
+            pipeline = [
+                self._match_days(start, end),
+                {
+                    "$group": {
+                        "_id": "$vehicle_id",
+                        "bookings": {"$sum": "$bookings"},
+                        "booked_ms": {"$sum": "$booked_ms"},
+                    }
+                },
+                {"$match": {"$or": [{"bookings": {"$gt": 0}}, {"booked_ms": {"$gt": 0}}]}},
+            ]
+        else:
+            collection = "allocations"
+            pipeline = [
+                self._match_overlapping(start, end),
+                {
+                    "$group": {
+                        "_id": "$vehicle_id",
+                        "bookings": {
+                            "$sum": {"$cond": [{"$gte": ["$from_datetime", start]}, 1, 0]}
+                        },
+                        "booked_ms": {
+                            "$sum": {
+                                "$subtract": [
+                                    {"$min": ["$to_datetime", end]},
+                                    {"$max": ["$from_datetime", start]},
+                                ]
+                            }
+                        },
+                    }
+                },
+            ]
+        return await self._aggregate(
+            pipeline
+            + [
+                {
+                    "$project": {
+                        "_id": 0,
+                        "vehicle_id": "$_id",
+                        "bookings": 1,
+                        "booked_hours": {"$divide": ["$booked_ms", _HOUR_MS]},
+                        "idle_hours": {
+                            "$divide": [
+                                {"$max": [{"$subtract": [window_ms, "$booked_ms"]}, 0]},
+                                _HOUR_MS,
+                            ]
+                        },
+                        "utilization": {"$min": [{"$divide": ["$booked_ms", window_ms]}, 1]},
+                    }
+                },
+                {"$sort": {"utilization": -1, "vehicle_id": 1}},
+            ],
+            collection=collection,
+        )
+
+    async def top_employees(self, start: datetime, end: datetime, limit: int = 10) -> List[dict]:
+        """Employees with the most bookings starting in [start, end)."""
+        return await self._aggregate(
+            [
+                self._match_starting(start, end),
+                {
+                    "$group": {
+                        "_id": "$employee_id",
+                        "bookings": {"$sum": 1},
+                        "booked_ms": {"$sum": {"$subtract": ["$to_datetime", "$from_datetime"]}},
+                        "vehicles": {"$addToSet": "$vehicle_id"},
+                    }
+                },
+                {"$sort": {"bookings": -1, "booked_ms": -1, "_id": 1}},
+                {"$limit": limit},
+                {
+                    "$project": {
+                        "_id": 0,
+                        "employee_id": "$_id",
+                        "bookings": 1,
+                        "booked_hours": {"$divide": ["$booked_ms", _HOUR_MS]},
+                        "distinct_vehicles": {"$size": "$vehicles"},
+                    }
+                },
+            ]
+        )
+
+    async def booking_durations(self, start: datetime, end: datetime) -> List[dict]:
+        """Histogram of booking lengths, in hours, for bookings starting in [start, end)."""
+        return await self._aggregate(
+            [
+                self._match_starting(start, end),
+                {
+                    "$bucket": {
+                        "groupBy": {
+                            "$divide": [{"$subtract": ["$to_datetime", "$from_datetime"]}, _HOUR_MS]
+                        },
+                        "boundaries": BOOKING_DURATION_BUCKETS,
+                        "default": f"{BOOKING_DURATION_BUCKETS[-1]}+",
+                        "output": {"bookings": {"$sum": 1}},
+                    }
+                },
+                {"$project": {"_id": 0, "min_hours": "$_id", "bookings": 1}},
+            ]
+        )
@@ -0,0 +1,204 @@
+"""
+Keeps every worker's in-process indexes in step over Redis pub/sub.
+
+Each worker holds its own AvailabilityIndex and FleetIndex. After a committed
+booking or vehicle write the service updates its local copies and publishes
+the change on `channel`; the other workers apply it to theirs. The change
+stream worker publishes what it sees too, so writes that bypass the services
+reach the API workers as well. A message can still be lost (Redis restart, dropped
+connection), so the indexes are rebuilt from MongoDB whenever the listener
+(re)subscribes and every `reload_interval` seconds, which bounds how long a
+worker can stay behind. Reads from the indexes are therefore best effort;
+the booking paths re-check the vehicle and window in MongoDB before they write.
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple, Union
+from uuid import uuid4
+from app.core.availability import AvailabilityIndex
+from app.core.fleet import FLEET_FIELDS, FleetIndex
+from app.core.models import Vehicle
+
+# (allocation_id, vehicle_id, from_datetime, to_datetime)
+BookedWindow = Tuple[str, str, Union[str, datetime], Union[str, datetime]]
+
+
+def _iso(value: Union[str, datetime]) -> str:
+    return value if isinstance(value, str) else value.isoformat()
+
+
+class IndexSync:
+    def __init__(
+        self,
+        cache,
+        availability: AvailabilityIndex,
+        allocation_repo=None,
+        fleet: Optional[FleetIndex] = None,
+        vehicle_repo=None,
+        channel: str = "index:sync",
+        reload_interval: float = 300,
+    ):
+        self.cache = cache
+        self.availability = availability
+        self.allocation_repo = allocation_repo  # Rebuilds the availability index
+        self.fleet = fleet
+        self.vehicle_repo = vehicle_repo  # Rebuilds the fleet index
+        self.channel = channel
+        self.reload_interval = reload_interval  # Seconds between full rebuilds; 0 disables
+        self.origin = str(uuid4())  # Lets the listener skip our own messages
+        self.messages_received = 0
+        self.reloads = 0
+        self.logger = logging.getLogger(__name__)
+        self._reload_lock = asyncio.Lock()
+        # Changes seen while a rebuild runs, replayed onto the rebuilt indexes
+        self._pending: Optional[List[dict]] = None
+        self._tasks: List[asyncio.Task] = []
+        self._first_subscribe = asyncio.Event()  # Set once the listener's first attempt is over
+
+    async def publish(
+        self,
+        booked: Iterable[BookedWindow] = (),
+        released: Iterable[str] = (),
+        vehicles: Iterable[Union[Vehicle, dict]] = (),
+        reload: bool = False,
+    ):
+        """
+        Announce changes already applied to the local indexes. Never raises:
+        the write they describe is committed, and the next rebuild catches up.
+        """
+        message = {
+            "origin": self.origin,
+            "booked": [
+                [allocation_id, vehicle_id, _iso(start), _iso(end)]
+                for allocation_id, vehicle_id, start, end in booked
+            ],
+            "released": list(released),
+            # Just what FleetIndex ranks by; a vehicle that is not available leaves it
+            "vehicles": [
+                {field: vehicle.get(field) for field in ("status",) + FLEET_FIELDS}
+                for vehicle in (
+                    entry.model_dump(mode="json") if isinstance(entry, Vehicle) else entry
+                    for entry in vehicles
+                )
+            ],
+            "reload": reload,
+        }
+        if not (message["booked"] or message["released"] or message["vehicles"] or reload):
+            return
+        if self._pending is not None:
+            self._pending.append(message)
+        try:
+            await self.cache.publish(self.channel, json.dumps(message))
+        except Exception as e:
+            self.logger.error(f"Index sync publish error: {e}")
+
+    def apply(self, message: dict) -> bool:
+        """
+        Apply a change published by another worker. Returns True if it asks
+        for a full rebuild instead.
+        """
+        if message.get("origin") == self.origin:
+            return False
+        self.messages_received += 1
+        if self._pending is not None:
+            self._pending.append(message)
+        self._apply(message)
+        return bool(message.get("reload"))
+
+    def _apply(self, message: dict):
+        for allocation_id, vehicle_id, start, end in message.get("booked", []):
+            self.availability.add(allocation_id, vehicle_id, start, end)
+        for allocation_id in message.get("released", []):
+            self.availability.remove(allocation_id)
+        if self.fleet is not None:
+            for vehicle in message.get("vehicles", []):
+                self.fleet.add(vehicle)
+
+    async def reload(self):
+        """Rebuild the indexes from MongoDB, keeping changes that arrive meanwhile."""
+        async with self._reload_lock:
+            self._pending = []
+            try:
+                if self.allocation_repo is not None:
+                    await self.availability.load(self.allocation_repo)
+                if self.fleet is not None and self.vehicle_repo is not None:
+                    await self.fleet.load(self.vehicle_repo)
+                # The rebuild may have read past or before any of these; both are idempotent
+                for message in self._pending:
+                    self._apply(message)
+            finally:
+                self._pending = None
+            self.reloads += 1
+
+    def stats(self) -> dict:
+        return {"messages_received": self.messages_received, "reloads": self.reloads}
+
+    async def start(self):
+        """
+        Listen for other workers' changes and rebuild periodically. Returns
+        once the indexes are loaded: by the listener's rebuild on subscribing,
+        or here if Redis cannot be reached (the listener rebuilds again once
+        it subscribes).
+        """
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.create_task(self._listen()))
+        if self.reload_interval > 0:
+            self._tasks.append(asyncio.create_task(self._reload_periodically()))
+        await self._first_subscribe.wait()
+        if self.reloads == 0:
+            await self.reload()
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    async def _reload_periodically(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Index reload failed: {e}")
+
+    async def _listen(self):
+        backoff = 0.5
+        while True:
+            pubsub = self.cache.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                # Anything published while we were not subscribed is lost
+                await self.reload()
+                self._first_subscribe.set()
+                backoff = 0.5
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        wants_reload = self.apply(json.loads(message["data"]))
+                    except (ValueError, TypeError, KeyError) as e:
+                        self.logger.error(f"Invalid index sync message: {e}")
+                        continue
+                    if wants_reload:
+                        await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Index sync listener error: {e}")
+                self._first_subscribe.set()
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 10)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
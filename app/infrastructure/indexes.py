@@ -0,0 +1,254 @@
+"""
+Declarative MongoDB index registry and query-shape report.
+
+Indexes are created idempotently at startup (see the lifespan hook in main.py).
+Run the report before deploying to catch queries that fall back to a
+collection scan:
+
+    python -m app.infrastructure.indexes explain
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+from app.infrastructure.db import HISTORY_SORT, VEHICLE_SORT
+
+# Set up logging
+general_logger = logging.getLogger("appLogger")  # For general logs
+error_logger = logging.getLogger("errorLogger")  # For error logs
+
+
+# Every index the repositories rely on, per collection
+INDEXES: Dict[str, List[IndexModel]] = {
+    "allocations": [
+        IndexModel([("allocation_id", 1)], unique=True),
+        IndexModel(HISTORY_SORT),
+        IndexModel([("employee_id", 1)] + HISTORY_SORT),
+        IndexModel([("vehicle_id", 1)] + HISTORY_SORT),
+        IndexModel([("to_datetime", 1)]),
+    ],
+    "vehicles": [
+        IndexModel([("vehicle_id", 1)], unique=True),
+        IndexModel([("status", 1)] + VEHICLE_SORT),
+        IndexModel([("make", 1), ("model", 1)] + VEHICLE_SORT),
+        IndexModel([("booked_windows.to_datetime", 1)]),
+    ],
+    "daily_vehicle_usage": [
+        IndexModel([("vehicle_id", 1), ("day", 1)], unique=True),
+        IndexModel([("day", 1), ("vehicle_id", 1)]),
+    ],
+    "outbox": [
+        # The relay's pending entries (published_at null), oldest first
+        IndexModel([("published_at", 1), ("created_at", 1)]),
+        # Published entries are kept a week for inspection; pending ones (null) never expire
+        IndexModel([("published_at", 1)], name="published_at_ttl", expireAfterSeconds=7 * 86400),
+    ],
+}
+
+
+_sample_time = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+# Representative filter/sort of each repository query, checked by `explain`
+QUERY_SHAPES = [
+    {
+        "name": "AllocationRepository.get_allocations_by_filter (employee)",
+        "collection": "allocations",
+        "filter": {"employee_id": "e", "from_datetime": {"$gte": _sample_time}},
+        "sort": HISTORY_SORT,
+    },
+    {
+        "name": "AllocationRepository.get_allocations_by_filter (vehicle)",
+        "collection": "allocations",
+        "filter": {"vehicle_id": "v"},
+        "sort": HISTORY_SORT,
+    },
+    {
+        "name": "AllocationRepository.get_allocations_by_filter (unfiltered)",
+        "collection": "allocations",
+        "filter": {},
+        "sort": HISTORY_SORT,
+    },
+    {
+        "name": "AllocationRepository.get_allocation_by_employee_and_date",
+        "collection": "allocations",
+        "filter": {
+            "employee_id": "e",
+            "from_datetime": {"$lte": _sample_time},
+            "to_datetime": {"$gte": _sample_time},
+        },
+    },
+    {
+        "name": "AllocationRepository.get_allocation_by_id",
+        "collection": "allocations",
+        "filter": {"allocation_id": "a"},
+    },
+    {
+        "name": "AllocationRepository.iter_active_allocations",
+        "collection": "allocations",
+        "filter": {"to_datetime": {"$gt": _sample_time}, "status": {"$ne": "rejected"}},
+    },
+    {
+        "name": "AllocationRepository.find_overlapping_allocation",
+        "collection": "allocations",
+        "filter": {
+            "vehicle_id": "v",
+            "from_datetime": {"$lt": _sample_time},
+            "to_datetime": {"$gt": _sample_time},
+            "status": {"$ne": "rejected"},
+        },
+    },
+    {
+        "name": "AllocationRepository.find_conflicting_allocations",
+        "collection": "allocations",
+        "filter": {
+            "$or": [{"vehicle_id": {"$in": ["v"]}}, {"employee_id": {"$in": ["e"]}}],
+            "from_datetime": {"$lte": _sample_time},
+            "to_datetime": {"$gte": _sample_time},
+        },
+    },
+    {
+        "name": "ReportRepository (bookings starting in a window)",
+        "collection": "allocations",
+        "filter": {
+            "from_datetime": {"$gte": _sample_time, "$lt": _sample_time},
+            "status": {"$ne": "rejected"},
+        },
+    },
+    {
+        "name": "ReportRepository (bookings overlapping a window)",
+        "collection": "allocations",
+        "filter": {
+            "from_datetime": {"$lt": _sample_time},
+            "to_datetime": {"$gt": _sample_time},
+            "status": {"$ne": "rejected"},
+        },
+    },
+    {
+        "name": "ReportRepository (daily usage rollups in a window)",
+        "collection": "daily_vehicle_usage",
+        "filter": {"day": {"$gte": "2030-01-01", "$lte": "2030-12-31"}},
+    },
+    {
+        "name": "OutboxRepository.get_pending",
+        "collection": "outbox",
+        "filter": {"published_at": None, "attempts": {"$lt": 10}},
+        "sort": [("created_at", 1)],
+    },
+    {
+        "name": "AllocationRepository.active_allocation_ids",
+        "collection": "allocations",
+        "filter": {"allocation_id": {"$in": ["a"]}, "status": {"$ne": "rejected"}},
+    },
+    {
+        "name": "VehicleRepository.iter_booked_windows",
+        "collection": "vehicles",
+        "filter": {"booked_windows.to_datetime": {"$gt": _sample_time}},
+    },
+    {
+        "name": "VehicleRepository.get_vehicle_by_id",
+        "collection": "vehicles",
+        "filter": {"vehicle_id": "v"},
+    },
+    {
+        "name": "VehicleRepository.get_vehicles_by_ids",
+        "collection": "vehicles",
+        "filter": {"vehicle_id": {"$in": ["v"]}},
+    },
+    {
+        "name": "VehicleRepository.find_vehicles (all)",
+        "collection": "vehicles",
+        "filter": {"vehicle_id": {"$gt": "v"}},
+        "sort": VEHICLE_SORT,
+    },
+    {
+        "name": "VehicleRepository.find_vehicles (available)",
+        "collection": "vehicles",
+        "filter": {"status": "available", "vehicle_id": {"$gt": "v"}},
+        "sort": VEHICLE_SORT,
+    },
+    {
+        "name": "VehicleRepository.find_vehicles (make and model)",
+        "collection": "vehicles",
+        "filter": {"make": "m", "model": "m", "capacity": {"$gte": 4}},
+        "sort": VEHICLE_SORT,
+    },
+]
+
+
+async def ensure_indexes(db):
+    """Create every registered index. Existing identical indexes are left untouched."""
+    for collection, indexes in INDEXES.items():
+        try:
+            names = await db[collection].create_indexes(indexes)
+            general_logger.info(f"Indexes ensured on {collection}: {names}")
+        except OperationFailure as e:
+            # e.g. duplicates blocking a unique index; keep serving and surface it
+            error_logger.error(f"Failed to create indexes on {collection}: {e}")
+
+
+def _plan_stages(plan) -> List[str]:
+    """All stage names in an explain plan, however deeply nested."""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(_plan_stages(value))
+    return stages
+
+
+async def explain_query_shapes(db) -> List[dict]:
+    """Explain each registered query shape and flag the ones using a COLLSCAN."""
+    report = []
+    for shape in QUERY_SHAPES:
+        cursor = db[shape["collection"]].find(shape["filter"])
+        if shape.get("sort"):
+            cursor = cursor.sort(shape["sort"])
+        explanation = await cursor.explain()
+        stages = _plan_stages(explanation["queryPlanner"]["winningPlan"])
+        report.append(
+            {
+                "name": shape["name"],
+                "stages": stages,
+                "collscan": "COLLSCAN" in stages,
+            }
+        )
+    return report
+
+
+async def main(argv=None) -> int:
+    from app.infrastructure.config import settings
+    from app.infrastructure.db import get_db
+
+    parser = argparse.ArgumentParser(description="Manage MongoDB indexes.")
+    parser.add_argument(
+        "command",
+        choices=["ensure", "explain"],
+        help="'ensure' creates the registered indexes, 'explain' checks every query shape",
+    )
+    args = parser.parse_args(argv)
+
+    db_client, db = get_db(settings)
+    try:
+        if args.command == "ensure":
+            await ensure_indexes(db)
+            return 0
+
+        report = await explain_query_shapes(db)
+        for entry in report:
+            flag = "COLLSCAN" if entry["collscan"] else "ok"
+            print(f"[{flag:>8}] {entry['name']}: {' > '.join(entry['stages'])}")
+        return 1 if any(entry["collscan"] for entry in report) else 0
+    finally:
+        db_client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
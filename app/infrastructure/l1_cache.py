@@ -0,0 +1,246 @@
+import asyncio
+import fnmatch
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, List, Optional, Tuple
+from uuid import uuid4
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Bounded, TTL-aware, least-recently-used map. Not shared between processes."""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> Any:
+        """Return the cached value, or _MISSING if absent or expired."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def delete_pattern(self, pattern: str):
+        for key in fnmatch.filter(list(self._entries), pattern):
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+
+class TieredCache:
+    """
+    RedisCache with an in-process LRU tier in front of it.
+
+    Only keys starting with one of `prefixes` use the L1 tier. Every write or
+    invalidation is published on `channel` so the other workers and nodes drop
+    their local copies; `ttl` bounds staleness if a message is ever missed.
+    Values are returned by reference from L1 and must not be mutated.
+    """
+
+    def __init__(
+        self,
+        redis_cache,
+        max_entries: int = 10000,
+        ttl: float = 30,
+        prefixes: Iterable[str] = ("vehicle:", "history:"),
+        channel: str = "cache:invalidate",
+    ):
+        self.redis_cache = redis_cache
+        self.l1 = LRUCache(max_entries, ttl)
+        self.prefixes = tuple(prefixes)
+        self.channel = channel
+        self.origin = str(uuid4())  # Lets the listener skip our own messages
+        self.invalidations_received = 0
+        self.logger = logging.getLogger(__name__)
+        self._listener: Optional[asyncio.Task] = None
+
+    def __getattr__(self, name):
+        # Anything without an L1 concern (locks, warm up, ...) goes straight to Redis
+        return getattr(self.redis_cache, name)
+
+    def uses_l1(self, key: str) -> bool:
+        return key.startswith(self.prefixes)
+
+    async def get(self, key: str) -> Any:
+        if not self.uses_l1(key):
+            return await self.redis_cache.get(key)
+        value = self.l1.get(key)
+        if value is not _MISSING:
+            return value
+        value = await self.redis_cache.get(key)
+        if value is not None:
+            self.l1.set(key, value)
+        return value
+
+    async def set(self, key: str, value: Any, expiration: int = 3600):
+        await self.redis_cache.set(key, value, expiration=expiration)
+        if self.uses_l1(key):
+            self.l1.set(key, value, expiration)
+            await self._publish(keys=[key])
+
+    async def delete(self, key: str):
+        self.l1.delete(key)
+        await self.redis_cache.delete(key)
+        if self.uses_l1(key):
+            await self._publish(keys=[key])
+
+    async def delete_pattern(self, pattern: str):
+        self.l1.delete_pattern(pattern)
+        await self.redis_cache.delete_pattern(pattern)
+        await self._publish(patterns=[pattern])
+
+    async def get_many(self, keys: List[str]) -> List[Any]:
+        values = [self.l1.get(key) if self.uses_l1(key) else _MISSING for key in keys]
+        missing = [key for key, value in zip(keys, values) if value is _MISSING]
+        if not missing:
+            return values
+        fetched = dict(zip(missing, await self.redis_cache.get_many(missing)))
+        for key, value in fetched.items():
+            if value is not None and self.uses_l1(key):
+                self.l1.set(key, value)
+        return [fetched[key] if value is _MISSING else value for key, value in zip(keys, values)]
+
+    async def set_many(self, values: dict, expiration: int = 3600):
+        await self.redis_cache.set_many(values, expiration)
+        local = [key for key in values if self.uses_l1(key)]
+        for key in local:
+            self.l1.set(key, values[key], expiration)
+        await self._publish(keys=local)
+
+    async def delete_many(self, keys: List[str]):
+        for key in keys:
+            self.l1.delete(key)
+        await self.redis_cache.delete_many(keys)
+        await self._publish(keys=[key for key in keys if self.uses_l1(key)])
+
+    async def execute_batch(self, operations: List[tuple]):
+        touched = []
+        for operation in operations:
+            if operation[0] == "set":
+                _, key, value, expiration = operation
+                touched.append(key)
+                if self.uses_l1(key):
+                    self.l1.set(key, value, expiration)
+            elif operation[0] in ("delete", "bump"):
+                for key in operation[1]:
+                    touched.append(key)
+                    self.l1.delete(key)
+        await self.redis_cache.execute_batch(operations)
+        await self._publish(keys=[key for key in touched if self.uses_l1(key)])
+
+    async def get_generations(self, keys: List[str], expiration: int = 86400) -> List[int]:
+        values = [self.l1.get(key) if self.uses_l1(key) else _MISSING for key in keys]
+        missing = [key for key, value in zip(keys, values) if value is _MISSING]
+        if missing:
+            fetched = dict(
+                zip(missing, await self.redis_cache.get_generations(missing, expiration))
+            )
+            for key in missing:
+                if self.uses_l1(key):
+                    self.l1.set(key, fetched[key])
+            values = [fetched[key] if value is _MISSING else value for key, value in zip(keys, values)]
+        return values
+
+    async def bump_generations(self, keys: List[str], expiration: int = 86400):
+        for key in keys:
+            self.l1.delete(key)
+        await self.redis_cache.bump_generations(keys, expiration)
+        await self._publish(keys=[key for key in keys if self.uses_l1(key)])
+
+    def stats(self) -> dict:
+        lookups = self.l1.hits + self.l1.misses
+        return {
+            "l1_entries": len(self.l1),
+            "l1_hits": self.l1.hits,
+            "l1_misses": self.l1.misses,
+            "l1_hit_ratio": self.l1.hits / lookups if lookups else 0.0,
+            "l1_evictions": self.l1.evictions,
+            "invalidations_received": self.invalidations_received,
+        }
+
+    async def start(self):
+        """Start listening for invalidations published by other workers."""
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self.redis_cache.close()
+
+    async def _publish(self, keys: List[str] = (), patterns: List[str] = ()):
+        if keys or patterns:
+            message = {"origin": self.origin, "keys": list(keys), "patterns": list(patterns)}
+            await self.redis_cache.publish(self.channel, json.dumps(message))
+
+    def apply_invalidation(self, message: dict):
+        """Drop local copies named by an invalidation message from another worker."""
+        if message.get("origin") == self.origin:
+            return
+        self.invalidations_received += 1
+        for key in message.get("keys", []):
+            self.l1.delete(key)
+        for pattern in message.get("patterns", []):
+            self.l1.delete_pattern(pattern)
+
+    async def _listen(self):
+        backoff = 0.5
+        while True:
+            pubsub = self.redis_cache.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                # Anything published while we were disconnected is lost
+                self.l1.clear()
+                backoff = 0.5
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        self.apply_invalidation(json.loads(message["data"]))
+                    except (ValueError, TypeError) as e:
+                        self.logger.error(f"Invalid cache invalidation message: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Cache invalidation listener error: {e}")
+                self.l1.clear()
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 10)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
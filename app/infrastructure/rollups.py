@@ -0,0 +1,127 @@
+"""
+Backfill of the data derived from the `allocations` collection: the
+`daily_vehicle_usage` rollups and the `booked_windows` of each vehicle.
+
+The services keep the rollups current on every booking, and the windows in
+CAS mode only; run these once after deploying them (the windows every time
+before switching ALLOCATION_MODE to "cas"), or to repair drift:
+
+    python -m app.infrastructure.rollups rebuild
+    python -m app.infrastructure.rollups booked-windows
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Tuple
+from pymongo import UpdateOne
+from app.core.usage import daily_usage
+from app.infrastructure.db import AllocationRepository
+from app.infrastructure.indexes import INDEXES
+
+# Set up logging
+general_logger = logging.getLogger("appLogger")  # For general logs
+error_logger = logging.getLogger("errorLogger")  # For error logs
+
+ROLLUP_COLLECTION = "daily_vehicle_usage"
+
+
+async def rebuild_daily_usage(db, batch_size: int = 1000) -> int:
+    """
+    Recompute every rollup document and swap them in with one rename, so
+    reports never see a half-built collection. Bookings committed while the
+    rebuild runs are lost from the rollups; run it when writes are quiet.
+    Returns the number of rollup documents written.
+    """
+    totals: Dict[Tuple[str, str], dict] = {}
+    allocation_repo = AllocationRepository(db)
+    async for allocation in allocation_repo.iter_allocations(
+        {"status": {"$ne": "rejected"}}, batch_size=batch_size
+    ):
+        for row in daily_usage(
+            allocation["vehicle_id"], allocation["from_datetime"], allocation["to_datetime"]
+        ):
+            key = (row["vehicle_id"], row["day"])
+            if key in totals:
+                totals[key]["bookings"] += row["bookings"]
+                totals[key]["booked_ms"] += row["booked_ms"]
+            else:
+                totals[key] = row
+
+    staging = db[f"{ROLLUP_COLLECTION}_rebuild"]
+    await staging.drop()
+    await staging.create_indexes(INDEXES[ROLLUP_COLLECTION])
+    rows = list(totals.values())
+    for offset in range(0, len(rows), batch_size):
+        await staging.insert_many(rows[offset : offset + batch_size], ordered=False)
+    if rows:
+        await staging.rename(ROLLUP_COLLECTION, dropTarget=True)
+    else:
+        await db[ROLLUP_COLLECTION].delete_many({})
+        await staging.drop()
+    general_logger.info(f"Rebuilt {len(rows)} {ROLLUP_COLLECTION} documents")
+    return len(rows)
+
+
+async def rebuild_booked_windows(db, batch_size: int = 1000) -> int:
+    """
+    Reset every vehicle's booked_windows to its bookings that have not ended.
+    Claims made while this runs can be overwritten; run it when writes are
+    quiet. Returns the number of vehicles with at least one booked window.
+    """
+    windows = defaultdict(list)
+    allocation_repo = AllocationRepository(db)
+    async for allocation in allocation_repo.iter_active_allocations(datetime.now(timezone.utc)):
+        windows[allocation["vehicle_id"]].append(
+            {
+                "allocation_id": allocation["allocation_id"],
+                "from_datetime": allocation["from_datetime"],
+                "to_datetime": allocation["to_datetime"],
+            }
+        )
+
+    operations = [
+        UpdateOne({"vehicle_id": vehicle_id}, {"$set": {"booked_windows": booked}})
+        for vehicle_id, booked in windows.items()
+    ]
+    for offset in range(0, len(operations), batch_size):
+        await db.vehicles.bulk_write(operations[offset : offset + batch_size], ordered=False)
+    await db.vehicles.update_many(
+        {"vehicle_id": {"$nin": list(windows)}, "booked_windows.0": {"$exists": True}},
+        {"$set": {"booked_windows": []}},
+    )
+    general_logger.info(f"Rebuilt booked windows of {len(windows)} vehicles")
+    return len(windows)
+
+
+async def main(argv=None) -> int:
+    from app.infrastructure.config import settings
+    from app.infrastructure.db import get_db
+
+    parser = argparse.ArgumentParser(description="Manage data derived from the allocations.")
+    parser.add_argument(
+        "command",
+        choices=["rebuild", "booked-windows"],
+        help="'rebuild' recomputes every daily usage rollup, 'booked-windows' every "
+        "vehicle's booked windows, from the allocations collection",
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    db_client, db = get_db(settings)
+    try:
+        if args.command == "booked-windows":
+            vehicles = await rebuild_booked_windows(db, batch_size=args.batch_size)
+            print(f"Rebuilt booked windows of {vehicles} vehicles")
+            return 0
+        written = await rebuild_daily_usage(db, batch_size=args.batch_size)
+        print(f"Rebuilt {written} {ROLLUP_COLLECTION} documents")
+        return 0
+    finally:
+        db_client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
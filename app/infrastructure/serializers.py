@@ -0,0 +1,165 @@
+import json
+import zlib
+from datetime import date, datetime
+from typing import Any, Dict, Type
+from pydantic import BaseModel
+from app.core.models import Allocation, Vehicle
+
+# Models that may be cached; decoded with model_construct since the data is ours
+CACHEABLE_MODELS: Dict[str, Type[BaseModel]] = {
+    "Allocation": Allocation,
+    "Vehicle": Vehicle,
+}
+
+_PLAIN_TYPES = (str, int, float, bool, type(None))
+
+# First byte of every encoded value. Legacy values (plain JSON or str(value))
+# always start with a printable character, so they can still be told apart.
+FORMAT_JSON = 0x01
+FORMAT_MSGPACK = 0x02
+COMPRESSED = 0x80
+
+
+def to_tagged(value: Any) -> Any:
+    """Convert a value to plain JSON types, tagging the ones JSON would lose."""
+    if isinstance(value, _PLAIN_TYPES):
+        return value
+    if isinstance(value, dict):
+        return {key: to_tagged(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_tagged(item) for item in value]
+    if isinstance(value, tuple):
+        return {"__tuple__": [to_tagged(item) for item in value]}
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, BaseModel):
+        name = type(value).__name__
+        if name not in CACHEABLE_MODELS:
+            raise TypeError(f"Model {name} is not registered in CACHEABLE_MODELS")
+        return {"__model__": name, "data": to_tagged(dict(value))}
+    return value
+
+
+def from_tagged(value: Any) -> Any:
+    """Inverse of to_tagged."""
+    if isinstance(value, _PLAIN_TYPES):
+        return value
+    if isinstance(value, list):
+        return [from_tagged(item) for item in value]
+    if isinstance(value, dict):
+        if len(value) == 1:
+            if "__tuple__" in value:
+                return tuple(from_tagged(item) for item in value["__tuple__"])
+            if "__datetime__" in value:
+                return datetime.fromisoformat(value["__datetime__"])
+            if "__date__" in value:
+                return date.fromisoformat(value["__date__"])
+        if "__model__" in value and len(value) == 2:
+            model = CACHEABLE_MODELS[value["__model__"]]
+            return model.model_construct(**from_tagged(value["data"]))
+        return {key: from_tagged(item) for key, item in value.items()}
+    return value
+
+
+class Serializer:
+    """Encodes cache values to bytes and back without losing Python types."""
+
+    name = "json"
+    format = FORMAT_JSON
+
+    def __init__(self, compression_threshold: int = 1024, compression_level: int = 1):
+        self.compression_threshold = compression_threshold
+        self.compression_level = compression_level
+
+    def encode(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    def decode(self, payload: bytes) -> Any:
+        return json.loads(payload)
+
+    def dumps(self, value: Any) -> bytes:
+        payload = self.encode(to_tagged(value))
+        header = self.format
+        if self.compression_threshold and len(payload) > self.compression_threshold:
+            payload = zlib.compress(payload, self.compression_level)
+            header |= COMPRESSED
+        return bytes([header]) + payload
+
+    def loads(self, raw: bytes) -> Any:
+        if isinstance(raw, str):
+            raw = raw.encode()
+        header = raw[0] if raw else 0
+        value_format = header & ~COMPRESSED
+        if value_format not in (FORMAT_JSON, FORMAT_MSGPACK):
+            return self._loads_legacy(raw)
+        payload = raw[1:]
+        if header & COMPRESSED:
+            payload = zlib.decompress(payload)
+        if value_format == self.format:
+            return from_tagged(self.decode(payload))
+        # Written by another backend, e.g. before CACHE_SERIALIZER changed
+        if value_format == FORMAT_JSON:
+            return from_tagged(json.loads(payload))
+        import msgpack
+
+        return from_tagged(msgpack.unpackb(payload, raw=False))
+
+    def _loads_legacy(self, raw: bytes) -> Any:
+        # Values written before the codec existed: JSON, or str(value)
+        try:
+            return json.loads(raw)
+        except (ValueError, TypeError):
+            return raw.decode(errors="replace")
+
+
+class OrjsonSerializer(Serializer):
+    name = "orjson"
+    format = FORMAT_JSON
+
+    def __init__(self, *args, **kwargs):
+        import orjson
+
+        super().__init__(*args, **kwargs)
+        self._orjson = orjson
+
+    def encode(self, value: Any) -> bytes:
+        return self._orjson.dumps(value)
+
+    def decode(self, payload: bytes) -> Any:
+        return self._orjson.loads(payload)
+
+
+class MsgpackSerializer(Serializer):
+    name = "msgpack"
+    format = FORMAT_MSGPACK
+
+    def __init__(self, *args, **kwargs):
+        import msgpack
+
+        super().__init__(*args, **kwargs)
+        self._msgpack = msgpack
+
+    def encode(self, value: Any) -> bytes:
+        return self._msgpack.packb(value, use_bin_type=True)
+
+    def decode(self, payload: bytes) -> Any:
+        return self._msgpack.unpackb(payload, raw=False)
+
+
+SERIALIZERS = {
+    "json": Serializer,
+    "orjson": OrjsonSerializer,  # Requires the optional `orjson` package
+    "msgpack": MsgpackSerializer,  # Requires the optional `msgpack` package
+}
+
+
+def get_serializer(name: str = "json", compression_threshold: int = 1024) -> Serializer:
+    try:
+        serializer_class = SERIALIZERS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown cache serializer {name!r}; expected one of {sorted(SERIALIZERS)}"
+        )
+    return serializer_class(compression_threshold=compression_threshold)
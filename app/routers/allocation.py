@@ -1,12 +1,14 @@
-import os
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException
-from app.core.exceptions import DuplicateBookingError, VehicleUnavailableError
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import ValidationError
+from app.core.exceptions import (
+    DuplicateBookingError,
+    InvalidCursorError,
+    InvalidFieldsError,
+    VehicleUnavailableError,
+)
 from app.core.services import AllocationService
-from app.core.models import Allocation, UpdateAllocation
-from app.infrastructure.db import AllocationRepository, VehicleRepository, get_db
-from app.infrastructure.cache import get_cahce
-from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.models import Allocation, AutoAllocation, BulkAllocation, UpdateAllocation
 from utils import get_response
 import logging
 
@@ -16,13 +18,9 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-# Dependency injection for AllocationService
-def get_allocation_service():
-    db_client, db = get_db()
-    cache = get_cahce()
-    allocation_repo = AllocationRepository(db)
-    vehicle_repo = VehicleRepository(db)
-    return AllocationService(allocation_repo, vehicle_repo, cache, db_client)
+# Dependency injection for AllocationService (built once in the app lifespan)
+def get_allocation_service(request: Request) -> AllocationService:
+    return request.app.state.allocation_service
 
 
 # Endpoint to allocate a vehicle
@@ -73,6 +71,116 @@ async def allocate_vehicle(
         )
 
 
+# Endpoint to book the best free vehicle without naming one
+@router.post("/auto")
+async def auto_allocate_vehicle(
+    request: AutoAllocation,
+    allocation_service: AllocationService = Depends(get_allocation_service),
+):
+    """
+    Book the best vehicle free for the window that seats `passengers` (and at
+    least `min_capacity`, of `make`/`model` if given). `prefer` ranks the
+    candidates: `best_fit` (smallest capacity that fits, then most fuel
+    efficient) or `fuel_efficiency`.
+    """
+    try:
+        saved_allocation = await allocation_service.auto_allocate(
+            request.employee_id,
+            request.from_datetime,
+            request.to_datetime,
+            passengers=request.passengers,
+            min_capacity=request.min_capacity,
+            make=request.make,
+            model=request.model,
+            prefer=request.prefer,
+            purpose=request.purpose,
+        )
+        return get_response(
+            code="ALLOCATED",
+            status=200,
+            error=False,
+            message=f"Vehicle {saved_allocation.vehicle_id} allocated successfully",
+            data={"allocation": saved_allocation},
+        )
+
+    except DuplicateBookingError as e:
+        logger.warning(f"Duplicate booking error: {e}")
+        return get_response(
+            status=409,
+            error=True,
+            code="DUPLICATE_BOOKING",
+            message=str(e),
+        )
+    except VehicleUnavailableError as e:
+        logger.warning(f"No vehicle available: {e}")
+        return get_response(
+            status=409,
+            error=True,
+            code="NO_VEHICLE_AVAILABLE",
+            message=str(e),
+        )
+    except Exception as e:
+        logger.error(f"Error auto-allocating vehicle: {e}")
+        return get_response(
+            status=500,
+            error=True,
+            code="INTERNAL_ERROR",
+            message="An internal error occurred",
+        )
+
+
+# Endpoint to allocate many vehicles in one transaction
+@router.post("/allocate/bulk")
+async def allocate_vehicles_bulk(
+    bulk: BulkAllocation,
+    allocation_service: AllocationService = Depends(get_allocation_service),
+):
+    """
+    Allocate up to 100 bookings at once. Each item is validated and checked
+    on its own; the response reports success or failure per item, in order.
+    """
+    try:
+        results = [None] * len(bulk.allocations)
+        valid = []
+        for index, item in enumerate(bulk.allocations):
+            try:
+                valid.append((index, Allocation(**item)))
+            except ValidationError as e:
+                results[index] = {
+                    "status": "failed",
+                    "code": "VALIDATION_ERROR",
+                    "message": str(e),
+                }
+
+        outcomes = await allocation_service.allocate_vehicles_bulk(
+            [allocation for _, allocation in valid]
+        )
+        for (index, _), outcome in zip(valid, outcomes):
+            results[index] = outcome
+
+        allocated = sum(1 for result in results if result["status"] == "allocated")
+        return get_response(
+            code="BULK_PROCESSED",
+            status=200,
+            error=False,
+            message=f"{allocated} of {len(results)} vehicles allocated",
+            data={
+                "allocated": allocated,
+                "failed": len(results) - allocated,
+                "results": results,
+            },
+        )
+
+    except Exception as e:
+        logger.error(f"Error allocating vehicles in bulk: {e}")
+        return get_response(
+            status=500,
+            error=True,
+            code="INTERNAL_ERROR",
+            message="An internal error occurred",
+        )
+
+
 @router.patch("/update/{allocation_id}")
 async def update_allocation(
     allocation_id: str,
@@ -95,6 +203,14 @@ async def update_allocation(
             data={"allocation": updated_allocation},
         )
 
+    except VehicleUnavailableError as e:
+        logger.warning(f"Vehicle unavailable: {e}")
+        return get_response(
+            status=409,
+            error=True,
+            code="VEHICLE_UNAVAILABLE",
+            message=str(e),
+        )
     except ValueError as e:
         logger.error(f"Validation error: {e}")
         return get_response(
@@ -132,20 +248,31 @@ async def get_allocation_history(
     end_date: Optional[str] = None,
     page: int = 1,
     size: int = 10,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    fields: Optional[str] = None,
     allocation_service: AllocationService = Depends(get_allocation_service),
 ):
     """
     Fetch the allocation history based on provided filters.
-    Pagination supported via 'page' and 'size'.
+    Pagination supported via 'page' and 'size', or by passing back the
+    'next_cursor' of the previous page as 'cursor' (constant cost per page).
+    Set 'include_total=false' to skip counting matching allocations, and
+    'fields' (e.g. 'vehicle_id,from_datetime,to_datetime') to return only those fields.
     """
     try:
-        allocations, total_count = await allocation_service.get_filtered_allocations(
-            employee_id=employee_id,
-            vehicle_id=vehicle_id,
-            start_date=start_date,
-            end_date=end_date,
-            page=page,
-            size=size,
+        allocations, total_count, next_cursor = (
+            await allocation_service.get_filtered_allocations(
+                employee_id=employee_id,
+                vehicle_id=vehicle_id,
+                start_date=start_date,
+                end_date=end_date,
+                page=page,
+                size=size,
+                cursor=cursor,
+                include_total=include_total,
+                fields=fields,
+            )
         )
         if not allocations:
             return get_response(
@@ -163,12 +290,21 @@ async def get_allocation_history(
             message="Allocations found",
             data={
                 "total_count": total_count,
-                "page": page,
+                "page": None if cursor else page,
                 "size": size,
+                "next_cursor": next_cursor,
                 "allocations": allocations,
             },
         )
 
+    except InvalidCursorError as e:
+        return get_response(
+            status=400, error=True, code="INVALID_CURSOR", message=str(e)
+        )
+    except InvalidFieldsError as e:
+        return get_response(
+            status=400, error=True, code="INVALID_FIELDS", message=str(e)
+        )
     except Exception as e:
         return get_response(
             status=500,
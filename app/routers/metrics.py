@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Request
+
+# Create a router instance for runtime metrics
+router = APIRouter()
+
+
+@router.get("/")
+async def get_metrics(request: Request):
+    """Counters of the shared per-worker components."""
+    metrics = {}
+    cache = request.app.state.cache
+    if hasattr(cache, "stats"):
+        metrics["cache"] = cache.stats()
+    allocation_service = request.app.state.allocation_service
+    metrics["history_cache"] = dict(
+        allocation_service.history_stats,
+        coalesced=allocation_service.history_flights.coalesced,
+    )
+    metrics["allocations"] = dict(
+        allocation_service.allocation_stats, mode=allocation_service.allocation_mode
+    )
+    booking_filter = allocation_service.booking_filter
+    if booking_filter is not None:
+        metrics["employee_booking_filter"] = booking_filter.stats()
+    window_sweeper = getattr(request.app.state, "window_sweeper", None)
+    if window_sweeper is not None:
+        metrics["booked_windows"] = window_sweeper.stats()
+    index_sync = getattr(request.app.state, "index_sync", None)
+    if index_sync is not None:
+        metrics["index_sync"] = index_sync.stats()
+    event_publisher = getattr(request.app.state, "event_publisher", None)
+    if event_publisher is not None:
+        metrics["event_publisher"] = event_publisher.stats()
+    return metrics
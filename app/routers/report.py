@@ -1,11 +1,160 @@
-from fastapi import APIRouter
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from app.core.export import EXPORT_FORMATS, csv_chunks, ndjson_chunks
+from app.core.services import AllocationService, ReportService
+from app.routers.allocation import get_allocation_service
+from utils import get_response
+import logging
+
+# Initialize logging
+logger = logging.getLogger(__name__)
 
 # Create a router instance for reports
 router = APIRouter()
 
 
+# Dependency injection for ReportService (built once in the app lifespan)
+def get_report_service(request: Request) -> ReportService:
+    return request.app.state.report_service
+
+
+async def _report_response(name: str, compute):
+    try:
+        rows = await compute()
+        return get_response(
+            code="REPORT_READY",
+            status=200,
+            error=False,
+            message=f"{name} report",
+            data={"rows": rows},
+        )
+    except ValueError as e:
+        logger.warning(f"Invalid report window: {e}")
+        return get_response(
+            status=400,
+            error=True,
+            code="INVALID_WINDOW",
+            message=str(e),
+        )
+    except Exception as e:
+        logger.error(f"Error computing {name} report: {e}")
+        return get_response(
+            status=500,
+            error=True,
+            code="INTERNAL_ERROR",
+            message="An internal error occurred",
+        )
+
+
 # Define a sample endpoint related to reports
 @router.get("/allocation-history/{employee_id}")
 async def get_allocation_history(employee_id: str):
     # Placeholder for getting allocation history logic
     return {"message": f"Allocation history for employee {employee_id}"}
+
+
+@router.get("/allocations/export")
+async def export_allocations(
+    format: str = "ndjson",
+    employee_id: Optional[str] = None,
+    vehicle_id: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    batch_size: int = Query(1000, ge=1, le=10000),
+    allocation_service: AllocationService = Depends(get_allocation_service),
+):
+    """
+    Stream every allocation matching the history filters as NDJSON or CSV.
+    Rows are written as they are read from MongoDB, so memory use does not
+    grow with the size of the export.
+    """
+    if format not in EXPORT_FORMATS:
+        return get_response(
+            status=400,
+            error=True,
+            code="INVALID_FORMAT",
+            message=f"Unsupported export format {format!r}; expected one of {sorted(EXPORT_FORMATS)}",
+        )
+    try:
+        rows = allocation_service.export_allocations(
+            employee_id=employee_id,
+            vehicle_id=vehicle_id,
+            start_date=start_date,
+            end_date=end_date,
+            batch_size=batch_size,
+        )
+    except ValueError as e:
+        logger.warning(f"Invalid export filters: {e}")
+        return get_response(
+            status=400,
+            error=True,
+            code="INVALID_FILTERS",
+            message=str(e),
+        )
+
+    chunks = csv_chunks(rows) if format == "csv" else ndjson_chunks(rows)
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="allocations.{format}"'},
+    )
+
+
+@router.get("/utilization/daily")
+async def get_vehicle_daily_bookings(
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    report_service: ReportService = Depends(get_report_service),
+):
+    """
+    Per vehicle and UTC day, for every day touching [from, to): the bookings
+    starting that day and the hours booked within it. A booking spanning
+    midnight splits its hours across its days, and whole days are reported
+    even when `from`/`to` fall mid-day.
+    """
+    return await _report_response(
+        "Vehicle daily bookings",
+        lambda: report_service.vehicle_daily_bookings(start, end),
+    )
+
+
+@router.get("/utilization/vehicles")
+async def get_vehicle_utilization(
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    report_service: ReportService = Depends(get_report_service),
+):
+    """Hours booked vs idle per vehicle within [from, to)."""
+    return await _report_response(
+        "Vehicle utilization",
+        lambda: report_service.vehicle_utilization(start, end),
+    )
+
+
+@router.get("/employees/top")
+async def get_top_employees(
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    limit: int = Query(10, ge=1, le=100),
+    report_service: ReportService = Depends(get_report_service),
+):
+    """Employees with the most bookings starting in [from, to)."""
+    return await _report_response(
+        "Top employees",
+        lambda: report_service.top_employees(start, end, limit),
+    )
+
+
+@router.get("/bookings/durations")
+async def get_booking_durations(
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    report_service: ReportService = Depends(get_report_service),
+):
+    """Histogram of booking lengths in hours, for bookings starting in [from, to)."""
+    return await _report_response(
+        "Booking durations",
+        lambda: report_service.booking_durations(start, end),
+    )
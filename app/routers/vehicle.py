@@ -1,11 +1,10 @@
 import logging
-import os
-from fastapi import APIRouter, Depends
+from datetime import datetime, time
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, Query, Request
+from app.core.exceptions import InvalidCursorError, InvalidFieldsError
 from app.core.services import VehicleService
 from app.core.models import Vehicle
-from app.infrastructure.db import VehicleRepository, get_db
-from app.infrastructure.cache import get_cahce
-from motor.motor_asyncio import AsyncIOMotorClient
 from utils import get_response
 
 router = APIRouter()
@@ -14,12 +13,9 @@ router = APIRouter()
 error_logger = logging.getLogger("errorLogger")  # For error logs
 
 
-# Dependency injection for VehicleService with the repository and cache
-def get_vehicle_service():
-    _, db = get_db()
-    cache = get_cahce()
-    vehicle_repo = VehicleRepository(db)
-    return VehicleService(vehicle_repo, cache)
+# Dependency injection for VehicleService (built once in the app lifespan)
+def get_vehicle_service(request: Request) -> VehicleService:
+    return request.app.state.vehicle_service
 
 
 @router.post(
@@ -69,22 +65,62 @@ async def add_vehicle(
     # response_model=List[VehicleResponse],
     status_code=200,
     summary="Get all available vehicles",
-    description="Fetch a list of all vehicles that are currently available in the system.",
+    description="Fetch a page of the vehicles that are currently available in the system.",
     responses={
         200: {"description": "List of available vehicles"},
         404: {"description": "No available vehicles found"},
     },
 )
 async def get_available_vehicles(
+    from_datetime: Optional[datetime] = Query(None, alias="from"),
+    to_datetime: Optional[datetime] = Query(None, alias="to"),
+    daily_start: Optional[time] = None,
+    daily_end: Optional[time] = None,
+    match: Literal["all", "any"] = "all",
+    make: Optional[str] = None,
+    model: Optional[str] = None,
+    min_capacity: Optional[int] = Query(None, ge=1),
+    size: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     vehicle_service: VehicleService = Depends(get_vehicle_service),
 ):
     """
-    Retrieve a list of available vehicles.
+    Retrieve a page of available vehicles, in vehicle_id order.
 
-    - **returns**: A list of vehicles that are available.
+    - **from** / **to**: Optional window; only vehicles with no booking overlapping it are returned.
+    - **daily_start** / **daily_end**: Optional UTC times, e.g. '09:00' and '17:00'. With them,
+      **from** / **to** only pick the days, and vehicles must be free between those times on
+      every day (**match**='all') or on at least one day (**match**='any'). Times are rounded
+      outwards to 15-minute slots.
+    - **make** / **model** / **min_capacity**: Optional filters.
+    - **size** / **cursor**: Page size, and the 'next_cursor' of the previous page.
+    - **fields**: Optional comma-separated fields to return per vehicle, e.g. 'vehicle_id,capacity'.
+    - **returns**: A page of vehicles that are available.
+
+    Window filters read this worker's availability index, which can trail bookings made on
+    other workers by a moment; booking the vehicle re-checks the window in MongoDB.
     """
     try:
-        available_vehicles = await vehicle_service.get_available_vehicles()
+        if (from_datetime is None) != (to_datetime is None):
+            raise ValueError("Both 'from' and 'to' are required to filter by time window.")
+        if from_datetime and from_datetime >= to_datetime:
+            raise ValueError("'from' must be earlier than 'to'.")
+        if (daily_start is None) != (daily_end is None) or (daily_start and not from_datetime):
+            raise ValueError("'daily_start' and 'daily_end' go together, with 'from' and 'to'.")
+        available_vehicles, next_cursor = await vehicle_service.get_available_vehicles(
+            from_datetime,
+            to_datetime,
+            make=make,
+            model=model,
+            min_capacity=min_capacity,
+            size=size,
+            cursor=cursor,
+            fields=fields,
+            daily_start=daily_start,
+            daily_end=daily_end,
+            match=match,
+        )
         if not available_vehicles:
             return get_response(
                 status=404,
@@ -97,8 +133,12 @@ async def get_available_vehicles(
             status=200,
             error=False,
             message="List of available vehicles",
-            data=available_vehicles,
+            data={"size": size, "next_cursor": next_cursor, "vehicles": available_vehicles},
         )
+    except InvalidCursorError as e:
+        return get_response(status=400, error=True, code="INVALID_CURSOR", message=str(e))
+    except InvalidFieldsError as e:
+        return get_response(status=400, error=True, code="INVALID_FIELDS", message=str(e))
     except Exception as e:
         error_logger.error(f"Error fetching available vehicles: {e}")
         return get_response(
@@ -157,22 +197,38 @@ async def update_vehicle(
     # response_model=List[VehicleResponse],
     status_code=200,
     summary="Get all vehicles",
-    description="Fetch a list of all vehicles in the system.",
+    description="Fetch a page of the vehicles in the system.",
     responses={
         200: {"description": "List of all vehicles"},
         404: {"description": "No vehicles found"},
     },
 )
 async def get_all_vehicles(
+    make: Optional[str] = None,
+    model: Optional[str] = None,
+    min_capacity: Optional[int] = Query(None, ge=1),
+    size: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     vehicle_service: VehicleService = Depends(get_vehicle_service),
 ):
     """
-    Retrieve a list of all vehicles.
+    Retrieve a page of vehicles, in vehicle_id order.
 
-    - **returns**: A list of all vehicles in the system.
+    - **make** / **model** / **min_capacity**: Optional filters.
+    - **size** / **cursor**: Page size, and the 'next_cursor' of the previous page.
+    - **fields**: Optional comma-separated fields to return per vehicle, e.g. 'vehicle_id,capacity'.
+    - **returns**: A page of vehicles in the system.
     """
     try:
-        all_vehicles = await vehicle_service.get_all_vehicles()
+        all_vehicles, next_cursor = await vehicle_service.get_all_vehicles(
+            make=make,
+            model=model,
+            min_capacity=min_capacity,
+            size=size,
+            cursor=cursor,
+            fields=fields,
+        )
         if not all_vehicles:
             return get_response(
                 status=404,
@@ -185,8 +241,12 @@ async def get_all_vehicles(
             status=200,
             error=False,
             message="List of all vehicles",
-            data=all_vehicles,
+            data={"size": size, "next_cursor": next_cursor, "vehicles": all_vehicles},
         )
+    except InvalidCursorError as e:
+        return get_response(status=400, error=True, code="INVALID_CURSOR", message=str(e))
+    except InvalidFieldsError as e:
+        return get_response(status=400, error=True, code="INVALID_FIELDS", message=str(e))
     except Exception as e:
         error_logger.error(f"Error fetching all vehicles: {e}")
         return get_response(
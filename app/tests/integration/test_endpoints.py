@@ -7,7 +7,8 @@ import uuid  # To generate unique IDs for each test session
 
 @pytest.mark.asyncio
 async def test_vehicle_allocation_flow():
-    async with AsyncClient(app=app, base_url="http://testserver") as client:
+    # Run the lifespan so the shared MongoDB/Redis pools and services exist
+    async with app.router.lifespan_context(app), AsyncClient(app=app, base_url="http://testserver") as client:
         
         # Generate unique IDs for this session
         unique_employee_id = f"emp_{uuid.uuid4()}"
@@ -1,10 +1,17 @@
 import pytest
 from unittest.mock import AsyncMock, MagicMock
-from app.core.exceptions import DuplicateBookingError, VehicleUnavailableError
-from app.core.services import AllocationService
+from app.core.exceptions import (
+    DuplicateBookingError,
+    InvalidFieldsError,
+    VehicleUnavailableError,
+)
+from app.core.availability import AvailabilityIndex
+from app.core.fleet import FleetIndex
+from app.core.services import AllocationService, employee_booking_key
 from app.core.models import Allocation, Vehicle
 from motor.motor_asyncio import AsyncIOMotorClient  # Mock the MongoDB client
-from datetime import datetime
+from pymongo.errors import OperationFailure
+from datetime import datetime, timedelta, timezone
 
 
 @pytest.mark.asyncio
@@ -35,7 +42,11 @@ async def test_allocate_vehicle_success(mocker):
     mock_allocation_repo.get_allocation_by_employee_and_date.return_value = (
         None  # No existing booking
     )
-    mock_cache.get.return_value = None  # No cache for the employee or vehicle
+    mock_allocation_repo.find_overlapping_allocation.return_value = (
+        None  # No overlapping booking of the vehicle
+    )
+    mock_cache.get_many.return_value = [None, None]  # No cache for the employee or vehicle
+    mock_cache.get_generations.return_value = [1]
 
     # Create the service with the mock db_client
     service = AllocationService(
@@ -43,20 +54,30 @@ async def test_allocate_vehicle_success(mocker):
     )
 
     # Call the service method
+    tomorrow = datetime.now() + timedelta(days=1)
     allocation = await service.allocate_vehicle(
         employee_id="emp1",
         vehicle_id="v1",
-        from_datetime="2024-10-25T09:00:00",
-        to_datetime="2024-10-25T18:00:00",
+        from_datetime=tomorrow.isoformat(),
+        to_datetime=(tomorrow + timedelta(hours=9)).isoformat(),
         purpose="Business Trip",
     )
 
     # Use dot notation to access the fields of allocation
     assert allocation.employee_id == "emp1"
     assert allocation.vehicle_id == "v1"
-    assert mock_vehicle_repo.update_vehicle.called  # Ensure vehicle status was updated
+    assert mock_vehicle_repo.touch_vehicle.called  # Ensure the vehicle was locked for the booking
+    # booked_windows are only kept for CAS-mode claims
+    assert not mock_vehicle_repo.claim_window.called
+    assert not mock_vehicle_repo.update_vehicle.called  # Status is no longer flipped for all time
     assert mock_allocation_repo.save_allocation.called  # Ensure allocation was saved
-    assert mock_cache.set.called  # Ensure cache was updated
+    mock_cache.get_many.assert_called_once()  # One read for both pre-checks
+    assert not mock_cache.get.called
+    mock_cache.execute_batch.assert_called_once()  # One pipeline for every cache write
+    # The booked window is now visible to later availability checks
+    assert not service.availability.is_free(
+        "v1", tomorrow + timedelta(hours=1), tomorrow + timedelta(hours=2)
+    )
 
 
 @pytest.mark.asyncio
@@ -153,16 +174,19 @@ async def test_update_allocation_success(mocker):
     mock_db_client = AsyncMock(AsyncIOMotorClient)
     mock_db_client.start_session.return_value = mock_session
 
-    # Return a dictionary (not an Allocation object)
-    mock_allocation_repo.get_allocation_by_id.return_value = {
-        "allocation_id": "a1",
-        "employee_id": "emp1",
-        "vehicle_id": "v1",
-        "from_datetime": "2024-10-25T09:00:00",
-        "to_datetime": "2024-10-25T18:00:00",
-        "status": "pending",
-        "purpose": "Business Trip",
-    }
+    # A stored allocation, built without re-validation (its dates are in the past)
+    mock_allocation_repo.get_allocation.return_value = Allocation.model_construct(
+        allocation_id="a1",
+        employee_id="emp1",
+        vehicle_id="v1",
+        from_datetime="2024-10-25T09:00:00",
+        to_datetime="2024-10-25T18:00:00",
+        status="pending",
+        purpose="Business Trip",
+    )
+    mock_allocation_repo.find_overlapping_allocation.return_value = (
+        None  # The new window does not overlap another booking
+    )
 
     # Create the service
     service = AllocationService(
@@ -179,7 +203,7 @@ async def test_update_allocation_success(mocker):
     assert (
         mock_allocation_repo.update_allocation.called
     )  # Ensure the allocation was updated
-    assert mock_cache.delete.called  # Ensure cache was invalidated
+    mock_cache.execute_batch.assert_called_once()  # Ensure cache was invalidated
 
 
 @pytest.mark.asyncio
@@ -198,16 +222,16 @@ async def test_update_allocation_failure_after_approval(mocker):
     mock_db_client = AsyncMock(AsyncIOMotorClient)
     mock_db_client.start_session.return_value = mock_session
 
-    # Returning a dictionary instead of an Allocation object
-    mock_allocation_repo.get_allocation_by_id.return_value = {
-        "allocation_id": "a1",
-        "employee_id": "emp1",
-        "vehicle_id": "v1",
-        "from_datetime": "2024-10-25T09:00:00",
-        "to_datetime": "2024-10-25T18:00:00",
-        "status": "approved",
-        "purpose": "Business Trip",
-    }
+    # A stored allocation, built without re-validation (its dates are in the past)
+    mock_allocation_repo.get_allocation.return_value = Allocation.model_construct(
+        allocation_id="a1",
+        employee_id="emp1",
+        vehicle_id="v1",
+        from_datetime="2024-10-25T09:00:00",
+        to_datetime="2024-10-25T18:00:00",
+        status="approved",
+        purpose="Business Trip",
+    )
 
     # Create the service
     service = AllocationService(
@@ -224,3 +248,605 @@ async def test_update_allocation_failure_after_approval(mocker):
 
     # Ensure the allocation wasn't updated
     assert not mock_allocation_repo.update_allocation.called
+
+
+@pytest.mark.asyncio
+async def test_history_cache_key_follows_generation(mocker):
+    # Mock the repository, cache, and db_client using AsyncMock directly
+    mock_allocation_repo = AsyncMock()
+    mock_vehicle_repo = AsyncMock()
+    mock_cache = AsyncMock()
+    mock_db_client = AsyncMock(AsyncIOMotorClient)
+
+    mock_cache.get_generations.return_value = [7]
+    mock_cache.get.return_value = None  # Cache miss
+    mock_allocation_repo.get_allocations_by_filter.return_value = []
+    mock_allocation_repo.get_count.return_value = 0
+
+    service = AllocationService(
+        mock_allocation_repo, mock_vehicle_repo, mock_cache, mock_db_client
+    )
+
+    await service.get_filtered_allocations(employee_id="emp1")
+
+    # Only the employee's generation counter is consulted and embedded in the key
+    mock_cache.get_generations.assert_called_once_with(["history:gen:employee:emp1"])
+    cache_key = mock_cache.set.call_args[0][0]
+    assert cache_key.startswith("history:7:emp1:")
+
+
+@pytest.mark.asyncio
+async def test_history_fields_are_projected_and_keyed(mocker):
+    mock_allocation_repo = AsyncMock()
+    mock_vehicle_repo = AsyncMock()
+    mock_cache = AsyncMock()
+    mock_db_client = AsyncMock(AsyncIOMotorClient)
+
+    mock_cache.get_generations.return_value = [1]
+    mock_cache.get.return_value = None  # Cache miss
+    mock_allocation_repo.get_allocations_by_filter.return_value = [
+        {
+            "allocation_id": f"a{i}",
+            "vehicle_id": "v1",
+            "from_datetime": datetime(2030, 1, i + 1),
+            "to_datetime": datetime(2030, 1, i + 1, 8),
+        }
+        for i in range(3)
+    ]
+
+    service = AllocationService(
+        mock_allocation_repo, mock_vehicle_repo, mock_cache, mock_db_client
+    )
+
+    allocations, _, next_cursor = await service.get_filtered_allocations(
+        size=2, fields="to_datetime,vehicle_id,from_datetime"
+    )
+
+    # The cursor fields are fetched but only the selected ones are returned
+    projection = mock_allocation_repo.get_allocations_by_filter.call_args.kwargs["projection"]
+    assert projection == {
+        "_id": 0,
+        "allocation_id": 1,
+        "from_datetime": 1,
+        "to_datetime": 1,
+        "vehicle_id": 1,
+    }
+    assert [sorted(a) for a in allocations] == [["from_datetime", "to_datetime", "vehicle_id"]] * 2
+    assert next_cursor is not None
+    cache_key = mock_cache.set.call_args[0][0]
+    assert cache_key.endswith(":from_datetime,to_datetime,vehicle_id")
+
+    with pytest.raises(InvalidFieldsError):
+        await service.get_filtered_allocations(fields="vehicle_id,password")
+
+
+@pytest.mark.asyncio
+async def test_history_keyset_pagination(mocker):
+    # Mock the repository, cache, and db_client using AsyncMock directly
+    mock_allocation_repo = AsyncMock()
+    mock_vehicle_repo = AsyncMock()
+    mock_cache = AsyncMock()
+    mock_db_client = AsyncMock(AsyncIOMotorClient)
+
+    mock_cache.get_generations.return_value = [1]
+    mock_cache.get.return_value = None  # Cache miss
+    # One row more than the page size means another page follows
+    mock_allocation_repo.get_allocations_by_filter.return_value = [
+        {"allocation_id": f"a{i}", "from_datetime": datetime(2030, 1, i + 1)}
+        for i in range(3)
+    ]
+
+    service = AllocationService(
+        mock_allocation_repo, mock_vehicle_repo, mock_cache, mock_db_client
+    )
+
+    allocations, total_count, next_cursor = await service.get_filtered_allocations(
+        size=2, include_total=False
+    )
+
+    assert [a["allocation_id"] for a in allocations] == ["a0", "a1"]
+    assert total_count is None
+    assert not mock_allocation_repo.get_count.called
+
+    # The cursor resumes right after the last allocation of the page
+    await service.get_filtered_allocations(size=2, cursor=next_cursor)
+    kwargs = mock_allocation_repo.get_allocations_by_filter.call_args.kwargs
+    assert kwargs["after"] == (datetime(2030, 1, 2), "a1")
+    assert kwargs["skip"] == 0
+
+
+@pytest.mark.asyncio
+async def test_allocate_vehicles_bulk_reports_per_item(mocker):
+    # Mock the repository, cache, and db_client using AsyncMock directly
+    mock_allocation_repo = AsyncMock()
+    mock_vehicle_repo = AsyncMock()
+    mock_cache = AsyncMock()
+
+    # Create a mock session and mock the async context manager behavior
+    mock_session = MagicMock()
+    mock_session.__aenter__.return_value = mock_session
+    mock_session.__aexit__.return_value = None
+
+    # Mock the db_client and make start_session return an async context manager
+    mock_db_client = AsyncMock(AsyncIOMotorClient)
+    mock_db_client.start_session.return_value = mock_session
+
+    mock_vehicle_repo.get_vehicles_by_ids.return_value = [
+        {"vehicle_id": "v1", "status": "available"},
+        {"vehicle_id": "v2", "status": "in_maintenance"},
+    ]
+    mock_allocation_repo.find_conflicting_allocations.return_value = []
+
+    tomorrow = datetime.now() + timedelta(days=1)
+    allocations = [
+        Allocation(
+            employee_id=employee_id,
+            vehicle_id=vehicle_id,
+            from_datetime=tomorrow + timedelta(hours=offset),
+            to_datetime=tomorrow + timedelta(hours=offset + 4),
+        )
+        for employee_id, vehicle_id, offset in [
+            ("emp1", "v1", 0),
+            ("emp2", "v1", 2),  # Overlaps the first booking of v1
+            ("emp3", "v2", 0),  # Vehicle in maintenance
+            ("emp4", "v1", 4),  # Back-to-back with the first booking
+        ]
+    ]
+
+    service = AllocationService(
+        mock_allocation_repo, mock_vehicle_repo, mock_cache, mock_db_client
+    )
+
+    results = await service.allocate_vehicles_bulk(allocations)
+
+    assert [result["status"] for result in results] == [
+        "allocated",
+        "failed",
+        "failed",
+        "allocated",
+    ]
+    assert results[1]["code"] == "VEHICLE_UNAVAILABLE"
+    # One lookup per collection, one batched write and one cache invalidation
+    mock_vehicle_repo.get_vehicles_by_ids.assert_called_once()
+    mock_allocation_repo.find_conflicting_allocations.assert_called_once()
+    saved = mock_allocation_repo.save_allocations.call_args[0][0]
+    assert [allocation.employee_id for allocation in saved] == ["emp1", "emp4"]
+    mock_cache.execute_batch.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_allocate_vehicles_bulk_retries_a_transient_abort():
+    mock_allocation_repo = AsyncMock()
+    mock_vehicle_repo = AsyncMock()
+    mock_session = MagicMock()
+    mock_session.__aenter__.return_value = mock_session
+    mock_session.__aexit__.return_value = None
+    mock_db_client = AsyncMock(AsyncIOMotorClient)
+    mock_db_client.start_session.return_value = mock_session
+
+    mock_vehicle_repo.get_vehicles_by_ids.return_value = [{"vehicle_id": "v1", "status": "available"}]
+    mock_allocation_repo.find_conflicting_allocations.return_value = []
+    # The first transaction is aborted by a write conflict
+    mock_allocation_repo.save_allocations.side_effect = [
+        OperationFailure(
+            "WriteConflict", code=112, details={"errorLabels": ["TransientTransactionError"]}
+        ),
+        None,
+    ]
+
+    tomorrow = datetime.now() + timedelta(days=1)
+    allocations = [
+        Allocation(
+            employee_id=employee_id,
+            vehicle_id="v1",
+            from_datetime=tomorrow + timedelta(hours=offset),
+            to_datetime=tomorrow + timedelta(hours=offset + 2),
+        )
+        for employee_id, offset in [("emp1", 0), ("emp2", 1)]
+    ]
+    service = AllocationService(
+        mock_allocation_repo, mock_vehicle_repo, AsyncMock(), mock_db_client, retry_base_delay=0
+    )
+
+    results = await service.allocate_vehicles_bulk(allocations)
+
+    # The retry decides the batch afresh instead of keeping the aborted attempt's results
+    assert [result["status"] for result in results] == ["allocated", "failed"]
+    assert mock_allocation_repo.save_allocations.call_count == 2
+    saved = mock_allocation_repo.save_allocations.call_args[0][0]
+    assert [allocation.employee_id for allocation in saved] == ["emp1"]
+    assert service.allocation_stats["retries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_employee_booking_cache_follows_generation(mocker):
+    # Mock the repository, cache, and db_client using AsyncMock directly
+    mock_allocation_repo = AsyncMock()
+    mock_vehicle_repo = AsyncMock()
+    mock_cache = AsyncMock()
+    mock_db_client = AsyncMock(AsyncIOMotorClient)  # Mock db_client
+
+    mock_allocation_repo.get_allocation_by_employee_and_date.return_value = None
+    service = AllocationService(
+        mock_allocation_repo, mock_vehicle_repo, mock_cache, mock_db_client
+    )
+    key = employee_booking_key("emp1", "2030-01-02T09:00:00")
+    generation_key = "history:gen:employee:emp1"
+
+    # A negative entry written under the current generation is trusted
+    prefetched = {key: {"generation": 5, "booking": None}, generation_key: 5}
+    assert await service.check_employee_booking(
+        "emp1", "2030-01-02T09:00:00", prefetched=prefetched
+    ) is None
+    assert not mock_allocation_repo.get_allocation_by_employee_and_date.called
+
+    # A booking change since then bumped the generation: query and re-cache
+    prefetched = {key: {"generation": 5, "booking": None}, generation_key: 6}
+    assert await service.check_employee_booking(
+        "emp1", "2030-01-02T09:00:00", prefetched=prefetched
+    ) is None
+    mock_allocation_repo.get_allocation_by_employee_and_date.assert_called_once()
+    mock_cache.set.assert_called_once_with(
+        key, {"generation": 6, "booking": None}, expiration=60
+    )
+
+    # Without a prefetch the generation is read through get_generations, which
+    # seeds a missing counter: an entry cached under no generation is never trusted
+    mock_cache.get.return_value = {"generation": None, "booking": None}
+    mock_cache.get_generations.return_value = [1760000000000]
+    assert await service.check_employee_booking("emp1", "2030-01-02T09:00:00") is None
+    mock_cache.get_generations.assert_awaited_once_with([generation_key])
+    assert mock_allocation_repo.get_allocation_by_employee_and_date.call_count == 2
+
+
+def test_employee_booking_key_is_shared_across_date_forms():
+    at = datetime(2030, 1, 2, 9, tzinfo=timezone.utc)
+    keys = {
+        employee_booking_key("emp1", value)
+        for value in (at, "2030-01-02T09:00:00Z", "2030-01-02T10:00:00+01:00", at.replace(tzinfo=None))
+    }
+
+    assert keys == {"employee:emp1:booking:2030-01-02T09:00:00+00:00"}
+
+
+@pytest.mark.asyncio
+async def test_history_serves_stale_page_while_another_worker_rebuilds(mocker):
+    # Mock the repository, cache, and db_client using AsyncMock directly
+    mock_allocation_repo = AsyncMock()
+    mock_vehicle_repo = AsyncMock()
+    mock_cache = AsyncMock()
+    mock_db_client = AsyncMock(AsyncIOMotorClient)  # Mock db_client
+
+    stale_page = ([{"allocation_id": "a0"}], 1, None)
+    mock_cache.get_generations.return_value = [1]
+    # Due for an early refresh...
+    mock_cache.get.return_value = {"result": stale_page, "delta": 0.1, "expires_at": 0}
+    # ...but another worker holds the rebuild lease
+    mock_cache.acquire_lock.return_value = False
+
+    service = AllocationService(
+        mock_allocation_repo, mock_vehicle_repo, mock_cache, mock_db_client
+    )
+    result = await service.get_filtered_allocations(employee_id="emp1")
+
+    assert result == stale_page
+    assert not mock_allocation_repo.get_allocations_by_filter.called
+    assert not mock_cache.release_lock.called
+    assert service.history_stats["stale_served"] == 1
+
+
+@pytest.mark.asyncio
+async def test_allocate_vehicle_writes_booked_event_to_outbox():
+    mock_allocation_repo = AsyncMock()
+    mock_vehicle_repo = AsyncMock()
+    mock_cache = AsyncMock()
+    mock_outbox_repo = AsyncMock()
+
+    mock_session = MagicMock()
+    mock_session.__aenter__.return_value = mock_session
+    mock_session.__aexit__.return_value = None
+    mock_db_client = AsyncMock(AsyncIOMotorClient)
+    mock_db_client.start_session.return_value = mock_session
+
+    mock_vehicle_repo.get_vehicle_by_id.return_value = Vehicle(
+        vehicle_id="v1",
+        status="available",
+        fuel_efficiency=15.5,
+        make="Toyota",
+        model="Corolla",
+        capacity=4,
+    )
+    mock_allocation_repo.get_allocation_by_employee_and_date.return_value = None
+    mock_allocation_repo.find_overlapping_allocation.return_value = None
+    mock_cache.get_many.return_value = [None, None]
+    mock_cache.get_generations.return_value = [1]
+
+    service = AllocationService(
+        mock_allocation_repo,
+        mock_vehicle_repo,
+        mock_cache,
+        mock_db_client,
+        outbox_repo=mock_outbox_repo,
+    )
+    tomorrow = datetime.now() + timedelta(days=1)
+    allocation = await service.allocate_vehicle(
+        employee_id="emp1",
+        vehicle_id="v1",
+        from_datetime=tomorrow.isoformat(),
+        to_datetime=(tomorrow + timedelta(hours=9)).isoformat(),
+        purpose="Business Trip",
+    )
+
+    # Written in the booking transaction, not published on the request path
+    entries = mock_outbox_repo.add.call_args.args[0]
+    assert mock_outbox_repo.add.call_args.kwargs["session"] is mock_session
+    assert [entry["subject"] for entry in entries] == ["VehicleBookedEvent"]
+    assert allocation.allocation_id in entries[0]["body"]
+
+
+@pytest.mark.asyncio
+async def test_allocate_vehicle_without_outbox_queues_booked_event():
+    mock_allocation_repo = AsyncMock()
+    mock_vehicle_repo = AsyncMock()
+    mock_cache = AsyncMock()
+    mock_event_publisher = AsyncMock()
+
+    mock_session = MagicMock()
+    mock_session.__aenter__.return_value = mock_session
+    mock_session.__aexit__.return_value = None
+    mock_db_client = AsyncMock(AsyncIOMotorClient)
+    mock_db_client.start_session.return_value = mock_session
+
+    mock_vehicle_repo.get_vehicle_by_id.return_value = Vehicle(
+        vehicle_id="v1",
+        status="available",
+        fuel_efficiency=15.5,
+        make="Toyota",
+        model="Corolla",
+        capacity=4,
+    )
+    mock_allocation_repo.get_allocation_by_employee_and_date.return_value = None
+    mock_allocation_repo.find_overlapping_allocation.return_value = None
+    mock_cache.get_many.return_value = [None, None]
+    mock_cache.get_generations.return_value = [1]
+
+    service = AllocationService(
+        mock_allocation_repo,
+        mock_vehicle_repo,
+        mock_cache,
+        mock_db_client,
+        event_publisher=mock_event_publisher,
+    )
+    tomorrow = datetime.now() + timedelta(days=1)
+    allocation = await service.allocate_vehicle(
+        employee_id="emp1",
+        vehicle_id="v1",
+        from_datetime=tomorrow.isoformat(),
+        to_datetime=(tomorrow + timedelta(hours=9)).isoformat(),
+        purpose="Business Trip",
+    )
+
+    # Queued once the booking has committed
+    event = mock_event_publisher.publish.call_args.args[0]
+    assert (event.allocation_id, event.vehicle_id) == (allocation.allocation_id, "v1")
+
+
+def cas_service(mock_allocation_repo, mock_vehicle_repo, mock_cache):
+    mock_allocation_repo.get_allocation_by_employee_and_date.return_value = None
+    mock_cache.get_many.return_value = [None, None]
+    mock_cache.get_generations.return_value = [1]
+    mock_vehicle_repo.get_vehicle_by_id.return_value = Vehicle(
+        vehicle_id="v1",
+        status="available",
+        fuel_efficiency=15.5,
+        make="Toyota",
+        model="Corolla",
+        capacity=4,
+    )
+    return AllocationService(
+        mock_allocation_repo,
+        mock_vehicle_repo,
+        mock_cache,
+        AsyncMock(AsyncIOMotorClient),
+        allocation_mode="cas",
+    )
+
+
+@pytest.mark.asyncio
+async def test_cas_allocation_claims_the_vehicle_without_a_transaction():
+    mock_allocation_repo = AsyncMock()
+    mock_vehicle_repo = AsyncMock()
+    mock_vehicle_repo.claim_window.return_value = {"vehicle_id": "v1", "version": 2}
+    service = cas_service(mock_allocation_repo, mock_vehicle_repo, AsyncMock())
+
+    tomorrow = datetime.now() + timedelta(days=1)
+    allocation = await service.allocate_vehicle(
+        employee_id="emp1",
+        vehicle_id="v1",
+        from_datetime=tomorrow.isoformat(),
+        to_datetime=(tomorrow + timedelta(hours=9)).isoformat(),
+        purpose="Business Trip",
+    )
+
+    assert not service.db_client.start_session.called
+    vehicle_id, window = mock_vehicle_repo.claim_window.call_args.args
+    assert vehicle_id == "v1" and window["allocation_id"] == allocation.allocation_id
+    mock_allocation_repo.save_allocation.assert_awaited_once()
+    assert mock_allocation_repo.save_allocation.call_args.kwargs == {}
+    assert service.allocation_stats["attempts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cas_allocation_refused_claim_is_a_conflict():
+    mock_allocation_repo = AsyncMock()
+    mock_vehicle_repo = AsyncMock()
+    mock_vehicle_repo.claim_window.return_value = None  # Another booking holds the window
+    service = cas_service(mock_allocation_repo, mock_vehicle_repo, AsyncMock())
+
+    tomorrow = datetime.now() + timedelta(days=1)
+    with pytest.raises(VehicleUnavailableError):
+        await service.allocate_vehicle(
+            employee_id="emp1",
+            vehicle_id="v1",
+            from_datetime=tomorrow.isoformat(),
+            to_datetime=(tomorrow + timedelta(hours=9)).isoformat(),
+            purpose="Business Trip",
+        )
+
+    assert not mock_allocation_repo.save_allocation.called
+    assert service.allocation_stats["conflicts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cas_allocation_releases_the_claim_when_the_insert_fails():
+    mock_allocation_repo = AsyncMock()
+    mock_vehicle_repo = AsyncMock()
+    mock_vehicle_repo.claim_window.return_value = {"vehicle_id": "v1", "version": 2}
+    mock_allocation_repo.save_allocation.side_effect = RuntimeError("insert failed")
+    service = cas_service(mock_allocation_repo, mock_vehicle_repo, AsyncMock())
+
+    tomorrow = datetime.now() + timedelta(days=1)
+    with pytest.raises(RuntimeError):
+        await service.allocate_vehicle(
+            employee_id="emp1",
+            vehicle_id="v1",
+            from_datetime=tomorrow.isoformat(),
+            to_datetime=(tomorrow + timedelta(hours=9)).isoformat(),
+            purpose="Business Trip",
+        )
+
+    window = mock_vehicle_repo.claim_window.call_args.args[1]
+    mock_vehicle_repo.release_window.assert_awaited_once_with("v1", window["allocation_id"])
+    assert not mock_allocation_repo.delete_allocation.called
+    assert service.allocation_stats["compensations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cas_updates_and_bulk_bookings_respect_claims_in_flight():
+    mock_allocation_repo = AsyncMock()
+    mock_vehicle_repo = AsyncMock()
+    service = cas_service(mock_allocation_repo, mock_vehicle_repo, AsyncMock())
+    mock_session = MagicMock()
+    mock_session.__aenter__.return_value = mock_session
+    mock_session.__aexit__.return_value = None
+    service.db_client.start_session.return_value = mock_session
+    # Another worker claimed the window but has not inserted its allocation yet:
+    # only booked_windows knows, the allocations collection has no conflict
+    mock_vehicle_repo.claim_window.return_value = None
+    mock_allocation_repo.find_overlapping_allocation.return_value = None
+    mock_allocation_repo.find_conflicting_allocations.return_value = []
+    mock_vehicle_repo.get_vehicles_by_ids.return_value = [{"vehicle_id": "v1", "status": "available"}]
+    mock_allocation_repo.get_allocation.return_value = Allocation.model_construct(
+        allocation_id="a1",
+        employee_id="emp1",
+        vehicle_id="v2",
+        from_datetime="2030-01-02T09:00:00+00:00",
+        to_datetime="2030-01-02T12:00:00+00:00",
+        status="pending",
+    )
+
+    with pytest.raises(VehicleUnavailableError):
+        await service.update_allocation("a1", vehicle_id="v1")
+    vehicle_id, window = mock_vehicle_repo.claim_window.call_args.args
+    assert (vehicle_id, window["allocation_id"]) == ("v1", "a1")
+    assert mock_vehicle_repo.claim_window.call_args.kwargs == {"session": mock_session}
+    assert not mock_allocation_repo.update_allocation.called
+
+    tomorrow = datetime.now(timezone.utc) + timedelta(days=1)
+    allocation = Allocation(
+        employee_id="emp2", vehicle_id="v1", from_datetime=tomorrow, to_datetime=tomorrow + timedelta(hours=2)
+    )
+    results = await service.allocate_vehicles_bulk([allocation])
+
+    assert results[0]["code"] == "VEHICLE_UNAVAILABLE"
+    assert mock_vehicle_repo.claim_window.call_args.args[1]["allocation_id"] == allocation.allocation_id
+    assert not mock_allocation_repo.save_allocations.called
+    assert service.allocation_stats["conflicts"] == 2
+
+
+@pytest.mark.asyncio
+async def test_auto_allocation_books_the_next_candidate_when_one_is_taken():
+    mock_allocation_repo = AsyncMock()
+    mock_vehicle_repo = AsyncMock()
+    # v2 looks free but a concurrent booking wins its claim first
+    mock_vehicle_repo.claim_window.side_effect = [None, {"vehicle_id": "v3", "version": 2}]
+    service = cas_service(mock_allocation_repo, mock_vehicle_repo, AsyncMock())
+    for vehicle_id, capacity in (("v1", 4), ("v2", 5), ("v3", 7), ("small", 2)):
+        service.fleet.add(
+            Vehicle(
+                vehicle_id=vehicle_id,
+                fuel_efficiency=15.5,
+                make="Toyota",
+                model="Corolla",
+                capacity=capacity,
+            )
+        )
+    tomorrow = datetime.now(timezone.utc) + timedelta(days=1)
+    window = (tomorrow, tomorrow + timedelta(hours=9))
+    service.availability.add("other", "v1", *window)  # Skipped without a claim
+
+    allocation = await service.auto_allocate("emp1", *window, passengers=3, purpose="Trip")
+
+    assert allocation.vehicle_id == "v3"
+    claimed = [call.args[0] for call in mock_vehicle_repo.claim_window.call_args_list]
+    assert claimed == ["v2", "v3"]
+    assert service.allocation_stats["conflicts"] == 1
+    assert service.availability.conflicts("v3", *window) == [allocation.allocation_id]
+
+
+@pytest.mark.asyncio
+async def test_auto_allocation_without_a_fitting_vehicle_is_unavailable():
+    mock_allocation_repo = AsyncMock()
+    mock_vehicle_repo = AsyncMock()
+    service = cas_service(mock_allocation_repo, mock_vehicle_repo, AsyncMock())
+    service.fleet.add(
+        Vehicle(vehicle_id="v1", fuel_efficiency=15.5, make="Toyota", model="Corolla", capacity=4)
+    )
+    tomorrow = datetime.now(timezone.utc) + timedelta(days=1)
+
+    mock_vehicle_repo.find_vehicles.return_value = []  # MongoDB agrees
+
+    with pytest.raises(VehicleUnavailableError):
+        await service.auto_allocate("emp1", tomorrow, tomorrow + timedelta(hours=1), passengers=6)
+
+    assert not mock_vehicle_repo.claim_window.called
+    assert not mock_allocation_repo.save_allocation.called
+    assert service.allocation_stats["auto_fallbacks"] == 1
+
+
+@pytest.mark.asyncio
+async def test_auto_allocation_falls_back_to_mongodb_when_the_index_lags():
+    mock_allocation_repo = AsyncMock()
+    mock_vehicle_repo = AsyncMock()
+    mock_vehicle_repo.claim_window.return_value = {"vehicle_id": "v9", "version": 1}
+    service = cas_service(mock_allocation_repo, mock_vehicle_repo, AsyncMock())
+    tomorrow = datetime.now(timezone.utc) + timedelta(days=1)
+    window = (tomorrow, tomorrow + timedelta(hours=2))
+    # Added on another worker: this worker's fleet index has never seen them
+    mock_vehicle_repo.find_vehicles.return_value = [
+        {"vehicle_id": vehicle_id, "status": "available", "make": "Toyota", "model": "Corolla",
+         "capacity": capacity, "fuel_efficiency": 15.5}
+        for vehicle_id, capacity in (("v8", 4), ("v9", 5))
+    ]
+    mock_allocation_repo.find_conflicting_allocations.return_value = [
+        {"vehicle_id": "v8", "from_datetime": window[0], "to_datetime": window[1]},
+        # Ends as the window starts: v9 is still free
+        {"vehicle_id": "v9", "from_datetime": window[0] - timedelta(hours=1), "to_datetime": window[0]},
+    ]
+
+    allocation = await service.auto_allocate("emp1", *window, passengers=3)
+
+    assert allocation.vehicle_id == "v9"
+    query = mock_vehicle_repo.find_vehicles.call_args.args[0]
+    assert query == {"status": "available", "capacity": {"$gte": 3}}
+    assert service.allocation_stats["auto_fallbacks"] == 1
+
+
+def test_services_share_empty_indexes():
+    # An empty index is falsy (it has a length); it must still be shared, not replaced
+    availability, fleet = AvailabilityIndex(), FleetIndex()
+    service = AllocationService(
+        AsyncMock(), AsyncMock(), AsyncMock(), AsyncMock(), availability, fleet=fleet
+    )
+
+    assert service.availability is availability and service.fleet is fleet
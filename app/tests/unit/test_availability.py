@@ -0,0 +1,111 @@
+import pytest
+from datetime import date, datetime, time, timedelta, timezone
+from app.core.availability import (
+    AvailabilityIndex,
+    daily_window_mask,
+    day_slot_mask,
+    window_days,
+)
+
+
+start = datetime(2030, 1, 1, 9, tzinfo=timezone.utc)
+
+
+def hours(n):
+    return start + timedelta(hours=n)
+
+
+def test_vehicle_is_free_around_existing_booking():
+    index = AvailabilityIndex()
+    index.add("a1", "v1", hours(0), hours(8))
+
+    assert not index.is_free("v1", hours(1), hours(2))
+    assert not index.is_free("v1", hours(-1), hours(1))
+    # Windows are half-open, so back-to-back bookings don't conflict
+    assert index.is_free("v1", hours(8), hours(10))
+    assert index.is_free("v1", hours(-2), hours(0))
+    # A booking for tomorrow doesn't block next week
+    assert index.is_free("v1", hours(24 * 7), hours(24 * 7 + 8))
+    assert index.is_free("v2", hours(1), hours(2))
+
+
+def test_long_overlapping_booking_is_found_behind_short_ones():
+    index = AvailabilityIndex()
+    index.add("long", "v1", hours(0), hours(100))
+    for i in range(10):
+        index.add(f"short{i}", "v1", hours(10 * i + 1), hours(10 * i + 2))
+
+    assert index.conflicts("v1", hours(95), hours(96)) == ["long"]
+    assert index.is_free("v1", hours(95), hours(96), exclude_allocation_id="long")
+
+
+def test_moving_and_removing_bookings():
+    index = AvailabilityIndex()
+    index.add("a1", "v1", hours(0), hours(8))
+
+    # Re-adding moves the booking to the new vehicle/window
+    index.add("a1", "v2", hours(24), hours(32))
+    assert index.is_free("v1", hours(1), hours(2))
+    assert not index.is_free("v2", hours(25), hours(26))
+
+    assert index.remove("a1")
+    assert not index.remove("a1")
+    assert index.is_free("v2", hours(25), hours(26))
+
+
+def test_free_vehicles_accepts_naive_and_string_datetimes():
+    index = AvailabilityIndex()
+    index.add("a1", "v1", "2030-01-01T09:00:00Z", "2030-01-01T17:00:00Z")
+
+    free = index.free_vehicles(["v1", "v2"], datetime(2030, 1, 1, 12), datetime(2030, 1, 1, 13))
+    assert free == ["v2"]
+
+
+def test_slot_masks_round_outwards_to_15_minutes():
+    day = date(2030, 1, 1)
+
+    # 09:10-09:20 touches the 09:00 and 09:15 slots (36 and 37)
+    start = hours(0) + timedelta(minutes=10)
+    assert day_slot_mask(day, start, start + timedelta(minutes=10)) == 0b11 << 36
+    # Only the part of a booking on that day counts
+    assert day_slot_mask(day, hours(14), hours(20)) == 0b1111 << 92
+    assert day_slot_mask(date(2030, 1, 2), hours(14), hours(20)) == (1 << 20) - 1
+    assert daily_window_mask(time(9), time(17)) == ((1 << 32) - 1) << 36
+    with pytest.raises(ValueError):
+        daily_window_mask(time(17), time(9))
+    # A window ending at midnight does not reach into the next day
+    assert window_days(hours(-9), hours(24 * 2 - 9)) == [date(2030, 1, 1), date(2030, 1, 2)]
+
+
+def test_slots_follow_moved_bookings_without_clearing_shared_ones():
+    index = AvailabilityIndex()
+    day = date(2030, 1, 1)
+    index.add("a1", "v1", hours(0) + timedelta(minutes=5), hours(0) + timedelta(minutes=10))
+    index.add("a2", "v1", hours(0) + timedelta(minutes=10), hours(1))
+
+    assert index.slots("v1", day) == 0b1111 << 36
+    # a1 leaves; the 09:00 slot is still a2's
+    index.add("a1", "v2", hours(24), hours(25))
+    assert index.slots("v1", day) == 0b1111 << 36
+    index.remove("a2")
+    assert index.slots("v1", day) == 0
+    assert index.slots("v2", date(2030, 1, 2)) == 0b1111 << 36
+
+
+def test_free_vehicles_daily_matches_all_or_any_day():
+    index = AvailabilityIndex()
+    days = [date(2030, 1, 1) + timedelta(days=n) for n in range(5)]
+    index.add("busy", "v1", hours(1), hours(2))  # 10:00-11:00 on the first day
+    for n, day in enumerate(days):
+        index.add(f"daily{n}", "v2", hours(24 * n + 3), hours(24 * n + 4))  # 12:00-13:00 daily
+    index.add("evening", "v3", hours(10), hours(11))  # 19:00-20:00, outside the window
+
+    all_days = index.free_vehicles_daily(["v1", "v2", "v3", "v4"], days, time(9), time(17))
+    any_day = index.free_vehicles_daily(["v1", "v2", "v3", "v4"], days, time(9), time(17), "any")
+
+    assert all_days == ["v3", "v4"]
+    assert any_day == ["v1", "v3", "v4"]
+    # v1 is free every day but the first
+    assert index.free_vehicles_daily(["v1"], days[1:], time(9), time(17)) == ["v1"]
+    with pytest.raises(ValueError):
+        index.free_vehicles_daily(["v1"], days, time(9), time(17), "most")
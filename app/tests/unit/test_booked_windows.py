@@ -0,0 +1,47 @@
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock
+from app.infrastructure.booked_windows import BookedWindowSweeper
+
+NOW = datetime(2030, 1, 1, 12, tzinfo=timezone.utc)
+
+
+@pytest.mark.asyncio
+async def test_sweep_prunes_ended_windows():
+    vehicle_repo = AsyncMock()
+    vehicle_repo.prune_windows.return_value = 3
+    sweeper = BookedWindowSweeper(vehicle_repo)
+
+    await sweeper.sweep(NOW)
+    await sweeper.sweep(NOW)
+
+    vehicle_repo.prune_windows.assert_awaited_with(NOW)
+    assert sweeper.stats() == {"sweeps": 2, "pruned": 6, "orphans_released": 0}
+
+
+@pytest.mark.asyncio
+async def test_orphaned_claims_are_released_on_the_second_sweep():
+    claims = [("v1", "booked"), ("v1", "in-flight"), ("v2", "orphan")]
+    inserted = {"booked"}
+
+    async def iter_booked_windows(since):
+        for claim in claims:
+            yield claim
+
+    async def active_allocation_ids(allocation_ids):
+        return inserted & set(allocation_ids)
+
+    vehicle_repo = AsyncMock()
+    vehicle_repo.prune_windows.return_value = 0
+    vehicle_repo.iter_booked_windows = iter_booked_windows
+    allocation_repo = AsyncMock()
+    allocation_repo.active_allocation_ids.side_effect = active_allocation_ids
+    sweeper = BookedWindowSweeper(vehicle_repo, allocation_repo, batch_size=2)
+
+    await sweeper.sweep(NOW)
+    assert not vehicle_repo.release_window.called  # Could still be a booking in flight
+
+    inserted.add("in-flight")
+    await sweeper.sweep(NOW)
+    vehicle_repo.release_window.assert_awaited_once_with("v2", "orphan")
+    assert sweeper.stats()["orphans_released"] == 1
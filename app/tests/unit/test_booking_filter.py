@@ -0,0 +1,146 @@
+import pytest
+from datetime import date
+from unittest.mock import AsyncMock
+from redis.exceptions import RedisError
+from app.infrastructure.booking_filter import (
+    EmployeeBookingFilter,
+    bloom_offsets,
+    bloom_parameters,
+    booking_days,
+)
+from app.infrastructure.cache_batch import CacheBatch
+
+
+class BitmapCache:
+    """Just enough of RedisCache for the filter: bitmaps behind get_bits/execute_batch."""
+
+    def __init__(self):
+        self.bitmaps = {}
+        self.fail_writes = False
+
+    async def get_bits(self, bits):
+        return [int(offset in self.bitmaps.get(key, set())) for key, offset in bits]
+
+    async def execute_batch(self, operations):
+        if self.fail_writes:
+            raise RedisError("connection lost")
+        for name, (key,), offsets, _ in operations:
+            assert name == "setbits"
+            self.bitmaps.setdefault(key, set()).update(offsets)
+
+    async def acquire_lock(self, lock_key, timeout=10, token="locked"):
+        return True
+
+    async def release_lock(self, lock_key, token=None):
+        pass
+
+    async def delete(self, key):
+        self.bitmaps.pop(key, None)
+
+
+def test_bloom_parameters_and_offsets():
+    bits, hashes = bloom_parameters(10000, 0.01)
+    assert 95000 < bits < 96000 and hashes == 7
+    offsets = bloom_offsets("emp1", bits, hashes)
+    assert offsets == bloom_offsets("emp1", bits, hashes)
+    assert len(offsets) == hashes and all(0 <= offset < bits for offset in offsets)
+
+
+def test_booking_days_spans_every_utc_day():
+    assert booking_days("2030-01-01T22:00:00", "2030-01-03T01:00:00") == [
+        date(2030, 1, 1),
+        date(2030, 1, 2),
+        date(2030, 1, 3),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_filter_answers_only_once_warmed():
+    cache = BitmapCache()
+    booking_filter = EmployeeBookingFilter(cache, capacity=100)
+    assert await booking_filter.might_have_booking("emp1", "2030-01-02T09:00:00") is None
+
+    allocation_repo = AsyncMock()
+
+    async def bookings(since):
+        yield {
+            "employee_id": "emp1",
+            "from_datetime": "2030-01-01T09:00:00",
+            "to_datetime": "2030-01-02T18:00:00",
+        }
+
+    allocation_repo.iter_employee_bookings = bookings
+    await booking_filter.warm(allocation_repo)
+
+    assert await booking_filter.might_have_booking("emp1", "2030-01-02T09:00:00") is True
+    assert await booking_filter.might_have_booking("emp2", "2030-01-02T09:00:00") is False
+    assert await booking_filter.might_have_booking("emp1", "2030-01-03T09:00:00") is False
+
+    # Bookings added later are visible straight away
+    async with CacheBatch(cache) as batch:
+        booking_filter.add(batch, "emp2", "2030-01-02T10:00:00", "2030-01-02T11:00:00")
+    assert await booking_filter.might_have_booking("emp2", "2030-01-02T09:00:00") is True
+
+    booking_filter.record_false_positive()
+    stats = booking_filter.stats()
+    assert (stats["checks"], stats["unanswered"], stats["negatives"]) == (5, 1, 2)
+    assert stats["false_positive_rate"] == pytest.approx(1 / 3)
+
+
+@pytest.mark.asyncio
+async def test_filter_rewarms_once_the_ready_flag_expires():
+    cache = BitmapCache()
+    allocation_repo = AsyncMock()
+
+    async def bookings(since):
+        yield {
+            "employee_id": "emp1",
+            "from_datetime": "2030-01-02T09:00:00",
+            "to_datetime": "2030-01-02T18:00:00",
+        }
+
+    allocation_repo.iter_employee_bookings = bookings
+    booking_filter = EmployeeBookingFilter(cache, capacity=100, allocation_repo=allocation_repo)
+    await booking_filter.warm(allocation_repo)
+    assert await booking_filter.might_have_booking("emp1", "2030-01-02T09:00:00") is True
+
+    # Redis drops the flag (expired) and a day bitmap with it (evicted)
+    cache.bitmaps.clear()
+    assert await booking_filter.might_have_booking("emp1", "2030-01-02T09:00:00") is None
+    await booking_filter._warming
+
+    assert await booking_filter.might_have_booking("emp1", "2030-01-02T09:00:00") is True
+    assert booking_filter.stats()["rewarms"] == 1
+
+
+@pytest.mark.asyncio
+async def test_filter_goes_offline_when_new_bits_are_lost():
+    cache = BitmapCache()
+    allocation_repo = AsyncMock()
+    stored = []
+
+    async def bookings(since):
+        for booking in stored:
+            yield booking
+
+    allocation_repo.iter_employee_bookings = bookings
+    booking_filter = EmployeeBookingFilter(cache, capacity=100, allocation_repo=allocation_repo)
+    await booking_filter.warm(allocation_repo)
+    assert await booking_filter.might_have_booking("emp1", "2030-01-02T09:00:00") is False
+
+    # emp1's booking commits, but Redis drops the write carrying its bits
+    stored.append(
+        {"employee_id": "emp1", "from_datetime": "2030-01-02T09:00:00", "to_datetime": "2030-01-02T18:00:00"}
+    )
+    cache.fail_writes = True
+    batch = CacheBatch(cache)
+    booking_filter.add(batch, "emp1", "2030-01-02T09:00:00", "2030-01-02T18:00:00")
+    await booking_filter.flush(batch)
+
+    assert booking_filter.ready_key not in cache.bitmaps  # Other workers stop trusting it too
+    assert await booking_filter.might_have_booking("emp1", "2030-01-02T09:00:00") is None
+    cache.fail_writes = False
+    await booking_filter._warming
+
+    assert await booking_filter.might_have_booking("emp1", "2030-01-02T09:00:00") is True
+    assert (booking_filter.stats()["lost_writes"], booking_filter.stats()["rewarms"]) == (1, 1)
@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+from app.infrastructure.change_stream import plan_invalidation
+
+FROM = datetime(2030, 1, 1, 9, tzinfo=timezone.utc)
+TO = datetime(2030, 1, 1, 18, tzinfo=timezone.utc)
+
+
+def allocation_change(operation, vehicle_id="v2", status="pending"):
+    return {
+        "operationType": operation,
+        "ns": {"db": "vehicle_allocation_db", "coll": "allocations"},
+        "fullDocument": {
+            "allocation_id": "a1",
+            "employee_id": "emp1",
+            "vehicle_id": vehicle_id,
+            "from_datetime": FROM,
+            "to_datetime": TO,
+            "status": status,
+        },
+    }
+
+
+def test_allocation_move_bumps_both_vehicles():
+    plan = plan_invalidation([allocation_change("update")], {"a1": "v1"}.get)
+
+    assert plan.bump == {
+        "history:gen",
+        "history:gen:employee:emp1",
+        "history:gen:vehicle:v1",
+        "history:gen:vehicle:v2",
+    }
+    assert plan.delete == set() and plan.patterns == set()
+    assert plan.bookings == [("emp1", FROM, TO)]
+
+
+def test_vehicle_change_deletes_its_status():
+    change = {
+        "operationType": "replace",
+        "ns": {"db": "vehicle_allocation_db", "coll": "vehicles"},
+        "fullDocument": {"vehicle_id": "v1", "status": "in_maintenance"},
+    }
+    plan = plan_invalidation([change], lambda allocation_id: None)
+
+    assert plan.delete == {"vehicle:v1:status"}
+    assert plan.bump == set()
+
+
+def test_deletes_without_pre_images_fall_back_to_patterns():
+    deleted = {
+        "operationType": "delete",
+        "ns": {"db": "vehicle_allocation_db", "coll": "allocations"},
+        "documentKey": {"_id": "65f0"},
+    }
+    looked_up_too_late = dict(allocation_change("update"), fullDocument=None)
+    plan = plan_invalidation([looked_up_too_late, deleted], lambda allocation_id: None)
+
+    assert plan.patterns == {"history:gen*"}
+    assert plan.reload_availability
+    assert plan.bump == set()
@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from app.core.coalescing import SingleFlight, should_refresh_early
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_one_execution():
+    flights = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*(flights.do("page", load) for _ in range(5)))
+
+    assert results == [1] * 5
+    assert calls == 1 and flights.coalesced == 4
+    assert len(flights) == 0
+    assert await flights.do("page", load) == 2  # Finished flights are not reused
+
+
+@pytest.mark.asyncio
+async def test_single_flight_propagates_errors_to_waiters():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("mongo down")
+
+    results = await asyncio.gather(
+        flights.do("page", fail), flights.do("page", fail), return_exceptions=True
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_waiters_outlive_a_cancelled_leader():
+    flights = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    leader = asyncio.create_task(flights.do("page", load))
+    await asyncio.sleep(0)
+    waiters = [asyncio.create_task(flights.do("page", load)) for _ in range(3)]
+    await asyncio.sleep(0)
+    leader.cancel()  # Its client went away
+
+    assert await asyncio.gather(*waiters) == [2] * 3  # One new execution, shared
+    assert leader.cancelled()
+    assert calls == 2 and flights.coalesced == 2
+    assert len(flights) == 0
+
+
+def test_should_refresh_early(mocker):
+    random = mocker.patch("app.core.coalescing.random.random")
+    random.return_value = 0.0  # -log(1.0) == 0: never early
+    assert not should_refresh_early(delta=0.5, expires_at=100.0, now=99.9)
+    assert should_refresh_early(delta=0.5, expires_at=100.0, now=100.0)
+
+    random.return_value = 0.9  # -log(0.1) ~= 2.3 deltas ahead of expiry
+    assert should_refresh_early(delta=0.5, expires_at=100.0, now=99.0)
+    assert not should_refresh_early(delta=0.5, expires_at=100.0, now=98.0)
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import pytest
+from app.events.consumer import EventConsumer, parse_message
+from app.events.queues import InMemoryQueue
+
+
+def sns_body(payload, subject="VehicleBookedEvent"):
+    return json.dumps({"Type": "Notification", "Subject": subject, "Message": json.dumps(payload)})
+
+
+async def wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.005)
+
+
+def test_parse_message_unwraps_sns_envelope():
+    assert parse_message(sns_body({"vehicle_id": "v1"})) == ("VehicleBookedEvent", {"vehicle_id": "v1"})
+    assert parse_message('{"vehicle_id": "v1"}') == (None, {"vehicle_id": "v1"})
+
+
+@pytest.mark.asyncio
+async def test_consumer_keeps_per_vehicle_order_and_acks_in_batches():
+    queue = InMemoryQueue()
+    for n in range(40):
+        queue.put(sns_body({"vehicle_id": f"v{n % 4}", "seq": n}))
+    seen = {}
+
+    async def handler(subject, payload):
+        await asyncio.sleep(0.001 * (payload["seq"] % 3))  # Uneven handler latency
+        seen.setdefault(payload["vehicle_id"], []).append(payload["seq"])
+
+    consumer = EventConsumer(queue, handler, workers=4, wait_seconds=0.01, ack_interval=0.01)
+    await consumer.start()
+    await wait_for(lambda: consumer.acked == 40)
+    await consumer.stop()
+
+    for vehicle_id, sequence in seen.items():
+        assert sequence == sorted(sequence), vehicle_id
+    assert len(queue) == 0 and queue.deleted == 40
+    assert consumer.stats()["processed"] == 40
+
+
+@pytest.mark.asyncio
+async def test_consumer_bounds_messages_in_flight():
+    queue = InMemoryQueue()
+    for n in range(30):
+        queue.put(sns_body({"vehicle_id": f"v{n}"}))
+    release = asyncio.Event()
+
+    async def handler(subject, payload):
+        await release.wait()
+
+    consumer = EventConsumer(queue, handler, workers=8, max_in_flight=5, wait_seconds=0.01)
+    await consumer.start()
+    await asyncio.sleep(0.05)
+
+    assert consumer.received == 5  # The rest wait in the queue
+    release.set()
+    await wait_for(lambda: consumer.acked == 30)
+    await consumer.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_messages_are_redelivered():
+    queue = InMemoryQueue(visibility_timeout=0.02)
+    queue.put(sns_body({"vehicle_id": "v1"}))
+    attempts = []
+
+    async def handler(subject, payload):
+        attempts.append(payload)
+        if len(attempts) == 1:
+            raise RuntimeError("downstream unavailable")
+
+    consumer = EventConsumer(queue, handler, wait_seconds=0.01, ack_interval=0.01)
+    await consumer.start()
+    await wait_for(lambda: consumer.acked == 1)
+    await consumer.stop()
+
+    assert len(attempts) == 2 and consumer.failed == 1
+
+
+@pytest.mark.asyncio
+async def test_poison_messages_are_dropped_and_consuming_goes_on():
+    queue = InMemoryQueue()
+    for body in (
+        "not json",
+        json.dumps(["an", "array"]),
+        sns_body("a string"),
+        sns_body({"vehicle_id": 7}),  # Still an event, sharded by str(vehicle_id)
+        sns_body({"vehicle_id": "v1"}),
+    ):
+        queue.put(body)
+    handled = []
+
+    async def handler(subject, payload):
+        handled.append(payload["vehicle_id"])
+
+    consumer = EventConsumer(queue, handler, wait_seconds=0.01, ack_interval=0.01)
+    await consumer.start()
+    await wait_for(lambda: consumer.acked == 5)
+    await consumer.stop()
+
+    assert sorted(handled, key=str) == [7, "v1"]
+    assert (consumer.poisoned, consumer.stats()["in_flight"], len(queue)) == (3, 0, 0)
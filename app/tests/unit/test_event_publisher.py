@@ -0,0 +1,73 @@
+import json
+import pytest
+from app.core.events import VehicleBookedEvent
+from app.events.publisher import EventPublisher, serialize_event
+from app.events.transports import FileTransport, InMemoryTransport
+
+
+def booked_event(n):
+    return VehicleBookedEvent(vehicle_id=f"V{n}", employee_id=f"E{n}", purpose="Trip")
+
+
+def test_serialize_event_is_json():
+    event = booked_event(1)
+    entry = serialize_event(event)
+
+    assert entry["id"] == event.event_id
+    assert entry["subject"] == "VehicleBookedEvent"
+    assert json.loads(entry["body"])["vehicle_id"] == "V1"
+    assert booked_event(2).event_id != event.event_id  # Defaults are per instance
+
+
+@pytest.mark.asyncio
+async def test_publisher_sends_batches_of_at_most_ten():
+    transport = InMemoryTransport()
+    publisher = EventPublisher(transport, batch_size=50, flush_interval=0.01)
+    await publisher.start()
+    for n in range(25):
+        await publisher.publish(booked_event(n))
+    await publisher.close()
+
+    assert len(transport.sent) == 25
+    assert all(len(batch) <= 10 for batch in transport.batches)
+    assert publisher.stats()["published"] == 25 and publisher.stats()["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_publisher_retries_rejected_entries():
+    events = [booked_event(n) for n in range(3)]
+    transport = InMemoryTransport(fail_ids=[events[1].event_id])
+    publisher = EventPublisher(transport, flush_interval=0.01, retry_backoff=0.001)
+    await publisher.start()
+    for event in events:
+        await publisher.publish(event)
+    await publisher.close()
+
+    assert sorted(entry["id"] for entry in transport.sent) == sorted(e.event_id for e in events)
+    stats = publisher.stats()
+    assert stats["retried"] == 1 and stats["failed"] == 0
+
+
+@pytest.mark.asyncio
+async def test_publisher_drops_entries_after_max_retries():
+    class BrokenTransport:
+        async def send(self, entries):
+            raise ConnectionError("sns unavailable")
+
+    publisher = EventPublisher(BrokenTransport(), max_retries=2, flush_interval=0.01, retry_backoff=0.001)
+    await publisher.start()
+    await publisher.publish(booked_event(1))
+    await publisher.close()
+
+    assert publisher.stats()["failed"] == 1 and publisher.stats()["retried"] == 2
+
+
+@pytest.mark.asyncio
+async def test_file_transport_appends_ndjson(tmp_path):
+    path = tmp_path / "events.ndjson"
+    transport = FileTransport(str(path))
+    await transport.send([serialize_event(booked_event(1))])
+    await transport.send([serialize_event(booked_event(2))])
+
+    lines = path.read_text().splitlines()
+    assert [json.loads(line)["subject"] for line in lines] == ["VehicleBookedEvent"] * 2
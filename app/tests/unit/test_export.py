@@ -0,0 +1,52 @@
+import json
+import pytest
+from datetime import datetime, timezone
+from app.core.export import csv_chunks, ndjson_chunks
+
+
+async def allocation_rows(count):
+    for index in range(count):
+        yield {
+            "allocation_id": f"a{index}",
+            "employee_id": "emp1",
+            "vehicle_id": "v1",
+            "from_datetime": datetime(2030, 1, 1, 9, tzinfo=timezone.utc),
+            "to_datetime": datetime(2030, 1, 1, 18, tzinfo=timezone.utc),
+            "status": "pending",
+            "purpose": "Client, meeting",
+        }
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+@pytest.mark.asyncio
+async def test_ndjson_export_chunks_rows():
+    chunks = await collect(ndjson_chunks(allocation_rows(5), rows_per_chunk=2))
+
+    assert len(chunks) == 3
+    lines = "".join(chunks).splitlines()
+    assert [json.loads(line)["allocation_id"] for line in lines] == [f"a{i}" for i in range(5)]
+    assert json.loads(lines[0])["from_datetime"] == "2030-01-01T09:00:00+00:00"
+
+
+@pytest.mark.asyncio
+async def test_csv_export_writes_header_once_and_quotes_values():
+    chunks = await collect(csv_chunks(allocation_rows(3), rows_per_chunk=2))
+
+    assert len(chunks) == 2
+    lines = "".join(chunks).splitlines()
+    assert lines[0] == "allocation_id,employee_id,vehicle_id,from_datetime,to_datetime,status,purpose"
+    assert lines[1] == (
+        'a0,emp1,v1,2030-01-01T09:00:00+00:00,2030-01-01T18:00:00+00:00,pending,"Client, meeting"'
+    )
+    assert len(lines) == 4
+
+
+@pytest.mark.asyncio
+async def test_export_of_no_rows():
+    assert await collect(ndjson_chunks(allocation_rows(0))) == []
+    assert await collect(csv_chunks(allocation_rows(0))) == [
+        "allocation_id,employee_id,vehicle_id,from_datetime,to_datetime,status,purpose\r\n"
+    ]
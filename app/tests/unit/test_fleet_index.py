@@ -0,0 +1,69 @@
+import pytest
+from app.core.fleet import FleetIndex
+from app.core.models import Vehicle
+
+
+def vehicle(vehicle_id, capacity, fuel_efficiency, make="Toyota", status="available"):
+    return Vehicle(
+        vehicle_id=vehicle_id,
+        status=status,
+        fuel_efficiency=fuel_efficiency,
+        make=make,
+        model="Any",
+        capacity=capacity,
+    )
+
+
+def fleet():
+    index = FleetIndex()
+    index.add(vehicle("van", 8, 9.0, make="Ford"))
+    index.add(vehicle("sedan", 4, 15.0))
+    index.add(vehicle("hybrid", 4, 22.0))
+    index.add(vehicle("suv", 6, 11.0, make="Ford"))
+    return index
+
+
+def test_best_fit_is_smallest_vehicle_that_seats_everyone():
+    index = fleet()
+
+    assert list(index.candidates(1)) == ["hybrid", "sedan", "suv", "van"]
+    assert list(index.candidates(5)) == ["suv", "van"]
+    assert list(index.candidates(9)) == []
+
+
+def test_fuel_efficiency_ranking_and_filters():
+    index = fleet()
+
+    assert list(index.candidates(1, prefer="fuel_efficiency")) == ["hybrid", "sedan", "suv", "van"]
+    assert list(index.candidates(5, prefer="fuel_efficiency")) == ["suv", "van"]
+    assert list(index.candidates(1, make="Ford")) == ["suv", "van"]
+    with pytest.raises(ValueError):
+        list(index.candidates(1, prefer="cheapest"))
+
+
+def test_updates_move_or_drop_vehicles():
+    index = fleet()
+
+    # A retuned vehicle is re-ranked; one leaving service is no longer a candidate
+    index.add(vehicle("sedan", 4, 30.0))
+    index.add(vehicle("suv", 6, 11.0, make="Ford", status="in_maintenance"))
+
+    assert list(index.candidates(1)) == ["sedan", "hybrid", "van"]
+    assert len(index) == 3
+    assert index.remove("van")
+    assert not index.remove("van")
+    assert list(index.candidates(5)) == []
+
+
+@pytest.mark.asyncio
+async def test_load_reads_available_vehicles():
+    class Repo:
+        async def iter_available_vehicles(self):
+            for entry in (vehicle("sedan", 4, 15.0), vehicle("van", 8, 9.0)):
+                yield entry.model_dump()
+
+    index = FleetIndex()
+    index.add(vehicle("stale", 2, 50.0))
+    await index.load(Repo())
+
+    assert list(index.candidates(1)) == ["sedan", "van"]
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+from app.core.availability import AvailabilityIndex
+from app.core.fleet import FleetIndex
+from app.core.models import Vehicle
+from app.infrastructure.index_sync import IndexSync
+
+FROM = datetime(2030, 1, 1, 9, tzinfo=timezone.utc)
+TO = datetime(2030, 1, 1, 18, tzinfo=timezone.utc)
+
+
+@pytest.mark.asyncio
+async def test_bookings_reach_other_workers():
+    cache = AsyncMock()
+    here = IndexSync(cache, AvailabilityIndex())
+    there = IndexSync(AsyncMock(), AvailabilityIndex())
+
+    await here.publish(booked=[("a1", "v1", FROM, TO)])
+    channel, payload = cache.publish.call_args.args
+    message = json.loads(payload)
+
+    assert channel == "index:sync"
+    assert not here.apply(message)  # Our own message
+    assert len(here.availability) == 0
+    there.apply(message)
+    assert not there.availability.is_free("v1", FROM, TO)
+
+    there.apply({"origin": "other", "released": ["a1"]})
+    assert there.availability.is_free("v1", FROM, TO)
+    assert there.apply({"origin": "other", "reload": True})
+    assert there.messages_received == 3
+
+
+@pytest.mark.asyncio
+async def test_nothing_to_publish_sends_nothing():
+    cache = AsyncMock()
+    await IndexSync(cache, AvailabilityIndex()).publish()
+
+    assert not cache.publish.called
+
+
+@pytest.mark.asyncio
+async def test_reload_keeps_changes_that_arrive_meanwhile():
+    loading = asyncio.Event()
+    resume = asyncio.Event()
+
+    class Repo:
+        async def iter_active_allocations(self, since):
+            loading.set()
+            await resume.wait()
+            yield {"allocation_id": "a1", "vehicle_id": "v1", "from_datetime": FROM, "to_datetime": TO}
+
+    sync = IndexSync(AsyncMock(), AvailabilityIndex(), Repo())
+    reload = asyncio.create_task(sync.reload())
+    await loading.wait()
+    sync.apply({"origin": "other", "booked": [["a2", "v2", FROM.isoformat(), TO.isoformat()]]})
+    await sync.publish(booked=[("a3", "v3", FROM, TO)])
+    resume.set()
+    await reload
+
+    assert {sync.availability.vehicle_of(a) for a in ("a1", "a2", "a3")} == {"v1", "v2", "v3"}
+    assert sync.reloads == 1
+
+
+@pytest.mark.asyncio
+async def test_vehicle_writes_reach_other_workers():
+    cache = AsyncMock()
+    here = IndexSync(cache, AvailabilityIndex(), fleet=FleetIndex())
+    there = IndexSync(AsyncMock(), AvailabilityIndex(), fleet=FleetIndex())
+    vehicle = Vehicle(vehicle_id="v1", fuel_efficiency=15.5, make="Toyota", model="Corolla", capacity=4)
+
+    await here.publish(vehicles=[vehicle])
+    there.apply(json.loads(cache.publish.call_args.args[1]))
+    assert list(there.fleet.candidates(4)) == ["v1"]
+
+    vehicle.status = "in_maintenance"
+    await here.publish(vehicles=[vehicle])
+    there.apply(json.loads(cache.publish.call_args.args[1]))
+    assert list(there.fleet.candidates(4)) == []
+
+
+@pytest.mark.asyncio
+async def test_start_loads_the_indexes_once():
+    class Repo:
+        loads = 0
+
+        async def iter_active_allocations(self, since):
+            Repo.loads += 1
+            yield {"allocation_id": "a1", "vehicle_id": "v1", "from_datetime": FROM, "to_datetime": TO}
+
+    class PubSub:
+        async def subscribe(self, channel):
+            pass
+
+        async def listen(self):
+            await asyncio.Event().wait()
+            yield
+
+        async def close(self):
+            pass
+
+    cache = MagicMock()
+    cache.pubsub.return_value = PubSub()
+    sync = IndexSync(cache, AvailabilityIndex(), Repo(), reload_interval=0)
+    await sync.start()
+    assert (Repo.loads, sync.reloads) == (1, 1)  # Just the rebuild on subscribing
+    assert sync.availability.vehicle_of("a1") == "v1"
+    await sync.close()
+
+    # Redis unreachable: start loads them itself
+    Repo.loads = 0
+    cache.pubsub.return_value.subscribe = AsyncMock(side_effect=ConnectionError("refused"))
+    sync = IndexSync(cache, AvailabilityIndex(), Repo(), reload_interval=0)
+    await sync.start()
+    assert (Repo.loads, sync.reloads) == (1, 1)
+    await sync.close()
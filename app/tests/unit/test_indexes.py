@@ -0,0 +1,36 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.infrastructure.indexes import QUERY_SHAPES, explain_query_shapes
+
+
+@pytest.mark.asyncio
+async def test_explain_flags_collection_scans():
+    plans = {
+        "allocations": {
+            "stage": "FETCH",
+            "inputStage": {"stage": "IXSCAN", "indexName": "vehicle_id_1"},
+        },
+        "vehicles": {"stage": "SORT", "inputStages": [{"stage": "COLLSCAN"}]},
+        "daily_vehicle_usage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}},
+        "outbox": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}},
+    }
+
+    def collection(name):
+        cursor = MagicMock()
+        cursor.sort.return_value = cursor
+        cursor.explain = AsyncMock(
+            return_value={"queryPlanner": {"winningPlan": plans[name]}}
+        )
+        mock_collection = MagicMock()
+        mock_collection.find.return_value = cursor
+        return mock_collection
+
+    db = MagicMock()
+    db.__getitem__.side_effect = collection
+
+    report = await explain_query_shapes(db)
+
+    assert len(report) == len(QUERY_SHAPES)
+    for entry, shape in zip(report, QUERY_SHAPES):
+        assert entry["collscan"] == (shape["collection"] == "vehicles")
+    assert report[0]["stages"] == ["FETCH", "IXSCAN"]
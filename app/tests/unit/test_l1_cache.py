@@ -0,0 +1,107 @@
+import json
+import pytest
+from unittest.mock import AsyncMock
+from app.infrastructure.cache_batch import CacheBatch
+from app.infrastructure.l1_cache import LRUCache, TieredCache, _MISSING
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2, ttl=30)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is _MISSING
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_lru_expires_entries(mocker):
+    clock = mocker.patch("app.infrastructure.l1_cache.time.monotonic", return_value=100.0)
+    cache = LRUCache(max_entries=10, ttl=30)
+    cache.set("short", 1, ttl=5)  # Redis expiration shorter than the L1 TTL wins
+    cache.set("long", 2, ttl=3600)  # ...and the L1 TTL caps longer ones
+
+    clock.return_value = 106.0
+    assert cache.get("short") is _MISSING
+    assert cache.get("long") == 2
+    clock.return_value = 131.0
+    assert cache.get("long") is _MISSING
+
+
+@pytest.mark.asyncio
+async def test_tiered_cache_serves_repeat_reads_locally():
+    redis_cache = AsyncMock()
+    redis_cache.get.return_value = "available"
+    cache = TieredCache(redis_cache, prefixes=["vehicle:"])
+
+    assert await cache.get("vehicle:v1:status") == "available"
+    assert await cache.get("vehicle:v1:status") == "available"
+    assert redis_cache.get.call_count == 1
+
+    # Prefixes without L1 always go to Redis
+    await cache.get("employee:e1:booking:x")
+    await cache.get("employee:e1:booking:x")
+    assert redis_cache.get.call_count == 3
+    assert cache.stats()["l1_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_tiered_cache_publishes_and_applies_invalidations():
+    redis_cache = AsyncMock()
+    redis_cache.get.return_value = "available"
+    cache = TieredCache(redis_cache, prefixes=["vehicle:"])
+    await cache.get("vehicle:v1:status")
+
+    await cache.delete("vehicle:v1:status")
+    channel, payload = redis_cache.publish.call_args[0]
+    message = json.loads(payload)
+    assert channel == "cache:invalidate"
+    assert message["keys"] == ["vehicle:v1:status"]
+
+    # Another worker's L1 drops the key; our own echo is ignored
+    other = TieredCache(AsyncMock(), prefixes=["vehicle:"])
+    other.l1.set("vehicle:v1:status", "available")
+    other.apply_invalidation(message)
+    assert other.l1.get("vehicle:v1:status") is _MISSING
+    cache.apply_invalidation(message)
+    assert cache.stats()["invalidations_received"] == 0
+
+
+@pytest.mark.asyncio
+async def test_tiered_cache_get_many_only_fetches_local_misses():
+    redis_cache = AsyncMock()
+    redis_cache.get_many.return_value = ["available", None]
+    cache = TieredCache(redis_cache, prefixes=["vehicle:"])
+    cache.l1.set("vehicle:v1:status", "allocated")
+
+    values = await cache.get_many(["vehicle:v1:status", "vehicle:v2:status", "employee:e1:x"])
+
+    assert values == ["allocated", "available", None]
+    redis_cache.get_many.assert_called_once_with(["vehicle:v2:status", "employee:e1:x"])
+
+
+@pytest.mark.asyncio
+async def test_cache_batch_flushes_once_and_drops_on_error():
+    redis_cache = AsyncMock()
+    cache = TieredCache(redis_cache, prefixes=["vehicle:"])
+    cache.l1.set("vehicle:v1:status", "available")
+
+    async with CacheBatch(cache) as batch:
+        batch.set("vehicle:v2:status", "available", 60)
+        batch.delete("vehicle:v1:status", "employee:e1:x")
+        batch.bump_generations(["history:gen"])
+
+    redis_cache.execute_batch.assert_called_once()
+    assert len(redis_cache.execute_batch.call_args[0][0]) == 3
+    assert cache.l1.get("vehicle:v1:status") is _MISSING
+    assert cache.l1.get("vehicle:v2:status") == "available"
+    redis_cache.publish.assert_called_once()  # One invalidation message for the batch
+
+    with pytest.raises(RuntimeError):
+        async with CacheBatch(cache) as batch:
+            batch.delete("vehicle:v2:status")
+            raise RuntimeError("write failed")
+    redis_cache.execute_batch.assert_called_once()
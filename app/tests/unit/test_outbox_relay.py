@@ -0,0 +1,56 @@
+import pytest
+from unittest.mock import AsyncMock
+from app.events.outbox_relay import OutboxRelay
+from app.events.transports import InMemoryTransport
+
+
+def pending(count):
+    return [
+        {"_id": f"evt{n}", "subject": "VehicleBookedEvent", "body": "{}", "attempts": 0}
+        for n in range(count)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_relay_sends_in_transport_batches_and_marks_in_one_call():
+    outbox_repo = AsyncMock()
+    outbox_repo.get_pending.return_value = pending(25)
+    transport = InMemoryTransport()
+    relay = OutboxRelay(outbox_repo, transport, batch_size=100)
+
+    assert await relay.relay_once() == 25
+
+    assert [len(batch) for batch in transport.batches] == [10, 10, 5]
+    outbox_repo.mark.assert_awaited_once()
+    published_ids, failed_ids = outbox_repo.mark.call_args.args
+    assert len(published_ids) == 25 and failed_ids == []
+    assert relay.stats() == {"relayed": 25, "failed": 0}
+
+
+@pytest.mark.asyncio
+async def test_relay_leaves_failed_entries_pending():
+    outbox_repo = AsyncMock()
+    outbox_repo.get_pending.return_value = pending(3)
+    relay = OutboxRelay(outbox_repo, InMemoryTransport(fail_ids=["evt1"]))
+
+    await relay.relay_once()
+
+    published_ids, failed_ids = outbox_repo.mark.call_args.args
+    assert published_ids == ["evt0", "evt2"] and failed_ids == ["evt1"]
+
+
+@pytest.mark.asyncio
+async def test_relay_treats_transport_errors_as_failures():
+    class BrokenTransport:
+        max_batch = 10
+
+        async def send(self, entries):
+            raise ConnectionError("sns unavailable")
+
+    outbox_repo = AsyncMock()
+    outbox_repo.get_pending.return_value = pending(2)
+    relay = OutboxRelay(outbox_repo, BrokenTransport())
+
+    await relay.relay_once()
+
+    assert outbox_repo.mark.call_args.args == ([], ["evt0", "evt1"])
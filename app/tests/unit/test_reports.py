@@ -0,0 +1,83 @@
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+from app.core.services import ReportService
+from app.infrastructure.db import ReportRepository
+
+START = datetime(2030, 1, 1, tzinfo=timezone.utc)
+END = datetime(2030, 1, 8, tzinfo=timezone.utc)
+
+
+def mock_db(rows):
+    db = MagicMock()
+    db.__getitem__.return_value.aggregate.return_value.to_list = AsyncMock(return_value=rows)
+    return db
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "report, args",
+    [
+        ("vehicle_utilization", ()),
+        ("top_employees", (5,)),
+        ("booking_durations", ()),
+    ],
+)
+async def test_report_pipelines_match_on_the_indexed_window(report, args):
+    db = mock_db([{"bookings": 1}])
+    start = START.replace(hour=6)  # Not whole days: aggregate raw allocations
+    rows = await getattr(ReportRepository(db), report)(start, END, *args)
+
+    assert rows == [{"bookings": 1}]
+    db.__getitem__.assert_called_with("allocations")
+    aggregate = db.__getitem__.return_value.aggregate
+    pipeline = aggregate.call_args[0][0]
+    assert aggregate.call_args[1] == {"allowDiskUse": True}
+    # The window $match comes first so the history index can serve it
+    assert "from_datetime" in pipeline[0]["$match"]
+    assert pipeline[0]["$match"]["status"] == {"$ne": "rejected"}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("report", ["vehicle_daily_bookings", "vehicle_utilization"])
+async def test_whole_day_reports_read_the_rollups(report):
+    db = mock_db([])
+    await getattr(ReportRepository(db), report)(START, END)
+
+    db.__getitem__.assert_called_with("daily_vehicle_usage")
+    pipeline = db.__getitem__.return_value.aggregate.call_args[0][0]
+    # END is exclusive: the last day read is the one before it
+    assert pipeline[0] == {"$match": {"day": {"$gte": "2030-01-01", "$lte": "2030-01-07"}}}
+
+
+@pytest.mark.asyncio
+async def test_report_results_are_cached_per_window():
+    mock_report_repo = AsyncMock()
+    mock_cache = AsyncMock()
+    mock_cache.get_generations.return_value = [3]
+    mock_cache.get.return_value = None  # Cache miss
+    mock_report_repo.top_employees.return_value = [{"employee_id": "emp1", "bookings": 4}]
+
+    service = ReportService(mock_report_repo, mock_cache)
+    rows = await service.top_employees("2030-01-01T00:00:00", "2030-01-08T00:00:00", limit=5)
+
+    assert rows == [{"employee_id": "emp1", "bookings": 4}]
+    mock_report_repo.top_employees.assert_called_once_with(START, END, 5)
+    cache_key = mock_cache.set.call_args[0][0]
+    assert cache_key == (
+        "report:top_employees:3:2030-01-01T00:00:00+00:00:2030-01-08T00:00:00+00:00:5"
+    )
+
+    # A cached report, even an empty one, is served without aggregating
+    mock_cache.get.return_value = []
+    assert await service.top_employees(START, END, limit=5) == []
+    mock_report_repo.top_employees.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_report_rejects_invalid_windows():
+    service = ReportService(AsyncMock(), AsyncMock())
+    with pytest.raises(ValueError):
+        await service.vehicle_utilization(END, START)
+    with pytest.raises(ValueError):
+        await service.vehicle_utilization(START, START.replace(year=2032))
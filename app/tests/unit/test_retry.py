@@ -0,0 +1,55 @@
+import pytest
+from pymongo.errors import OperationFailure
+from app.core.retry import backoff_delay, is_transient, retry_transient
+
+
+def write_conflict():
+    return OperationFailure(
+        "WriteConflict", code=112, details={"errorLabels": ["TransientTransactionError"]}
+    )
+
+
+def test_is_transient():
+    assert is_transient(write_conflict())
+    assert not is_transient(OperationFailure("bad", code=2))
+    assert not is_transient(ValueError("not a driver error"))
+
+
+def test_backoff_delay_is_jittered_and_capped():
+    delays = [backoff_delay(10, base=0.01, cap=0.5) for _ in range(100)]
+    assert all(0 <= delay <= 0.5 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+@pytest.mark.asyncio
+async def test_retry_transient_retries_write_conflicts():
+    stats = {"retries": 0, "gave_up": 0}
+    calls = []
+
+    async def book():
+        calls.append(1)
+        if len(calls) < 3:
+            raise write_conflict()
+        return "booked"
+
+    assert await retry_transient(book, retries=5, base_delay=0.001, stats=stats) == "booked"
+    assert stats == {"retries": 2, "gave_up": 0}
+
+
+@pytest.mark.asyncio
+async def test_retry_transient_gives_up_and_skips_other_errors():
+    stats = {"retries": 0, "gave_up": 0}
+
+    async def conflict():
+        raise write_conflict()
+
+    with pytest.raises(OperationFailure):
+        await retry_transient(conflict, retries=2, base_delay=0.001, stats=stats)
+    assert stats == {"retries": 2, "gave_up": 1}
+
+    async def invalid():
+        raise ValueError("invalid booking")
+
+    with pytest.raises(ValueError):
+        await retry_transient(invalid, retries=2, base_delay=0.001, stats=stats)
+    assert stats["retries"] == 2
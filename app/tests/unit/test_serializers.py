@@ -0,0 +1,71 @@
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from app.core.models import Allocation
+from app.infrastructure.serializers import COMPRESSED, Serializer, get_serializer
+
+
+def history_page(rows=3):
+    allocations = [
+        {
+            "allocation_id": f"a{i}",
+            "employee_id": "emp1",
+            "vehicle_id": "v1",
+            "from_datetime": datetime(2030, 1, 1, 9) + timedelta(days=i),
+            "to_datetime": datetime(2030, 1, 1, 17) + timedelta(days=i),
+            "purpose": "Site visit",
+            "status": "pending",
+        }
+        for i in range(rows)
+    ]
+    return (allocations, rows, "cursor")
+
+
+@pytest.mark.parametrize("name", ["json", "orjson", "msgpack"])
+def test_history_page_round_trips(name):
+    if name != "json":
+        pytest.importorskip(name)  # Optional backends
+    serializer = get_serializer(name)
+    page = history_page()
+
+    decoded = serializer.loads(serializer.dumps(page))
+
+    # The (allocations, total_count, next_cursor) tuple and its datetimes survive
+    assert decoded == page
+    assert isinstance(decoded, tuple)
+    assert isinstance(decoded[0][0]["from_datetime"], datetime)
+
+
+def test_models_round_trip_without_revalidation():
+    serializer = Serializer()
+    tomorrow = datetime.now(timezone.utc) + timedelta(days=1)
+    allocation = Allocation(
+        employee_id="emp1",
+        vehicle_id="v1",
+        from_datetime=tomorrow,
+        to_datetime=tomorrow + timedelta(hours=2),
+    )
+
+    decoded = serializer.loads(serializer.dumps(allocation))
+
+    assert isinstance(decoded, Allocation)
+    assert decoded == allocation
+
+
+def test_large_values_are_compressed():
+    serializer = Serializer(compression_threshold=256)
+    small, large = history_page(1), history_page(50)
+
+    assert not serializer.dumps(small)[0] & COMPRESSED
+    encoded = serializer.dumps(large)
+    assert encoded[0] & COMPRESSED
+    assert len(encoded) < len(json.dumps(serializer.loads(encoded), default=str))
+    assert serializer.loads(encoded) == large
+
+
+def test_values_written_before_the_codec_still_decode():
+    serializer = Serializer()
+
+    assert serializer.loads(b'{"vehicle_id": "v1"}') == {"vehicle_id": "v1"}
+    assert serializer.loads(b"available") == "available"
+    assert serializer.loads(serializer.dumps("available")) == "available"
@@ -0,0 +1,37 @@
+import pytest
+from datetime import datetime
+from pydantic import ValidationError
+from app.core.models import Allocation, Vehicle
+from app.infrastructure.db import load_model
+
+# As stored by MongoDB: naive UTC datetimes, and long in the past
+STORED_ALLOCATION = {
+    "allocation_id": "a1",
+    "employee_id": "emp1",
+    "vehicle_id": "v1",
+    "from_datetime": datetime(2024, 10, 25, 9),
+    "to_datetime": datetime(2024, 10, 25, 18),
+    "purpose": "Business Trip",
+    "status": "approved",
+}
+
+
+def test_trusted_read_skips_validators():
+    allocation = load_model(Allocation, STORED_ALLOCATION)
+
+    assert isinstance(allocation, Allocation)
+    assert allocation.from_datetime == datetime(2024, 10, 25, 9)
+    assert allocation.model_dump() == STORED_ALLOCATION
+
+
+def test_untrusted_read_validates():
+    with pytest.raises(ValidationError):
+        load_model(Allocation, STORED_ALLOCATION, trusted=False)
+
+
+def test_trusted_read_fills_defaults():
+    vehicle = load_model(
+        Vehicle,
+        {"vehicle_id": "v1", "fuel_efficiency": 15.5, "make": "Toyota", "model": "Corolla", "capacity": 4},
+    )
+    assert vehicle.status == "available" and vehicle.current_driver_id is None
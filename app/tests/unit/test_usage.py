@@ -0,0 +1,36 @@
+from app.core.usage import daily_usage, merge_usage
+
+HOUR_MS = 3600 * 1000
+
+
+def test_daily_usage_splits_hours_across_days():
+    rows = daily_usage("v1", "2030-01-01T22:00:00Z", "2030-01-03T01:00:00Z")
+
+    assert rows == [
+        {"vehicle_id": "v1", "day": "2030-01-01", "bookings": 1, "booked_ms": 2 * HOUR_MS},
+        {"vehicle_id": "v1", "day": "2030-01-02", "bookings": 0, "booked_ms": 24 * HOUR_MS},
+        {"vehicle_id": "v1", "day": "2030-01-03", "bookings": 0, "booked_ms": 1 * HOUR_MS},
+    ]
+
+
+def test_daily_usage_skips_the_day_a_booking_ends_at_midnight():
+    rows = daily_usage("v1", "2030-01-01T09:00:00Z", "2030-01-02T00:00:00Z", sign=-1)
+
+    assert rows == [
+        {"vehicle_id": "v1", "day": "2030-01-01", "bookings": -1, "booked_ms": -15 * HOUR_MS}
+    ]
+
+
+def test_merge_usage_nets_out_a_moved_booking():
+    # Same vehicle and day, shifted by an hour: only the hour difference remains
+    rows = merge_usage(
+        daily_usage("v1", "2030-01-01T09:00:00Z", "2030-01-01T12:00:00Z", sign=-1)
+        + daily_usage("v1", "2030-01-01T09:00:00Z", "2030-01-01T13:00:00Z")
+    )
+    assert rows == [{"vehicle_id": "v1", "day": "2030-01-01", "bookings": 0, "booked_ms": HOUR_MS}]
+
+    # Moving it back cancels out entirely
+    assert merge_usage(
+        daily_usage("v1", "2030-01-01T09:00:00Z", "2030-01-01T12:00:00Z", sign=-1)
+        + daily_usage("v1", "2030-01-01T09:00:00Z", "2030-01-01T12:00:00Z")
+    ) == []
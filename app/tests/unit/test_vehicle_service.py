@@ -0,0 +1,137 @@
+import pytest
+from datetime import datetime, time, timedelta
+from unittest.mock import AsyncMock, MagicMock
+from app.core.availability import AvailabilityIndex
+from app.core.exceptions import InvalidCursorError
+from app.core.services import VehicleService, build_vehicle_query
+from app.infrastructure.db import VehicleRepository
+
+
+def fleet_repo(count):
+    """A VehicleRepository mock serving `count` vehicles through find_vehicles."""
+    fleet = [{"vehicle_id": f"v{n:03d}", "status": "available"} for n in range(count)]
+    repo = AsyncMock()
+
+    async def find_vehicles(query, limit, after=None, projection=None):
+        return [vehicle for vehicle in fleet if after is None or vehicle["vehicle_id"] > after][:limit]
+
+    repo.find_vehicles.side_effect = find_vehicles
+    return repo
+
+
+def test_build_vehicle_query():
+    assert build_vehicle_query() == {}
+    assert build_vehicle_query("available", "Toyota", "Corolla", 4) == {
+        "status": "available",
+        "make": "Toyota",
+        "model": "Corolla",
+        "capacity": {"$gte": 4},
+    }
+
+
+@pytest.mark.asyncio
+async def test_get_all_vehicles_walks_every_page():
+    repo = fleet_repo(250)
+    service = VehicleService(repo, AsyncMock())
+
+    seen, cursor = [], None
+    while True:
+        vehicles, cursor = await service.get_all_vehicles(size=100, cursor=cursor)
+        seen.extend(vehicle["vehicle_id"] for vehicle in vehicles)
+        if cursor is None:
+            break
+
+    assert len(seen) == 250 and len(set(seen)) == 250  # Nothing capped or repeated
+    assert repo.find_vehicles.call_args.kwargs["limit"] == 101
+
+
+@pytest.mark.asyncio
+async def test_available_vehicles_fill_the_page_past_booked_ones():
+    repo = fleet_repo(20)
+    availability = AvailabilityIndex()
+    start = datetime(2030, 1, 1, 9)
+    for n in range(0, 12):
+        availability.add(f"a{n}", f"v{n:03d}", start, start + timedelta(hours=8))
+    service = VehicleService(repo, AsyncMock(), availability)
+
+    vehicles, cursor = await service.get_available_vehicles(
+        start, start + timedelta(hours=1), size=5
+    )
+
+    assert [vehicle["vehicle_id"] for vehicle in vehicles] == [f"v{n:03d}" for n in range(12, 17)]
+    vehicles, cursor = await service.get_available_vehicles(
+        start, start + timedelta(hours=1), size=5, cursor=cursor
+    )
+    assert [vehicle["vehicle_id"] for vehicle in vehicles] == ["v017", "v018", "v019"]
+    assert cursor is None
+
+
+@pytest.mark.asyncio
+async def test_available_vehicles_in_a_daily_window():
+    availability = AvailabilityIndex()
+    monday = datetime(2030, 1, 7)
+    availability.add("a1", "v000", monday + timedelta(hours=10), monday + timedelta(hours=11))
+    availability.add("a2", "v001", monday + timedelta(hours=18), monday + timedelta(hours=19))
+    service = VehicleService(fleet_repo(3), AsyncMock(), availability)
+
+    vehicles, _ = await service.get_available_vehicles(
+        monday, monday + timedelta(days=5), daily_start=time(9), daily_end=time(17)
+    )
+    assert [vehicle["vehicle_id"] for vehicle in vehicles] == ["v001", "v002"]
+    vehicles, _ = await service.get_available_vehicles(
+        monday, monday + timedelta(days=5), daily_start=time(9), daily_end=time(17), match="any"
+    )
+    assert [vehicle["vehicle_id"] for vehicle in vehicles] == ["v000", "v001", "v002"]
+
+
+@pytest.mark.asyncio
+async def test_invalid_vehicle_cursor_is_rejected():
+    service = VehicleService(fleet_repo(1), AsyncMock())
+    with pytest.raises(InvalidCursorError):
+        await service.get_all_vehicles(cursor="not-a-cursor")
+
+
+@pytest.mark.asyncio
+async def test_vehicle_fields_keep_the_cursor_working():
+    repo = fleet_repo(3)
+    service = VehicleService(repo, AsyncMock())
+
+    vehicles, cursor = await service.get_all_vehicles(size=2, fields="status")
+
+    assert vehicles == [{"status": "available"}] * 2
+    assert repo.find_vehicles.call_args.kwargs["projection"] == {
+        "_id": 0,
+        "status": 1,
+        "vehicle_id": 1,
+    }
+    vehicles, cursor = await service.get_all_vehicles(size=2, cursor=cursor, fields="status")
+    assert len(vehicles) == 1 and cursor is None
+
+
+@pytest.mark.asyncio
+async def test_vehicle_reads_hide_cas_bookkeeping():
+    stored = {"vehicle_id": "v1", "status": "available", "booked_windows": [], "version": 3}
+
+    class Cursor:
+        def sort(self, *args):
+            return self
+
+        def limit(self, *args):
+            return self
+
+        async def to_list(self, *args):
+            return [{key: value for key, value in stored.items() if projection.get(key, 1)}]
+
+    def find(query, requested):
+        projection.update(requested)
+        return Cursor()
+
+    projection = {}
+    db = MagicMock()
+    db.vehicles.find.side_effect = find
+    service = VehicleService(VehicleRepository(db), AsyncMock())
+
+    vehicles, _ = await service.get_all_vehicles()
+
+    assert vehicles == [{"vehicle_id": "v1", "status": "available"}]
+    assert projection == {"_id": 0, "booked_windows": 0, "version": 0}
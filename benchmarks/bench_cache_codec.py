@@ -0,0 +1,98 @@
+"""
+Compare cache serializers on a cached /allocations/history page.
+
+Reports encode/decode cost and stored bytes per page for every available
+backend, with and without compression. Pass --redis to also measure the
+memory Redis reports for each stored page (MEMORY USAGE).
+
+    python -m benchmarks.bench_cache_codec --rows 10 100 --redis redis://localhost:6379
+"""
+import argparse
+import asyncio
+import timeit
+from datetime import datetime, timedelta
+from uuid import uuid4
+from app.infrastructure.serializers import SERIALIZERS, get_serializer
+
+
+def history_page(rows: int):
+    """Same shape get_filtered_allocations caches: (allocations, total_count, next_cursor)."""
+    start = datetime(2030, 1, 1, 9)
+    allocations = [
+        {
+            "allocation_id": str(uuid4()),
+            "employee_id": str(uuid4()),
+            "vehicle_id": str(uuid4()),
+            "from_datetime": start + timedelta(hours=i),
+            "to_datetime": start + timedelta(hours=i + 8),
+            "purpose": "Business trip to Dhaka",
+            "status": "pending",
+        }
+        for i in range(rows)
+    ]
+    return allocations, rows * 10, "eyJmIjoiMjAzMC0wMS0wMVQwOTowMDowMCIsImEiOiJhIn0"
+
+
+def legacy_size(page) -> int:
+    # What RedisCache.set stored before the codec: str(value) for tuples
+    return len(str(page).encode())
+
+
+def available_serializers(compression_threshold: int):
+    for name in SERIALIZERS:
+        try:
+            yield get_serializer(name, compression_threshold)
+        except ImportError:
+            print(f"  (skipping {name}: package not installed)")
+
+
+async def redis_memory(redis_url: str, payloads: dict) -> dict:
+    import aioredis
+
+    redis = aioredis.from_url(redis_url)
+    usage = {}
+    try:
+        for label, payload in payloads.items():
+            key = f"bench:codec:{label}"
+            await redis.set(key, payload, ex=60)
+            usage[label] = await redis.memory_usage(key)
+            await redis.delete(key)
+    finally:
+        await redis.close()
+    return usage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--number", type=int, default=2000, help="iterations per timing")
+    parser.add_argument("--redis", help="Redis URL to measure MEMORY USAGE per page")
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        page = history_page(rows)
+        print(f"\nHistory page with {rows} allocations (legacy str(): {legacy_size(page)} B)")
+        print(f"  {'serializer':<18}{'encode us':>10}{'decode us':>10}{'bytes':>8}{'redis B':>9}")
+        payloads, rows_out = {}, []
+        for compression_threshold in (0, 1024):
+            for serializer in available_serializers(compression_threshold):
+                label = serializer.name + ("+zlib" if compression_threshold else "")
+                encoded = serializer.dumps(page)
+                assert serializer.loads(encoded) == page, f"{label} lost data"
+                encode = timeit.timeit(lambda: serializer.dumps(page), number=args.number)
+                decode = timeit.timeit(lambda: serializer.loads(encoded), number=args.number)
+                payloads[label] = encoded
+                rows_out.append(
+                    (label, encode / args.number * 1e6, decode / args.number * 1e6, len(encoded))
+                )
+
+        usage = asyncio.run(redis_memory(args.redis, payloads)) if args.redis else {}
+        for label, encode_us, decode_us, size in rows_out:
+            print(
+                f"  {label:<18}{encode_us:>10.1f}{decode_us:>10.1f}{size:>8}"
+                f"{usage.get(label, '-'):>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Load-test the event consumer runtime offline, against the in-memory queue.
+
+Fills the queue with booking events spread over a number of vehicles and
+consumes them with simulated handler latency, reporting throughput, lag and
+how far backpressure held the in-flight count. Compare --workers and
+--max-in-flight settings before changing them in production.
+
+    python -m benchmarks.bench_event_consumer --messages 20000 --workers 1 8 32 --handler-ms 2
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from app.core.events import VehicleBookedEvent
+from app.events.consumer import EventConsumer
+from app.events.publisher import serialize_event
+from app.events.queues import InMemoryQueue
+
+
+def fill(queue: InMemoryQueue, messages: int, vehicles: int):
+    for _ in range(messages):
+        entry = serialize_event(
+            VehicleBookedEvent(
+                vehicle_id=f"V{random.randrange(vehicles)}", employee_id="E1", purpose="Trip"
+            )
+        )
+        envelope = {"Type": "Notification", "Subject": entry["subject"], "Message": entry["body"]}
+        queue.put(json.dumps(envelope), message_id=entry["id"])
+
+
+async def run(args, workers: int) -> dict:
+    queue = InMemoryQueue()
+    fill(queue, args.messages, args.vehicles)
+    peak_in_flight = 0
+
+    async def handler(subject, payload):
+        await asyncio.sleep(random.expovariate(1000 / args.handler_ms) if args.handler_ms else 0)
+
+    consumer = EventConsumer(
+        queue, handler, workers=workers, max_in_flight=args.max_in_flight, wait_seconds=0.01
+    )
+    started = time.perf_counter()
+    await consumer.start()
+    while consumer.acked + consumer.ack_failures < args.messages:
+        peak_in_flight = max(peak_in_flight, consumer.stats()["in_flight"])
+        await asyncio.sleep(0.01)
+    await consumer.stop()
+    elapsed = time.perf_counter() - started
+    return dict(consumer.stats(), elapsed=elapsed, peak_in_flight=peak_in_flight)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--vehicles", type=int, default=200, help="distinct ordering keys")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--max-in-flight", type=int, default=100)
+    parser.add_argument("--handler-ms", type=float, default=2.0, help="mean handler latency")
+    args = parser.parse_args()
+
+    print(
+        f"{args.messages} messages over {args.vehicles} vehicles, "
+        f"~{args.handler_ms} ms per handler, max {args.max_in_flight} in flight"
+    )
+    print(f"  {'workers':>8}{'msg/s':>10}{'elapsed s':>11}{'max lag s':>11}{'peak in flight':>16}")
+    for workers in args.workers:
+        result = asyncio.run(run(args, workers))
+        print(
+            f"  {workers:>8}{args.messages / result['elapsed']:>10.0f}{result['elapsed']:>11.2f}"
+            f"{result['max_lag_seconds']:>11.2f}{result['peak_in_flight']:>16}"
+        )
+
+
+if __name__ == "__main__":
+    main()
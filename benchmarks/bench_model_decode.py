@@ -0,0 +1,113 @@
+"""
+Per-document cost of turning stored allocations and vehicles into models.
+
+Compares the old read path (stringify `_id`, then Model(**document)) with
+full validation, a compiled TypeAdapter over a whole page, model_construct and
+the trusted reads the repositories now use (projection without `_id`, then
+load_model: model_construct only for models with Python validators, since
+pydantic's compiled validator beats model_construct on plain models).
+
+    python -m benchmarks.bench_model_decode --documents 1000 --number 20
+"""
+import argparse
+import timeit
+from datetime import datetime, timedelta
+from typing import List
+from uuid import uuid4
+from bson import ObjectId
+from pydantic import TypeAdapter
+from app.core.models import Allocation, Vehicle
+from app.infrastructure.db import load_model
+
+
+def stored_allocations(count: int) -> List[dict]:
+    # Future windows, so the validators accept them like freshly written bookings
+    start = datetime.utcnow() + timedelta(days=30)
+    return [
+        {
+            "_id": ObjectId(),
+            "allocation_id": str(uuid4()),
+            "employee_id": str(uuid4()),
+            "vehicle_id": str(uuid4()),
+            "from_datetime": start + timedelta(hours=i),
+            "to_datetime": start + timedelta(hours=i + 8),
+            "purpose": "Business trip to Dhaka",
+            "status": "pending",
+        }
+        for i in range(count)
+    ]
+
+
+def stored_vehicles(count: int) -> List[dict]:
+    return [
+        {
+            "_id": ObjectId(),
+            "vehicle_id": str(uuid4()),
+            "current_driver_id": str(uuid4()),
+            "status": "available",
+            "fuel_efficiency": 15.5,
+            "make": "Toyota",
+            "model": "Corolla",
+            "capacity": 4,
+        }
+        for _ in range(count)
+    ]
+
+
+def decoders(model_cls):
+    page_adapter = TypeAdapter(List[model_cls])
+
+    def legacy(documents):
+        decoded = []
+        for document in documents:
+            document = dict(document)
+            document["_id"] = str(document["_id"])  # The old per-document loop
+            decoded.append(model_cls(**document))
+        return decoded
+
+    def validated(documents):
+        return [model_cls.model_validate(document) for document in documents]
+
+    def type_adapter(documents):
+        return page_adapter.validate_python(documents)
+
+    def constructed(documents):
+        return [model_cls.model_construct(**document) for document in documents]
+
+    def trusted(documents):
+        return [load_model(model_cls, document) for document in documents]
+
+    # Every path but the legacy one reads with a projection, so no _id comes back
+    return [
+        ("legacy Model(**doc)", legacy, True),
+        ("model_validate", validated, False),
+        ("TypeAdapter(List)", type_adapter, False),
+        ("model_construct", constructed, False),
+        ("load_model (trusted)", trusted, False),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--number", type=int, default=20, help="iterations per timing")
+    args = parser.parse_args()
+
+    for model_cls, documents in (
+        (Allocation, stored_allocations(args.documents)),
+        (Vehicle, stored_vehicles(args.documents)),
+    ):
+        projected = [{k: v for k, v in d.items() if k != "_id"} for d in documents]
+        print(f"\n{model_cls.__name__}: {args.documents} documents")
+        print(f"  {'decoder':<22}{'us/doc':>8}{'speedup':>9}")
+        baseline = None
+        for label, decode, with_id in decoders(model_cls):
+            page = documents if with_id else projected
+            seconds = timeit.timeit(lambda: decode(page), number=args.number)
+            per_document = seconds / args.number / args.documents * 1e6
+            baseline = baseline or per_document
+            print(f"  {label:<22}{per_document:>8.2f}{baseline / per_document:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
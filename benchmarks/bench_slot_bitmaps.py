@@ -0,0 +1,80 @@
+"""
+Compare fleet-wide daily-window availability queries: slot bitmaps vs range searches.
+
+Fills an availability index with random bookings over the coming weeks, then
+asks which vehicles are free between 09:00 and 17:00 on every day (and on any
+day) of a week, once with AvailabilityIndex.free_vehicles_daily (one AND of
+15-minute slot bitmaps per vehicle) and once with a free_vehicles range search
+per day.
+
+    python -m benchmarks.bench_slot_bitmaps --vehicles 1000 5000 --bookings 40
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, time as time_of_day, timedelta, timezone
+from app.core.availability import AvailabilityIndex
+
+
+def build(vehicles: int, bookings: int, first_day: date) -> AvailabilityIndex:
+    index = AvailabilityIndex()
+    origin = datetime.combine(first_day, time_of_day.min, tzinfo=timezone.utc)
+    for vehicle in range(vehicles):
+        for booking in range(bookings):
+            start = origin + timedelta(minutes=15 * random.randrange(28 * 96))
+            end = start + timedelta(minutes=15 * random.randint(1, 16))
+            index.add(f"a{vehicle}-{booking}", f"V{vehicle}", start, end)
+    return index
+
+
+def by_range_search(index, vehicle_ids, days, daily_start, daily_end, match):
+    windows = [
+        (
+            datetime.combine(day, daily_start, tzinfo=timezone.utc),
+            datetime.combine(day, daily_end, tzinfo=timezone.utc),
+        )
+        for day in days
+    ]
+    free_per_day = [set(index.free_vehicles(vehicle_ids, start, end)) for start, end in windows]
+    if match == "all":
+        return [vehicle_id for vehicle_id in vehicle_ids if all(vehicle_id in free for free in free_per_day)]
+    return [vehicle_id for vehicle_id in vehicle_ids if any(vehicle_id in free for free in free_per_day)]
+
+
+def timed(function, repeat: int) -> tuple:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vehicles", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--bookings", type=int, default=40, help="bookings per vehicle over 4 weeks")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    first_day = date.today() + timedelta(days=1)
+    days = [first_day + timedelta(days=7 + n) for n in range(7)]
+    daily_start, daily_end = time_of_day(9), time_of_day(17)
+    print(f"Free 09:00-17:00 on the days of one week, {args.bookings} bookings per vehicle")
+    print(f"  {'vehicles':>9}{'match':>7}{'bitmaps ms':>12}{'ranges ms':>11}{'free':>7}")
+    for vehicles in args.vehicles:
+        index = build(vehicles, args.bookings, first_day)
+        vehicle_ids = [f"V{vehicle}" for vehicle in range(vehicles)]
+        for match in ("all", "any"):
+            bitmap_ms, free = timed(
+                lambda: index.free_vehicles_daily(vehicle_ids, days, daily_start, daily_end, match),
+                args.repeat,
+            )
+            range_ms, expected = timed(
+                lambda: by_range_search(index, vehicle_ids, days, daily_start, daily_end, match),
+                args.repeat,
+            )
+            assert free == expected, "bitmaps and range searches disagree"
+            print(f"  {vehicles:>9}{match:>7}{bitmap_ms:>12.2f}{range_ms:>11.2f}{len(free):>7}")
+
+
+if __name__ == "__main__":
+    main()
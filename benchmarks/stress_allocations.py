@@ -0,0 +1,208 @@
+"""
+Stress the booking path of the whole app in-process, under contention.
+
+Runs the app (lifespan included) behind an in-process ASGI client and has
+--employees employees book concurrently, each one booking per --rounds day,
+against --vehicles vehicles picked with Zipf --skew (0 is uniform, higher
+piles more bookings onto the first few vehicles). Reports throughput,
+p50/p95/p99 latency, the outcome codes, the allocation attempts, transaction
+retries and conflicts counted by the service, and every pair of overlapping
+bookings left on one vehicle, which must never happen. Exits 1 on a violation.
+
+`--backend containers` talks to the Mongo replica set and Redis the settings
+point at (the docker-compose services), in a throwaway --db-name database.
+`--backend memory` swaps in mongomock-motor and fakeredis (`pip install
+mongomock-motor fakeredis`); they have no transactions, so it only runs the
+CAS allocation mode.
+
+    python -m benchmarks.stress_allocations --employees 500 --vehicles 20 --skew 1.2
+    python -m benchmarks.stress_allocations --backend memory --mode cas --rounds 3
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+
+def zipf_weights(count: int, skew: float) -> list:
+    return [1 / (rank + 1) ** skew for rank in range(count)]
+
+
+def percentile(cuts: list, p: int) -> float:
+    return cuts[p - 1] * 1000 if cuts else 0.0
+
+
+def use_memory_backend(main_module):
+    """Point the app's lifespan at mongomock-motor and fakeredis instead of real servers."""
+    from app.infrastructure.cache import get_cahce
+
+    try:
+        from fakeredis.aioredis import FakeRedis
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError as e:
+        sys.exit(
+            f"--backend memory needs mongomock-motor and fakeredis ({e}); "
+            "pip install mongomock-motor fakeredis, or use --backend containers"
+        )
+
+    def get_db(settings):
+        db_client = AsyncMongoMockClient()
+        return db_client, db_client[settings.MONGO_DB_NAME]
+
+    main_module.get_db = get_db
+    main_module.get_cahce = lambda settings: get_cahce(settings, client=FakeRedis())
+
+
+def find_overlaps(allocations: list) -> list:
+    """(earlier, later) allocation pairs of one vehicle whose windows overlap."""
+    by_vehicle = defaultdict(list)
+    for allocation in allocations:
+        by_vehicle[allocation["vehicle_id"]].append(allocation)
+    overlaps = []
+    for bookings in by_vehicle.values():
+        bookings.sort(key=lambda allocation: allocation["from_datetime"])
+        latest = None  # The booking that ends last among those seen so far
+        for booking in bookings:
+            if latest and booking["from_datetime"] < latest["to_datetime"]:
+                overlaps.append((latest, booking))
+            if latest is None or booking["to_datetime"] > latest["to_datetime"]:
+                latest = booking
+    return overlaps
+
+
+async def seed_vehicles(vehicle_repo, count: int) -> list:
+    from app.core.models import Vehicle
+
+    vehicle_ids = [f"stress-V{index:04d}" for index in range(count)]
+    for vehicle_id in vehicle_ids:
+        await vehicle_repo.add_vehicle(
+            Vehicle(vehicle_id=vehicle_id, make="Stress", model="Test", fuel_efficiency=12.5, capacity=4)
+        )
+    return vehicle_ids
+
+
+async def run(args, app) -> dict:
+    import httpx
+
+    async with app.router.lifespan_context(app):
+        service = app.state.allocation_service
+        vehicle_ids = await seed_vehicles(service.vehicle_repo, args.vehicles)
+        weights = zipf_weights(len(vehicle_ids), args.skew)
+        stats_before = dict(service.allocation_stats)
+        first_day = (datetime.now(timezone.utc) + timedelta(days=1)).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        latencies = []
+        outcomes = Counter()
+
+        async def employee(client, index: int):
+            for day in range(args.rounds):
+                starts_at = first_day + timedelta(days=day, hours=8 + random.randrange(args.slots))
+                request = {
+                    "employee_id": f"stress-E{index:05d}",
+                    "vehicle_id": random.choices(vehicle_ids, weights)[0],
+                    "from_datetime": starts_at.isoformat(),
+                    "to_datetime": (
+                        starts_at + timedelta(hours=random.randint(1, args.max_hours))
+                    ).isoformat(),
+                    "purpose": "Stress test",
+                }
+                started = time.perf_counter()
+                try:
+                    response = await client.post("/allocations/allocate", json=request)
+                    outcomes[response.json().get("code", response.status_code)] += 1
+                except Exception as e:
+                    outcomes[type(e).__name__] += 1
+                latencies.append(time.perf_counter() - started)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://stress") as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(employee(client, index) for index in range(args.employees)))
+            elapsed = time.perf_counter() - started
+
+        stats = {key: service.allocation_stats[key] - stats_before.get(key, 0) for key in stats_before}
+        allocations = await service.allocation_repo.db.allocations.find(
+            {"vehicle_id": {"$in": vehicle_ids}, "status": {"$ne": "rejected"}},
+            {"_id": 0, "allocation_id": 1, "vehicle_id": 1, "from_datetime": 1, "to_datetime": 1},
+        ).to_list(length=None)
+        if args.backend == "containers" and not args.keep:
+            await service.allocation_repo.db.client.drop_database(args.db_name)
+        return {
+            "elapsed": elapsed,
+            "latencies": latencies,
+            "outcomes": outcomes,
+            "stats": stats,
+            "booked": len(allocations),
+            "overlaps": find_overlaps(allocations),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", choices=["containers", "memory"], default="containers")
+    parser.add_argument("--mode", choices=["transaction", "cas"], help="ALLOCATION_MODE to run")
+    parser.add_argument("--employees", type=int, default=500, help="concurrent clients")
+    parser.add_argument("--vehicles", type=int, default=20, help="distinct vehicles contended for")
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent of vehicle choice")
+    parser.add_argument("--rounds", type=int, default=1, help="bookings per employee, one per day")
+    parser.add_argument("--slots", type=int, default=8, help="distinct start hours per day")
+    parser.add_argument("--max-hours", type=int, default=3, help="longest booking")
+    parser.add_argument("--db-name", default="vehicle_allocation_stress")
+    parser.add_argument("--keep", action="store_true", help="keep the containers database afterwards")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--verbose", action="store_true", help="keep the app's per-request logs")
+    args = parser.parse_args()
+
+    if args.backend == "memory":
+        if args.mode == "transaction":
+            parser.error("--backend memory has no transactions; use --mode cas or --backend containers")
+        args.mode = "cas"
+        # Settings still load; give the connection settings placeholders
+        for name in ("MONGO_URI", "REDIS_HOST", "AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+            os.environ.setdefault(name, "unused")
+    if args.mode:
+        os.environ["ALLOCATION_MODE"] = args.mode
+    os.environ["MONGO_DB_NAME"] = args.db_name
+    random.seed(args.seed)
+
+    import main as app_module
+
+    if not args.verbose:
+        logging.disable(logging.ERROR)  # Every refused booking is logged as an error
+    if args.backend == "memory":
+        use_memory_backend(app_module)
+    result = asyncio.run(run(args, app_module.app))
+
+    requests = len(result["latencies"])
+    cuts = statistics.quantiles(result["latencies"], n=100) if requests > 1 else []
+    print(
+        f"{args.employees} employees x {args.rounds} rounds over {args.vehicles} vehicles "
+        f"(skew {args.skew}), {app_module.settings.ALLOCATION_MODE} mode, {args.backend} backend"
+    )
+    print(f"  {'requests':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    print(
+        f"  {requests:>9}{requests / result['elapsed']:>9.0f}{percentile(cuts, 50):>9.1f}"
+        f"{percentile(cuts, 95):>9.1f}{percentile(cuts, 99):>9.1f}"
+    )
+    print("  outcomes: " + ", ".join(f"{code} {count}" for code, count in result["outcomes"].most_common()))
+    print("  service:  " + ", ".join(f"{key} {value}" for key, value in result["stats"].items()))
+    print(f"  booked:   {result['booked']}")
+    print(f"  double bookings: {len(result['overlaps'])}")
+    for earlier, later in result["overlaps"][:10]:
+        print(
+            f"    {earlier['vehicle_id']}: {earlier['allocation_id']} "
+            f"[{earlier['from_datetime']} - {earlier['to_datetime']}] overlaps {later['allocation_id']} "
+            f"[{later['from_datetime']} - {later['to_datetime']}]"
+        )
+    return 1 if result["overlaps"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,152 @@
 import logging
 import logging.config
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.routers import allocation, vehicle, user_role, report
+from redis.exceptions import RedisError
+from app.routers import allocation, vehicle, user_role, report, metrics
 from app.infrastructure.config import settings
+from app.infrastructure.db import (
+    AllocationRepository,
+    OutboxRepository,
+    ReportRepository,
+    VehicleRepository,
+    get_db,
+)
+from app.infrastructure.cache import get_cahce
+from app.infrastructure.booking_filter import EmployeeBookingFilter
+from app.infrastructure.indexes import ensure_indexes
+from app.infrastructure.booked_windows import BookedWindowSweeper
+from app.infrastructure.index_sync import IndexSync
+from app.events.publisher import EventPublisher
+from app.events.transports import get_event_transport
+from app.core.availability import AvailabilityIndex
+from app.core.fleet import FleetIndex
+from app.core.services import AllocationService, ReportService, VehicleService
 
 logging.config.fileConfig('logging.conf')
 
 general_logger = logging.getLogger('appLogger')
 error_logger = logging.getLogger('errorLogger')
 
-app = FastAPI(debug=True)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One MongoDB and one Redis pool per worker, shared by every request
+    db_client, db = get_db(settings)
+    await ensure_indexes(db)
+    cache = get_cahce(settings)
+    await cache.warm_up(settings.REDIS_MIN_IDLE_CONNECTIONS)
+    if hasattr(cache, "start"):
+        await cache.start()  # Listen for L1 invalidations from other workers
+    app.state.cache = cache
+
+    allocation_repo = AllocationRepository(db, trusted_reads=settings.MONGO_TRUSTED_READS)
+    vehicle_repo = VehicleRepository(db, trusted_reads=settings.MONGO_TRUSTED_READS)
+
+    # Booked windows per vehicle, shared by both services
+    availability = AvailabilityIndex()
+    # Available vehicles ranked for auto-assignment, shared by both services
+    fleet = FleetIndex()
+    index_sync = None
+    if not settings.INDEX_SYNC_ENABLED:
+        await availability.load(allocation_repo)
+        await fleet.load(vehicle_repo)
+    else:
+        # Loads both once subscribed, then follows the other workers' writes;
+        # rebuilt on reconnect and periodically
+        index_sync = IndexSync(
+            cache,
+            availability,
+            allocation_repo,
+            fleet,
+            vehicle_repo,
+            channel=settings.INDEX_SYNC_CHANNEL,
+            reload_interval=settings.INDEX_SYNC_RELOAD_INTERVAL,
+        )
+        await index_sync.start()
+    app.state.index_sync = index_sync
+
+    booking_filter = None
+    if settings.BOOKING_FILTER_ENABLED:
+        booking_filter = EmployeeBookingFilter(
+            cache,
+            settings.BOOKING_FILTER_CAPACITY,
+            settings.BOOKING_FILTER_ERROR_RATE,
+            ready_ttl=settings.BOOKING_FILTER_READY_TTL,
+            allocation_repo=allocation_repo,
+        )
+        try:
+            await booking_filter.warm(allocation_repo)
+        except RedisError as e:
+            # Left unready: checks fall through to MongoDB and re-warm it
+            error_logger.error(f"Employee booking filter warm-up failed: {e}")
+
+    event_publisher = None
+    if settings.EVENTS_ENABLED and not settings.EVENTS_OUTBOX_ENABLED:
+        # Booking events go straight to the transport; with the outbox the relay sends them
+        event_publisher = EventPublisher(
+            get_event_transport(settings),
+            max_queue=settings.EVENTS_MAX_QUEUE,
+            max_concurrency=settings.EVENTS_MAX_CONCURRENCY,
+            max_retries=settings.EVENTS_MAX_RETRIES,
+        )
+        await event_publisher.start()
+    app.state.event_publisher = event_publisher
+
+    app.state.allocation_service = AllocationService(
+        allocation_repo,
+        vehicle_repo,
+        cache,
+        db_client,
+        availability,
+        booking_filter=booking_filter,
+        negative_ttl=settings.CACHE_NEGATIVE_TTL,
+        inline_invalidation=settings.CACHE_INLINE_INVALIDATION,
+        outbox_repo=OutboxRepository(db) if settings.EVENTS_OUTBOX_ENABLED else None,
+        allocation_mode=settings.ALLOCATION_MODE,
+        max_retries=settings.ALLOCATION_MAX_RETRIES,
+        retry_base_delay=settings.ALLOCATION_RETRY_BASE_DELAY,
+        fleet=fleet,
+        auto_max_claims=settings.ALLOCATION_AUTO_MAX_CLAIMS,
+        index_sync=index_sync,
+        event_publisher=event_publisher,
+    )
+    app.state.vehicle_service = VehicleService(
+        vehicle_repo,
+        cache,
+        availability,
+        inline_invalidation=settings.CACHE_INLINE_INVALIDATION,
+        fleet=fleet,
+        index_sync=index_sync,
+    )
+    app.state.report_service = ReportService(ReportRepository(db), cache)
+
+    window_sweeper = None
+    if settings.ALLOCATION_MODE == "cas":
+        # Keep the windows CAS claims are checked against short
+        window_sweeper = BookedWindowSweeper(
+            vehicle_repo, allocation_repo, interval=settings.ALLOCATION_WINDOW_SWEEP_INTERVAL
+        )
+        await window_sweeper.start()
+    app.state.window_sweeper = window_sweeper
+
+    general_logger.info("MongoDB and Redis connection pools initialised")
+
+    try:
+        yield
+    finally:
+        if event_publisher is not None:
+            await event_publisher.close()  # Publish what is still queued
+        if index_sync is not None:
+            await index_sync.close()
+        if window_sweeper is not None:
+            await window_sweeper.close()
+        await cache.close()
+        db_client.close()
+        general_logger.info("MongoDB and Redis connection pools closed")
+
+
+app = FastAPI(debug=True, lifespan=lifespan)
 
 
 
@@ -26,3 +163,4 @@ app.include_router(allocation.router, prefix="/allocations", tags=["allocations"
 app.include_router(vehicle.router, prefix="/vehicles", tags=["vehicles"])
 app.include_router(user_role.router, prefix="/roles", tags=["roles"])
 app.include_router(report.router, prefix="/reports", tags=["reports"])
+app.include_router(metrics.router, prefix="/metrics", tags=["metrics"])